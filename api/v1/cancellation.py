@@ -0,0 +1,40 @@
+import asyncio
+import inspect
+from os import getenv
+from typing import Any, Awaitable, Callable
+from fastapi import HTTPException, Request
+from utils.cancellation import cancellation_metrics
+
+
+DISCONNECT_POLL_INTERVAL = float(getenv("DISCONNECT_POLL_INTERVAL", "0.25"))
+
+
+def with_request_param(fn: Callable) -> inspect.Signature:
+    """
+    Signature of `fn` plus a keyword-only `request: Request`, so FastAPI injects the request
+    into a decorator wrapper while still validating the endpoint's own parameters.
+    """
+    signature = inspect.signature(fn)
+    request = inspect.Parameter("request", inspect.Parameter.KEYWORD_ONLY, annotation=Request)
+    return signature.replace(parameters=[*signature.parameters.values(), request])
+
+
+async def run_until_disconnected(request: Request, awaitable: Awaitable[Any]) -> Any:
+    """
+    Await `awaitable` while watching the client connection. When the client goes away the work is
+    cancelled, which closes the upstream Ollama stream and aborts the generation.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                cancellation_metrics["rest_disconnects"] += 1
+                task.cancel()
+                # 499: nginx's "client closed request"; nobody is left to read it.
+                raise HTTPException(status_code=499, detail="Client disconnected")
+    finally:
+        if not task.done():
+            task.cancel()
@@ -1,11 +1,19 @@
 import logging
-from typing import Optional, Callable, Awaitable, Coroutine, Any
-from fastapi import APIRouter, HTTPException, Query
-from models.types import ChatResponse
+import functools
+from typing import Optional, Callable, Awaitable, Coroutine, Any, Literal
+from fastapi import APIRouter, HTTPException, Query, Request
+from models.types import ChatResponse, BatchTextInput, BatchResponse, SessionMessage
+from api.v1.cancellation import run_until_disconnected, with_request_param
+from api.v1.errors import overloaded_exception
+from api.v1.streaming import StreamFormat, stream_response, summary_frames
+from utils.admission import Overloaded
 from tools.chat import (
     chat_mcp, ask_question_tool, classify_tool, sentiment_tool,
     complete_text_tool, generate_text_tool, summarize_tool,
-    translate_tool, paraphrase_tool, instruction_tool, DEFAULT_MODEL
+    translate_tool, paraphrase_tool, instruction_tool, classify_batch_tool, sentiment_batch_tool, chat_tool,
+    summarize_file_tool, combine_summaries_prompt, DEFAULT_MODEL,
+    ask_question_prompt, classify_prompt, sentiment_prompt, complete_text_prompt,
+    generate_text_prompt, summarize_prompt, translate_prompt, paraphrase_prompt, instruction_prompt
 )
 
 logger = logging.getLogger(__name__)
@@ -16,16 +24,27 @@ router = APIRouter(
 )
 
 
-def safe_call(fn: Callable[..., Coroutine[Any, Any, ChatResponse]]):
+def safe_call(fn: Optional[Callable[..., Coroutine[Any, Any, Any]]] = None, *, key: str = "result"):
     """
     Decorator for safely executing chat tool functions with error logging.
+    The tool call is cancelled if the client disconnects before it finishes.
+    The tool's return value is sent under `key` ("results" for the batch endpoints).
     """
-    async def wrapper(*args, **kwargs):
+    if fn is None:
+        return functools.partial(safe_call, key=key)
+
+    @functools.wraps(fn)
+    async def wrapper(*args, request: Request, **kwargs):
         try:
-            return {"result": await fn(*args, **kwargs)}
+            return {key: await run_until_disconnected(request, fn(*args, **kwargs))}
+        except Overloaded as e:
+            raise overloaded_exception(e)
+        except HTTPException:
+            raise
         except Exception as e:
             logger.exception(f"Chat tool error in {fn.__name__}: {e}")
             raise HTTPException(status_code=500, detail="Chat tool failed")
+    wrapper.__signature__ = with_request_param(fn)
     return wrapper
 
 
@@ -85,6 +104,30 @@ async def sentiment(
     return await sentiment_tool(text, model)
 
 
+@router.post(
+    "/classify/batch",
+    summary="Classify many texts",
+    description="Classifies a list of texts, packing them into as few LLM calls as possible.",
+    response_model=BatchResponse,
+    response_description="One classification per input text, in order."
+)
+@safe_call(key="results")
+async def classify_batch(payload: BatchTextInput):
+    return await classify_batch_tool(payload.texts, payload.model or DEFAULT_MODEL)
+
+
+@router.post(
+    "/sentiment/batch",
+    summary="Analyze sentiment of many texts",
+    description="Analyzes the sentiment of a list of texts, packing them into as few LLM calls as possible.",
+    response_model=BatchResponse,
+    response_description="One sentiment label per input text, in order."
+)
+@safe_call(key="results")
+async def sentiment_batch(payload: BatchTextInput):
+    return await sentiment_batch_tool(payload.texts, payload.model or DEFAULT_MODEL)
+
+
 @router.get(
     "/complete",
     summary="Complete text",
@@ -130,6 +173,22 @@ async def summarize(
     return await summarize_tool(text, model)
 
 
+@router.get(
+    "/summarize/file",
+    summary="Summarize a stored document",
+    description="Summarizes a text document from the local file store or S3, chunking long documents.",
+    response_model=ChatResponse,
+    response_description="Summary of the document."
+)
+@safe_call
+async def summarize_file(
+        path: str = Query(..., min_length=1, description="Document path or S3 key"),
+        source: Literal["local", "s3"] = Query("local", description="Document store"),
+        model: Optional[str] = DEFAULT_MODEL
+):
+    return await summarize_file_tool(path, source, model)
+
+
 @router.get(
     "/translate",
     summary="Translate text",
@@ -175,3 +234,144 @@ async def instruction(
 ):
     return await instruction_tool(task, model)
 
+
+@router.post(
+    "/session",
+    summary="Chat in a multi-turn session",
+    description="Sends the next message of a conversation. Turns sharing a session_id reuse the model's cached context.",
+    response_model=ChatResponse,
+    response_description="The assistant's reply."
+)
+@safe_call
+async def chat_session(payload: SessionMessage):
+    return await chat_tool(payload.message, payload.session_id, payload.model or DEFAULT_MODEL)
+
+
+# === Streaming variants ===
+
+@router.get(
+    "/ask/stream",
+    summary="Ask a question (streaming)",
+    description="Streams tokens as Server-Sent Events (`sse`) or newline-delimited JSON (`ndjson`), ending with a `done` metadata frame.",
+    response_description="A token stream followed by a metadata frame."
+)
+async def ask_question_stream(
+        question: Optional[str] = "",
+        model: Optional[str] = DEFAULT_MODEL,
+        format: StreamFormat = Query("sse", description="Stream format: sse or ndjson")
+):
+    return stream_response(ask_question_prompt(question), model, tool="ask_question", fmt=format)
+
+
+@router.get(
+    "/classify/stream",
+    summary="Classify input text (streaming)",
+    description="Streams tokens as Server-Sent Events (`sse`) or newline-delimited JSON (`ndjson`), ending with a `done` metadata frame.",
+    response_description="A token stream followed by a metadata frame."
+)
+async def classify_stream(
+        text: str = Query(..., min_length=1, description="Text to classify"),
+        model: Optional[str] = DEFAULT_MODEL,
+        format: StreamFormat = Query("sse", description="Stream format: sse or ndjson")
+):
+    return stream_response(classify_prompt(text), model, tool="classify", fmt=format)
+
+
+@router.get(
+    "/sentiment/stream",
+    summary="Analyze sentiment (streaming)",
+    description="Streams tokens as Server-Sent Events (`sse`) or newline-delimited JSON (`ndjson`), ending with a `done` metadata frame.",
+    response_description="A token stream followed by a metadata frame."
+)
+async def sentiment_stream(
+        text: str = Query(..., min_length=1, description="Text to analyze for sentiment"),
+        model: Optional[str] = DEFAULT_MODEL,
+        format: StreamFormat = Query("sse", description="Stream format: sse or ndjson")
+):
+    return stream_response(sentiment_prompt(text), model, tool="sentiment", fmt=format)
+
+
+@router.get(
+    "/complete/stream",
+    summary="Complete text (streaming)",
+    description="Streams tokens as Server-Sent Events (`sse`) or newline-delimited JSON (`ndjson`), ending with a `done` metadata frame.",
+    response_description="A token stream followed by a metadata frame."
+)
+async def complete_text_stream(
+        text: str = Query(..., min_length=1, description="Text to complete"),
+        model: Optional[str] = DEFAULT_MODEL,
+        format: StreamFormat = Query("sse", description="Stream format: sse or ndjson")
+):
+    return stream_response(complete_text_prompt(text), model, tool="complete_text", fmt=format)
+
+
+@router.get(
+    "/generate-text/stream",
+    summary="Generate paragraph (streaming)",
+    description="Streams tokens as Server-Sent Events (`sse`) or newline-delimited JSON (`ndjson`), ending with a `done` metadata frame.",
+    response_description="A token stream followed by a metadata frame."
+)
+async def generate_text_stream(
+        topic: str = Query(..., min_length=1, description="Topic to generate text about"),
+        model: Optional[str] = DEFAULT_MODEL,
+        format: StreamFormat = Query("sse", description="Stream format: sse or ndjson")
+):
+    return stream_response(generate_text_prompt(topic), model, tool="generate_text", fmt=format)
+
+
+@router.get(
+    "/summarize/stream",
+    summary="Summarize text (streaming)",
+    description="Streams tokens as Server-Sent Events (`sse`) or newline-delimited JSON (`ndjson`), ending with a `done` metadata frame.",
+    response_description="A token stream followed by a metadata frame."
+)
+async def summarize_stream(
+        text: str = Query(..., min_length=1, description="Text to summarize"),
+        model: Optional[str] = DEFAULT_MODEL,
+        format: StreamFormat = Query("sse", description="Stream format: sse or ndjson")
+):
+    frames = summary_frames(text, model, summarize_prompt, combine_summaries_prompt, format)
+    return stream_response(summarize_prompt(text), model, tool="summarize", fmt=format, frames=frames)
+
+
+@router.get(
+    "/translate/stream",
+    summary="Translate text (streaming)",
+    description="Streams tokens as Server-Sent Events (`sse`) or newline-delimited JSON (`ndjson`), ending with a `done` metadata frame.",
+    response_description="A token stream followed by a metadata frame."
+)
+async def translate_stream(
+        text: str = Query(..., min_length=1, description="Text to translate"),
+        language: Optional[str] = Query("Spanish", min_length=1, description="Target language"),
+        model: Optional[str] = DEFAULT_MODEL,
+        format: StreamFormat = Query("sse", description="Stream format: sse or ndjson")
+):
+    return stream_response(translate_prompt(text, language), model, tool="translate", fmt=format)
+
+
+@router.get(
+    "/paraphrase/stream",
+    summary="Paraphrase text (streaming)",
+    description="Streams tokens as Server-Sent Events (`sse`) or newline-delimited JSON (`ndjson`), ending with a `done` metadata frame.",
+    response_description="A token stream followed by a metadata frame."
+)
+async def paraphrase_stream(
+        text: str = Query(..., min_length=1, description="Text to paraphrase"),
+        model: Optional[str] = DEFAULT_MODEL,
+        format: StreamFormat = Query("sse", description="Stream format: sse or ndjson")
+):
+    return stream_response(paraphrase_prompt(text), model, tool="paraphrase", fmt=format)
+
+
+@router.get(
+    "/instruction/stream",
+    summary="Follow step-by-step instructions (streaming)",
+    description="Streams tokens as Server-Sent Events (`sse`) or newline-delimited JSON (`ndjson`), ending with a `done` metadata frame.",
+    response_description="A token stream followed by a metadata frame."
+)
+async def instruction_stream(
+        task: str = Query(..., min_length=1, description="Instructional task to perform"),
+        model: Optional[str] = DEFAULT_MODEL,
+        format: StreamFormat = Query("sse", description="Stream format: sse or ndjson")
+):
+    return stream_response(instruction_prompt(task), model, tool="instruction", fmt=format)
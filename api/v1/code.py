@@ -1,11 +1,18 @@
-from fastapi import APIRouter, HTTPException, Depends
-from models.types import CodePrompt, CodeInput
+import functools
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from models.types import CodePrompt, CodeInput, SessionMessage
 from agents.code import code_mcp
 import logging
 from typing import Callable, Awaitable, TypeVar, Any, Coroutine
+from api.v1.cancellation import run_until_disconnected, with_request_param
+from api.v1.errors import overloaded_exception
+from api.v1.streaming import StreamFormat, stream_response
+from utils.admission import Overloaded
 from tools.code import (
     generate_code_tool, fix_code_tool, explain_code_tool,
-    write_tests_tool, debug_code_tool, generate_function_docstring_tool
+    write_tests_tool, debug_code_tool, generate_function_docstring_tool, code_chat_tool, DEFAULT_MODEL,
+    generate_code_prompt, fix_code_prompt, explain_code_prompt,
+    write_tests_prompt, debug_code_prompt, docstring_prompt
 )
 
 logger = logging.getLogger(__name__)
@@ -21,14 +28,21 @@ R = TypeVar("R")
 def async_wrapper(fn: Callable[..., Coroutine[Any, Any, R]]) -> Callable[..., Coroutine[Any, Any, dict]]:
     """
     A decorator to wrap async functions with error handling and unified response format.
+    The tool call is cancelled if the client disconnects before it finishes.
     """
-    async def wrapper(*args, **kwargs) -> dict:
+    @functools.wraps(fn)
+    async def wrapper(*args, request: Request, **kwargs) -> dict:
         try:
-            result = await fn(*args, **kwargs)
+            result = await run_until_disconnected(request, fn(*args, **kwargs))
             return {"result": result}
+        except Overloaded as e:
+            raise overloaded_exception(e)
+        except HTTPException:
+            raise
         except Exception as e:
             logger.exception(f"[{fn.__name__}] Tool error: {e}")
             raise HTTPException(status_code=500, detail="Tool failed. See logs.")
+    wrapper.__signature__ = with_request_param(fn)
     return wrapper
 
 
@@ -52,7 +66,7 @@ async def list_code_tools():
 )
 @async_wrapper
 async def generate_code(payload: CodePrompt):
-    return await generate_code_tool(prompt=payload.prompt, language=payload.language, model=payload.model)
+    return await generate_code_tool(prompt=payload.prompt, language=payload.language, model=payload.model or DEFAULT_MODEL)
 
 
 @router.post(
@@ -64,7 +78,7 @@ async def generate_code(payload: CodePrompt):
 )
 @async_wrapper
 async def fix_code(payload: CodeInput):
-    return await fix_code_tool(code=payload.code, model=payload.model)
+    return await fix_code_tool(code=payload.code, model=payload.model or DEFAULT_MODEL)
 
 
 @router.post(
@@ -76,7 +90,7 @@ async def fix_code(payload: CodeInput):
 )
 @async_wrapper
 async def explain_code(payload: CodeInput):
-    return await explain_code_tool(code=payload.code, model=payload.model)
+    return await explain_code_tool(code=payload.code, model=payload.model or DEFAULT_MODEL)
 
 
 @router.post(
@@ -88,7 +102,7 @@ async def explain_code(payload: CodeInput):
 )
 @async_wrapper
 async def write_tests(payload: CodeInput):
-    return await write_tests_tool(code=payload.code, language=payload.language, model=payload.model)
+    return await write_tests_tool(code=payload.code, language=payload.language, model=payload.model or DEFAULT_MODEL)
 
 
 @router.post(
@@ -100,7 +114,7 @@ async def write_tests(payload: CodeInput):
 )
 @async_wrapper
 async def debug_code(payload: CodeInput):
-    return await debug_code_tool(code=payload.code, model=payload.model)
+    return await debug_code_tool(code=payload.code, model=payload.model or DEFAULT_MODEL)
 
 
 @router.post(
@@ -112,5 +126,96 @@ async def debug_code(payload: CodeInput):
 )
 @async_wrapper
 async def generate_docstring(payload: CodeInput):
-    return await generate_function_docstring_tool(code=payload.code, model=payload.model)
+    return await generate_function_docstring_tool(code=payload.code, model=payload.model or DEFAULT_MODEL)
 
+
+@router.post(
+    "/session",
+    summary="Continue a coding thread",
+    description="Sends the next question of a coding thread. Turns sharing a session_id reuse the model's cached context.",
+    response_model=dict,
+    response_description="The assistant's reply."
+)
+@async_wrapper
+async def code_session(payload: SessionMessage):
+    return await code_chat_tool(payload.message, payload.session_id, payload.model or DEFAULT_MODEL)
+
+
+# === Streaming variants ===
+
+@router.post(
+    "/generate/stream",
+    summary="Generate code from a prompt (streaming)",
+    description="Streams tokens as Server-Sent Events (`sse`) or newline-delimited JSON (`ndjson`), ending with a `done` metadata frame.",
+    response_description="A token stream followed by a metadata frame."
+)
+async def generate_code_stream(
+        payload: CodePrompt,
+        format: StreamFormat = Query("sse", description="Stream format: sse or ndjson")
+):
+    return stream_response(generate_code_prompt(payload.prompt, payload.language), payload.model or DEFAULT_MODEL, tool="generate_code", fmt=format)
+
+
+@router.post(
+    "/fix/stream",
+    summary="Fix or refactor code (streaming)",
+    description="Streams tokens as Server-Sent Events (`sse`) or newline-delimited JSON (`ndjson`), ending with a `done` metadata frame.",
+    response_description="A token stream followed by a metadata frame."
+)
+async def fix_code_stream(
+        payload: CodeInput,
+        format: StreamFormat = Query("sse", description="Stream format: sse or ndjson")
+):
+    return stream_response(fix_code_prompt(payload.code), payload.model or DEFAULT_MODEL, tool="fix_code", fmt=format)
+
+
+@router.post(
+    "/explain/stream",
+    summary="Explain code logic (streaming)",
+    description="Streams tokens as Server-Sent Events (`sse`) or newline-delimited JSON (`ndjson`), ending with a `done` metadata frame.",
+    response_description="A token stream followed by a metadata frame."
+)
+async def explain_code_stream(
+        payload: CodeInput,
+        format: StreamFormat = Query("sse", description="Stream format: sse or ndjson")
+):
+    return stream_response(explain_code_prompt(payload.code), payload.model or DEFAULT_MODEL, tool="explain_code", fmt=format)
+
+
+@router.post(
+    "/test/stream",
+    summary="Generate tests for code (streaming)",
+    description="Streams tokens as Server-Sent Events (`sse`) or newline-delimited JSON (`ndjson`), ending with a `done` metadata frame.",
+    response_description="A token stream followed by a metadata frame."
+)
+async def write_tests_stream(
+        payload: CodeInput,
+        format: StreamFormat = Query("sse", description="Stream format: sse or ndjson")
+):
+    return stream_response(write_tests_prompt(payload.code, payload.language), payload.model or DEFAULT_MODEL, tool="write_tests", fmt=format)
+
+
+@router.post(
+    "/debug/stream",
+    summary="Debug code (streaming)",
+    description="Streams tokens as Server-Sent Events (`sse`) or newline-delimited JSON (`ndjson`), ending with a `done` metadata frame.",
+    response_description="A token stream followed by a metadata frame."
+)
+async def debug_code_stream(
+        payload: CodeInput,
+        format: StreamFormat = Query("sse", description="Stream format: sse or ndjson")
+):
+    return stream_response(debug_code_prompt(payload.code), payload.model or DEFAULT_MODEL, tool="debug_code", fmt=format)
+
+
+@router.post(
+    "/docstring/stream",
+    summary="Generate docstring for a function (streaming)",
+    description="Streams tokens as Server-Sent Events (`sse`) or newline-delimited JSON (`ndjson`), ending with a `done` metadata frame.",
+    response_description="A token stream followed by a metadata frame."
+)
+async def generate_docstring_stream(
+        payload: CodeInput,
+        format: StreamFormat = Query("sse", description="Stream format: sse or ndjson")
+):
+    return stream_response(docstring_prompt(payload.code), payload.model or DEFAULT_MODEL, tool="generate_docstring", fmt=format)
@@ -0,0 +1,13 @@
+from fastapi import HTTPException
+from utils.admission import Overloaded
+
+
+def overloaded_exception(e: Overloaded) -> HTTPException:
+    """
+    Translate an admission rejection into a fast 429/503 response with a Retry-After header.
+    """
+    return HTTPException(
+        status_code=e.status_code,
+        detail=str(e),
+        headers={"Retry-After": str(e.retry_after)},
+    )
@@ -0,0 +1,131 @@
+import asyncio
+import json
+import time
+import logging
+from typing import AsyncIterator, Callable, Literal, Optional
+from fastapi.responses import StreamingResponse
+from api.v1.errors import overloaded_exception
+from tools.summarize import final_summary_prompt
+from tools.utils import stream_ollama
+from utils.admission import Overloaded, admission
+from utils.cancellation import cancellation_metrics
+from utils.ndjson import frame_stats
+
+
+logger = logging.getLogger(__name__)
+
+StreamFormat = Literal["sse", "ndjson"]
+
+MEDIA_TYPES = {
+    "sse": "text/event-stream",
+    "ndjson": "application/x-ndjson",
+}
+
+def encode_frame(event: str, payload: dict, fmt: StreamFormat) -> bytes:
+    data = json.dumps(payload, ensure_ascii=False)
+    if fmt == "sse":
+        return f"event: {event}\ndata: {data}\n\n".encode()
+    return (json.dumps({"event": event, **payload}, ensure_ascii=False) + "\n").encode()
+
+
+async def token_frames(prompt: str, model: str, tool: str, fmt: StreamFormat) -> AsyncIterator[bytes]:
+    """
+    Forward tokens as Ollama produces them, then emit a single `done` frame with metadata.
+    Errors are reported in-band since the response status is already sent.
+    """
+    started = time.perf_counter()
+    first_token_ms = None
+    chunks = 0
+    stats = {}
+    error = None
+    try:
+        async for data in stream_ollama(prompt, model):
+            content = data.get("response", "")
+            if content:
+                if first_token_ms is None:
+                    first_token_ms = round((time.perf_counter() - started) * 1000, 2)
+                chunks += 1
+                yield encode_frame("token", {"token": content}, fmt)
+            if data.get("done"):
+                stats = frame_stats(data)
+    except asyncio.CancelledError:
+        # Starlette cancels the body iterator when the client disconnects.
+        cancellation_metrics["stream_disconnects"] += 1
+        raise
+    except Exception as e:
+        logger.exception(f"[{tool}] Streaming error: {e}")
+        error = "Tool failed. See logs."
+        yield encode_frame("error", {"error": error}, fmt)
+
+    yield encode_frame("done", {
+        "tool": tool,
+        "model": model,
+        "chunks": chunks,
+        "time_to_first_token_ms": first_token_ms,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        "error": error,
+        **stats,
+    }, fmt)
+
+
+async def summary_frames(
+        text: str,
+        model: str,
+        map_prompt: Callable[[str], str],
+        reduce_prompt: Callable[[str], str],
+        fmt: StreamFormat,
+) -> AsyncIterator[bytes]:
+    """
+    Emit a `partial` frame per chunk summary as the map-reduce stages complete, then stream the
+    final summary as tokens. Short texts go straight to the token stream.
+    """
+    partials: asyncio.Queue = asyncio.Queue()
+
+    async def on_partial(done: int, total: int, summary: str):
+        await partials.put(encode_frame("partial", {"done": done, "total": total, "summary": summary}, fmt))
+
+    async def reduce() -> str:
+        try:
+            return await final_summary_prompt(text, model, map_prompt, reduce_prompt, on_partial=on_partial)
+        finally:
+            partials.put_nowait(None)
+
+    task = asyncio.create_task(reduce())
+    try:
+        while (frame := await partials.get()) is not None:
+            yield frame
+        prompt = task.result()
+    except asyncio.CancelledError:
+        cancellation_metrics["stream_disconnects"] += 1
+        raise
+    except Exception as e:
+        logger.exception(f"[summarize] Map-reduce error: {e}")
+        yield encode_frame("error", {"error": "Tool failed. See logs."}, fmt)
+        yield encode_frame("done", {"tool": "summarize", "model": model, "error": "Tool failed. See logs."}, fmt)
+        return
+    finally:
+        task.cancel()
+    async for frame in token_frames(prompt, model, "summarize", fmt):
+        yield frame
+
+
+def stream_response(
+        prompt: str,
+        model: str,
+        tool: str,
+        fmt: StreamFormat = "sse",
+        frames: Optional[AsyncIterator[bytes]] = None,
+) -> StreamingResponse:
+    """
+    Stream `token_frames` for `prompt`, or the given pre-built `frames`, after the admission check.
+    """
+    # Reject before the 200 status line is sent; once streaming, errors can only be reported in-band.
+    try:
+        admission.check(model)
+    except Overloaded as e:
+        raise overloaded_exception(e)
+    return StreamingResponse(
+        frames or token_frames(prompt, model, tool, fmt),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
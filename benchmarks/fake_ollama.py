@@ -0,0 +1,170 @@
+"""
+Fake Ollama server for hermetic tests and load tests: streams /api/generate NDJSON with a configurable
+time to first token, token rate, jitter and failure injection, and answers /api/embed and /api/ps.
+
+    python -m benchmarks.fake_ollama --port 11434 --ttft 0.2 --tokens-per-second 40 --error-rate 0.01
+    OLLAMA_BASE_URL=http://localhost:11434 uvicorn main:app
+
+Structured requests (`format`) get a JSON answer that satisfies label schemas, so classify/sentiment work.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+@dataclass
+class FakeOllamaConfig:
+    ttft: float = 0.1
+    tokens_per_second: float = 100.0
+    # Relative jitter applied to the TTFT and to every token delay, e.g. 0.2 = ±20%.
+    jitter: float = 0.2
+    tokens: int = 32
+    # Share of requests answered with HTTP 500 before streaming / cut off half-way through the stream.
+    error_rate: float = 0.0
+    drop_rate: float = 0.0
+    embedding_dim: int = 384
+    models: List[str] = field(default_factory=lambda: ["llama3.2:1b-instruct-q4_K_M", "nomic-embed-text"])
+    seed: int = 0
+
+
+class DroppedStream(Exception):
+    """
+    Raised inside the response stream to abort the connection mid-generation.
+    """
+
+
+def _answer_tokens(body: Dict[str, Any], count: int) -> List[str]:
+    response_format = body.get("format")
+    if not response_format:
+        return [f" tok{i}" for i in range(count)]
+    label = None
+    if isinstance(response_format, dict):
+        enum = response_format.get("properties", {}).get("label", {}).get("enum")
+        label = enum[0] if enum else None
+    text = json.dumps({"label": label} if label else {"answer": "fake"})
+    # Structured answers are short; stream them in a few pieces like a real tokenizer would.
+    return [text[i:i + 4] for i in range(0, len(text), 4)]
+
+
+def create_app(config: FakeOllamaConfig = None) -> FastAPI:
+    config = config or FakeOllamaConfig()
+    rng = random.Random(config.seed)
+    stats = {"generate": 0, "embed": 0, "errors": 0, "dropped": 0, "in_flight": 0, "max_in_flight": 0}
+    app = FastAPI(title="Fake Ollama")
+
+    def jittered(seconds: float) -> float:
+        return max(0.0, seconds * (1 + rng.uniform(-config.jitter, config.jitter)))
+
+    async def frames(body: Dict[str, Any]) -> AsyncIterator[bytes]:
+        model, prompt = body.get("model", ""), body.get("prompt", "")
+        count = int((body.get("options") or {}).get("num_predict") or config.tokens)
+        tokens = _answer_tokens(body, count)
+        drop_at = len(tokens) // 2 if rng.random() < config.drop_rate else None
+        prompt_tokens = max(1, len(prompt) // 4)
+        started = time.perf_counter_ns()
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        try:
+            await asyncio.sleep(jittered(config.ttft))
+            first = time.perf_counter_ns()
+            for i, token in enumerate(tokens):
+                if i == drop_at:
+                    stats["dropped"] += 1
+                    raise DroppedStream(f"dropped after {i} tokens")
+                if i:
+                    await asyncio.sleep(jittered(1 / config.tokens_per_second))
+                yield json.dumps({"model": model, "response": token, "done": False}).encode() + b"\n"
+            finished = time.perf_counter_ns()
+            yield json.dumps({
+                "model": model,
+                "response": "",
+                "done": True,
+                "done_reason": "stop",
+                "context": [*(body.get("context") or []), *range(prompt_tokens + len(tokens))][-4096:],
+                "total_duration": finished - started,
+                "prompt_eval_count": prompt_tokens,
+                "prompt_eval_duration": first - started,
+                "eval_count": len(tokens),
+                "eval_duration": max(1, finished - first),
+            }).encode() + b"\n"
+        finally:
+            stats["in_flight"] -= 1
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        body = await request.json()
+        stats["generate"] += 1
+        if not body.get("prompt") and not body.get("context"):
+            # Warm-up/preload request: Ollama loads the model and answers with a single done frame.
+            return {"model": body.get("model"), "response": "", "done": True, "done_reason": "load"}
+        if rng.random() < config.error_rate:
+            stats["errors"] += 1
+            return JSONResponse(status_code=500, content={"error": "injected failure"})
+        if body.get("stream") is False:
+            chunks = [json.loads(line) async for line in frames(body)]
+            return {**chunks[-1], "response": "".join(chunk["response"] for chunk in chunks)}
+        return StreamingResponse(frames(body), media_type="application/x-ndjson")
+
+    @app.post("/api/embed")
+    async def embed(request: Request):
+        body = await request.json()
+        stats["embed"] += 1
+        inputs = body.get("input", "")
+        inputs = inputs if isinstance(inputs, list) else [inputs]
+        return {"model": body.get("model"), "embeddings": [_embedding(text, config.embedding_dim) for text in inputs]}
+
+    @app.get("/api/ps")
+    @app.get("/api/tags")
+    async def models():
+        return {"models": [{"name": name, "model": name} for name in config.models]}
+
+    @app.get("/fake/stats")
+    async def fake_stats():
+        return stats
+
+    return app
+
+
+def _embedding(text: str, dim: int) -> List[float]:
+    """
+    Deterministic unit vector per text: equal texts embed equally, different texts are near-orthogonal.
+    """
+    seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "big")
+    rng = random.Random(seed)
+    vector = [rng.gauss(0, 1) for _ in range(dim)]
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--ttft", type=float, default=FakeOllamaConfig.ttft, help="Seconds to the first token.")
+    parser.add_argument("--tokens-per-second", type=float, default=FakeOllamaConfig.tokens_per_second)
+    parser.add_argument("--jitter", type=float, default=FakeOllamaConfig.jitter, help="Relative jitter, e.g. 0.2 = ±20%%.")
+    parser.add_argument("--tokens", type=int, default=FakeOllamaConfig.tokens, help="Tokens per answer.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests failing with HTTP 500.")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Share of streams cut off half-way.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config = FakeOllamaConfig(
+        ttft=args.ttft, tokens_per_second=args.tokens_per_second, jitter=args.jitter, tokens=args.tokens,
+        error_rate=args.error_rate, drop_rate=args.drop_rate, seed=args.seed,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
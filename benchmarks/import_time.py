@@ -0,0 +1,80 @@
+"""
+Startup import-time benchmark: imports `main` in fresh interpreters under `python -X importtime` and reports
+the cumulative import time of the module, its slowest direct imports and any heavy driver that got loaded.
+
+    python -m benchmarks.import_time                        # best of 3 runs
+    python -m benchmarks.import_time --budget-ms 1500       # exit 1 if slower or a lazy driver is imported
+
+Data-source drivers (boto3, motor, asyncpg, ...) are imported on first use; any of them showing up here
+means a module-level import crept back onto the startup path.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+
+ROOT = Path(__file__).resolve().parent.parent
+LAZY_MODULES = ("boto3", "botocore", "motor", "pymongo", "asyncpg", "psycopg2", "aiohttp", "bs4", "redis", "numpy")
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def parse_importtime(stderr: str) -> Dict[str, Tuple[int, int, int]]:
+    """
+    Map module name -> (self µs, cumulative µs, nesting level) from `-X importtime` output.
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules[name] = (int(self_us), int(cumulative_us), len(indent) // 2)
+    return modules
+
+
+def measure(module: str = "main", env: Dict[str, str] = None) -> Dict[str, Tuple[int, int, int]]:
+    run_env = {**os.environ, "OLLAMA_WARMUP": "false", "LOG_LEVEL": "WARNING", **(env or {})}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=run_env, capture_output=True, text=True, check=True,
+    )
+    return parse_importtime(result.stderr)
+
+
+def loaded_lazy_modules(modules: Dict[str, Tuple[int, int, int]]) -> List[str]:
+    return sorted({name.split(".")[0] for name in modules} & set(LAZY_MODULES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=3, help="report the fastest of this many runs")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=None, help="fail when the import takes longer")
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(args.runs)]
+    best = min(runs, key=lambda modules: modules[args.module][1])
+    total_ms = best[args.module][1] / 1000
+    print(f"import {args.module}: {total_ms:.0f} ms (best of {args.runs})")
+    print(f"slowest imports made by {args.module} (cumulative ms):")
+    direct = [(name, cumulative) for name, (_, cumulative, level) in best.items() if level == 1]
+    for name, cumulative in sorted(direct, key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {cumulative / 1000:8.1f}  {name}")
+
+    failures = []
+    lazy = loaded_lazy_modules(best)
+    if lazy:
+        failures.append(f"lazily imported modules loaded at startup: {', '.join(lazy)}")
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        failures.append(f"import took {total_ms:.0f} ms, budget {args.budget_ms:.0f} ms")
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""
+Load test: drives the REST endpoints and the MCP /service/mcp path at a given concurrency and reports
+throughput, p50/p95/p99 latency, errors and server memory. Compares against a baseline to flag regressions.
+
+    python -m benchmarks.load_test                                  # hermetic: fake Ollama + local server
+    python -m benchmarks.load_test --concurrency 32 --requests 500 --ttft 0.3 --error-rate 0.01
+    python -m benchmarks.load_test --url http://localhost:8000      # an already running server
+    python -m benchmarks.load_test --update-baseline                # record benchmarks/baseline.json
+
+By default the server runs as a subprocess against benchmarks.fake_ollama, with no Mongo/Postgres/Redis
+configured and the result caches off, so each request exercises the full uncached path.
+Exits with status 1 when a scenario regresses beyond --tolerance versus the baseline.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional
+import httpx
+from utils.cache import is_cacheable_result
+
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+SCENARIOS = ("rest", "rest_stream", "mcp")
+# Server environment for hermetic runs; override any of it with --env KEY=VALUE.
+HERMETIC_ENV = {
+    "OLLAMA_WARMUP": "false",
+    "OLLAMA_HEALTH_INTERVAL": "60",
+    "RESULT_CACHE_ENABLED": "false",
+    "SEMANTIC_CACHE_ENABLED": "false",
+    "TRANSLATION_MEMORY_ENABLED": "false",
+    "LOG_LEVEL": "WARNING",
+}
+
+
+def percentile(values: List[float], p: float) -> float:
+    """
+    Nearest-rank percentile; 0 for no values.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1))]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def rss_mb(pid: Optional[int]) -> Dict[str, Optional[float]]:
+    """
+    Current and peak resident memory of a process (Linux /proc), in MiB.
+    """
+    usage = {"rss_mb": None, "peak_rss_mb": None}
+    if pid is None:
+        return usage
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                usage["rss_mb"] = round(int(line.split()[1]) / 1024, 1)
+            elif line.startswith("VmHWM:"):
+                usage["peak_rss_mb"] = round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return usage
+
+
+async def wait_until_up(url: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{url} did not come up within {timeout}s")
+            await asyncio.sleep(0.2)
+
+
+@contextmanager
+def hermetic_server(args) -> Iterator[tuple]:
+    """
+    Start benchmarks.fake_ollama and the app (uvicorn main:app) as subprocesses; yield (base url, app pid).
+    """
+    ollama_port, app_port = free_port(), free_port()
+    fake = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.fake_ollama", "--port", str(ollama_port),
+        "--ttft", str(args.ttft), "--tokens-per-second", str(args.tokens_per_second), "--jitter", str(args.jitter),
+        "--tokens", str(args.tokens), "--error-rate", str(args.error_rate), "--drop-rate", str(args.drop_rate),
+    ])
+    env = {**os.environ, **HERMETIC_ENV, "OLLAMA_BASE_URL": f"http://127.0.0.1:{ollama_port}"}
+    env.pop("OLLAMA_BASE_URLS", None)
+    env.update(item.split("=", 1) for item in args.env)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(app_port), "--log-level", "warning"],
+        env=env, **({} if args.verbose else {"stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL}),
+    )
+    try:
+        asyncio.run(wait_until_up(f"http://127.0.0.1:{ollama_port}/api/ps"))
+        asyncio.run(wait_until_up(f"http://127.0.0.1:{app_port}/ready"))
+        yield f"http://127.0.0.1:{app_port}", server.pid
+    finally:
+        for process in (server, fake):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+class McpSession:
+    """
+    Minimal streamable-HTTP MCP client: one initialized session per worker, tools/call over JSON-RPC.
+    """
+    def __init__(self, client: httpx.AsyncClient, url: str):
+        self.client = client
+        self.url = url
+        self.headers = {"Accept": "application/json, text/event-stream", "Content-Type": "application/json"}
+        self._ids = 0
+
+    async def _post(self, payload: dict) -> httpx.Response:
+        response = await self.client.post(self.url, json=payload, headers=self.headers)
+        response.raise_for_status()
+        return response
+
+    async def initialize(self):
+        response = await self._post({"jsonrpc": "2.0", "id": 0, "method": "initialize", "params": {
+            "protocolVersion": "2025-03-26", "capabilities": {}, "clientInfo": {"name": "load-test", "version": "1"},
+        }})
+        self.headers["mcp-session-id"] = response.headers["mcp-session-id"]
+        await self._post({"jsonrpc": "2.0", "method": "notifications/initialized"})
+
+    async def call_tool(self, name: str, arguments: dict) -> dict:
+        self._ids += 1
+        response = await self._post({
+            "jsonrpc": "2.0", "id": self._ids, "method": "tools/call", "params": {"name": name, "arguments": arguments},
+        })
+        if response.headers.get("content-type", "").startswith("text/event-stream"):
+            data = [line[5:] for line in response.text.splitlines() if line.startswith("data:")]
+            message = json.loads(data[-1])
+        else:
+            message = response.json()
+        if "error" in message or message["result"].get("isError"):
+            raise RuntimeError(f"tool call failed: {message}")
+        return message["result"]
+
+
+def check_answer(text: str):
+    # Tools report upstream failures in-band, as a message instead of an HTTP/JSON-RPC error.
+    if not is_cacheable_result(text):
+        raise RuntimeError(text[:200])
+
+
+def scenario_factories(base_url: str) -> Dict[str, Callable]:
+    """
+    Each factory takes a client and returns a per-worker request function `request(i)`.
+    """
+    async def rest(client: httpx.AsyncClient):
+        async def request(i: int):
+            response = await client.get(f"{base_url}/api/v1/chat/complete", params={"text": f"Load test sentence {i}"})
+            response.raise_for_status()
+            check_answer(response.json()["result"])
+        return request
+
+    async def rest_stream(client: httpx.AsyncClient):
+        async def request(i: int):
+            params = {"topic": f"load test topic {i}", "format": "ndjson"}
+            async with client.stream("GET", f"{base_url}/api/v1/chat/generate-text/stream", params=params) as response:
+                response.raise_for_status()
+                last = "{}"
+                async for line in response.aiter_lines():
+                    last = line or last
+            # The closing `done` frame reports stream errors in-band.
+            done = json.loads(last)
+            if done.get("event") != "done" or done.get("error"):
+                raise RuntimeError(last[:200])
+        return request
+
+    async def mcp(client: httpx.AsyncClient):
+        session = McpSession(client, f"{base_url}/service/mcp/")
+        await session.initialize()
+
+        async def request(i: int):
+            result = await session.call_tool("chat_complete_text_tool", {"text": f"Load test sentence {i}"})
+            check_answer(result["content"][0]["text"])
+        return request
+
+    return {"rest": rest, "rest_stream": rest_stream, "mcp": mcp}
+
+
+async def run_scenario(
+        name: str,
+        factory: Callable[[httpx.AsyncClient], Awaitable[Callable]],
+        concurrency: int,
+        requests: int,
+        pid: Optional[int],
+) -> dict:
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    counter = iter(range(requests))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+        workers = [await factory(client) for _ in range(concurrency)]
+
+        async def worker(request):
+            for i in counter:
+                started = time.perf_counter()
+                try:
+                    await request(i)
+                    latencies.append(time.perf_counter() - started)
+                except Exception as e:
+                    errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(request) for request in workers))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "requests": requests,
+        "errors": sum(errors.values()),
+        "error_types": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        **rss_mb(pid),
+    }
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    """
+    Regressions of `results` against `baseline`: lower throughput or higher p95/p99 by more than `tolerance`
+    (relative), a higher error rate, or more than `tolerance` extra peak memory.
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if result["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {result['throughput_rps']} < baseline {base['throughput_rps']}")
+        for key in ("p95_ms", "p99_ms"):
+            if result[key] > base[key] * (1 + tolerance):
+                regressions.append(f"{name}: {key} {result[key]} > baseline {base[key]}")
+        error_rate, base_rate = result["errors"] / result["requests"], base["errors"] / base["requests"]
+        if error_rate > base_rate + 0.01:
+            regressions.append(f"{name}: error rate {error_rate:.1%} > baseline {base_rate:.1%}")
+        if result.get("peak_rss_mb") and base.get("peak_rss_mb") and result["peak_rss_mb"] > base["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(f"{name}: peak RSS {result['peak_rss_mb']} MiB > baseline {base['peak_rss_mb']} MiB")
+    return regressions
+
+
+def print_table(results: Dict[str, dict]):
+    print(f"{'scenario':<12} {'reqs':>6} {'errors':>6} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'rss MiB':>8} {'peak MiB':>9}")
+    for name, r in results.items():
+        print(
+            f"{name:<12} {r['requests']:>6} {r['errors']:>6} {r['throughput_rps']:>8} {r['p50_ms']:>9} "
+            f"{r['p95_ms']:>9} {r['p99_ms']:>9} {r['rss_mb'] or '-':>8} {r['peak_rss_mb'] or '-':>9}"
+        )
+
+
+def settings(args) -> dict:
+    """
+    The knobs a baseline was recorded with; comparing runs with different settings is meaningless.
+    """
+    return {
+        "concurrency": args.concurrency, "requests": args.requests, "ttft": args.ttft,
+        "tokens_per_second": args.tokens_per_second, "jitter": args.jitter, "tokens": args.tokens,
+        "error_rate": args.error_rate, "drop_rate": args.drop_rate, "hermetic": args.url is None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", help="Benchmark a running server instead of starting a hermetic one.")
+    parser.add_argument("--pid", type=int, help="Server pid to sample memory from when using --url.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"Comma-separated subset of {SCENARIOS}.")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario.")
+    parser.add_argument("--ttft", type=float, default=0.05)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--tokens", type=int, default=32)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--env", action="append", default=[], help="Extra server env for hermetic runs (KEY=VALUE).")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression.")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--json", type=Path, help="Also write the results to this file.")
+    parser.add_argument("--verbose", action="store_true", help="Show server output.")
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {sorted(unknown)}")
+
+    def run(base_url: str, pid: Optional[int]) -> Dict[str, dict]:
+        factories = scenario_factories(base_url)
+        return {
+            name: asyncio.run(run_scenario(name, factories[name], args.concurrency, args.requests, pid))
+            for name in scenarios
+        }
+
+    if args.url:
+        results = run(args.url.rstrip("/"), args.pid)
+    else:
+        with hermetic_server(args) as (base_url, pid):
+            results = run(base_url, pid)
+
+    print_table(results)
+    report = {"settings": settings(args), "scenarios": results}
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2) + "\n")
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Baseline written to {args.baseline}")
+        return
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; run with --update-baseline to record one.")
+        return
+
+    baseline = json.loads(args.baseline.read_text())
+    if baseline.get("settings") != report["settings"]:
+        print(f"Baseline settings differ, not comparing: {baseline.get('settings')}")
+        return
+    regressions = compare(results, baseline["scenarios"], args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        sys.exit(1)
+    print(f"No regressions versus {args.baseline} (tolerance {args.tolerance:.0%}).")
+
+
+if __name__ == "__main__":
+    main()
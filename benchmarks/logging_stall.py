@@ -0,0 +1,132 @@
+"""
+Logging event-loop stall benchmark: runs concurrent coroutines that log heavily while a monitor task measures
+how late the loop wakes it up, once per LOG_MODE (sync, queue), each in a fresh interpreter.
+
+    python -m benchmarks.logging_stall
+    python -m benchmarks.logging_stall --workers 50 --records 400 --format json
+    python -m benchmarks.logging_stall --slow-stdout-ms 0.2     # emulate a slow terminal / log collector
+
+Records go to stdout (discarded) and a rotating file in a temp directory. Loop lag is the oversleep of a
+1 ms `asyncio.sleep`; with synchronous handlers every write lands on the loop.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+
+ROOT = Path(__file__).resolve().parent.parent
+MODES = ("sync", "queue")
+
+
+class SlowStream:
+    """
+    Wraps a stream so each write takes at least `delay` seconds, like a pipe whose reader is falling behind.
+    """
+    def __init__(self, stream, delay: float):
+        self.stream = stream
+        self.delay = delay
+
+    def write(self, data: str) -> int:
+        time.sleep(self.delay)
+        return self.stream.write(data)
+
+    def flush(self):
+        self.stream.flush()
+
+
+async def workload(logger, workers: int, records: int) -> Dict[str, float]:
+    lags: List[float] = []
+    done = asyncio.Event()
+
+    async def monitor():
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append((time.perf_counter() - started - 0.001) * 1000)
+
+    async def worker(n: int):
+        for i in range(records):
+            logger.info("worker %d handled step %d", n, i, extra={"worker": n, "step": i})
+            if i % 10 == 9:
+                await asyncio.sleep(0)
+
+    watcher = asyncio.create_task(monitor())
+    await asyncio.sleep(0.01)
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(workers)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await watcher
+    lags.sort()
+    return {
+        "workload_ms": round(elapsed * 1000, 1),
+        "lag_p50_ms": round(statistics.median(lags), 3),
+        "lag_p99_ms": round(lags[int(len(lags) * 0.99) - 1], 3),
+        "lag_max_ms": round(lags[-1], 3),
+        "records_per_s": round(workers * records / elapsed),
+    }
+
+
+def child(args):
+    if args.slow_stdout_ms:
+        sys.stdout = SlowStream(sys.stdout, args.slow_stdout_ms / 1000)
+    from utils.logger_config import configure_logger, flush_logging
+
+    log_file = os.path.join(args.dir, "bench.log")
+    logger = configure_logger("LoggingBench", log_file=log_file)
+    result = asyncio.run(workload(logger, args.workers, args.records))
+    started = time.perf_counter()
+    flush_logging()
+    result["drain_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    logged = sum(1 for name in os.listdir(args.dir) if name.startswith("bench.log") for _ in open(os.path.join(args.dir, name)))
+    result["lines_written"] = logged
+    Path(args.result).write_text(json.dumps(result))
+
+
+def run_mode(mode: str, args) -> Dict[str, float]:
+    with tempfile.TemporaryDirectory(prefix="logging-bench-") as directory:
+        result_path = os.path.join(directory, "result.json")
+        log_dir = os.path.join(directory, "logs")
+        os.makedirs(log_dir)
+        env = {**os.environ, "LOG_MODE": mode, "LOG_FORMAT": args.format, "LOG_LEVEL": "INFO",
+               "LOG_QUEUE_SIZE": str(args.workers * args.records + 100)}
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.logging_stall", "--child", "--dir", log_dir, "--result", result_path,
+             "--workers", str(args.workers), "--records", str(args.records), "--slow-stdout-ms", str(args.slow_stdout_ms)],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, check=True,
+        )
+        return json.loads(Path(result_path).read_text())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=20)
+    parser.add_argument("--records", type=int, default=500, help="records per worker")
+    parser.add_argument("--format", choices=("text", "json"), default="text")
+    parser.add_argument("--slow-stdout-ms", type=float, default=0.0)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--dir", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args)
+        return
+
+    print(f"{args.workers} workers x {args.records} records, format={args.format}, slow stdout={args.slow_stdout_ms} ms")
+    print(f"{'mode':<7}{'workload ms':>13}{'lag p50':>10}{'lag p99':>10}{'lag max':>10}{'rec/s':>10}{'drain ms':>10}{'lines':>8}")
+    for mode in MODES:
+        r = run_mode(mode, args)
+        print(f"{mode:<7}{r['workload_ms']:>13}{r['lag_p50_ms']:>10}{r['lag_p99_ms']:>10}{r['lag_max_ms']:>10}"
+              f"{r['records_per_s']:>10}{r['drain_ms']:>10}{r['lines_written']:>8}")
+
+
+if __name__ == "__main__":
+    main()
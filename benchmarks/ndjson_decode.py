@@ -0,0 +1,97 @@
+"""
+NDJSON decoding microbenchmark: replays recorded Ollama /api/generate streams and reports frames/s.
+
+    curl -sN http://localhost:11434/api/generate -d '{"model": "llama3.2:1b", "prompt": "Hi"}' > hi.ndjson
+    python -m benchmarks.ndjson_decode hi.ndjson
+
+Without files a synthetic 2000-token stream is used. Each stream is cut into network-sized chunks
+at arbitrary byte offsets, as httpx would hand them over.
+"""
+import argparse
+import json
+import random
+import time
+from typing import Callable, List
+import utils.ndjson as ndjson
+from utils.ndjson import NDJSONDecoder
+
+
+def synthetic_stream(tokens: int = 2000) -> bytes:
+    frames = [
+        {"model": "llama3.2:1b", "created_at": "2025-01-01T00:00:00.000000Z", "response": f" tok{i}", "done": False}
+        for i in range(tokens)
+    ]
+    frames.append({
+        "model": "llama3.2:1b", "created_at": "2025-01-01T00:00:10.000000Z", "response": "", "done": True,
+        "done_reason": "stop", "context": list(range(tokens)), "total_duration": 10_000_000_000,
+        "load_duration": 1_000_000, "prompt_eval_count": 26, "prompt_eval_duration": 50_000_000,
+        "eval_count": tokens, "eval_duration": 9_000_000_000,
+    })
+    return "".join(json.dumps(frame) + "\n" for frame in frames).encode()
+
+
+def network_chunks(stream: bytes, rng: random.Random, low: int = 64, high: int = 1400) -> List[bytes]:
+    chunks, offset = [], 0
+    while offset < len(stream):
+        size = rng.randint(low, high)
+        chunks.append(stream[offset:offset + size])
+        offset += size
+    return chunks
+
+
+def decode_text_lines(chunks: List[bytes]) -> int:
+    """
+    The previous path: decode to text, split lines, strip an SSE `data:` prefix, json.loads each line.
+    """
+    frames, buffer = 0, ""
+    for chunk in chunks:
+        buffer += chunk.decode()
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            if line.strip():
+                if line.startswith("data:"):
+                    line = line.removeprefix("data:").strip()
+                json.loads(line)
+                frames += 1
+    return frames
+
+
+def decode_bytes(chunks: List[bytes]) -> int:
+    decoder = NDJSONDecoder()
+    for chunk in chunks:
+        decoder.feed(chunk)
+    decoder.flush()
+    return decoder.frames
+
+
+def measure(name: str, decode: Callable[[List[bytes]], int], chunks: List[bytes], repeat: int):
+    started = time.perf_counter()
+    frames = sum(decode(chunks) for _ in range(repeat))
+    elapsed = time.perf_counter() - started
+    print(f"{name:<18} {frames / elapsed:>12,.0f} frames/s  ({elapsed / repeat * 1000:.2f} ms per stream)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("streams", nargs="*", help="Recorded NDJSON streams to replay.")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    streams = [open(path, "rb").read() for path in args.streams] or [synthetic_stream()]
+    chunks = [chunk for stream in streams for chunk in network_chunks(stream, rng)]
+    print(f"{len(streams)} stream(s), {sum(map(len, streams)):,} bytes, {len(chunks)} chunks")
+
+    measure("text lines + json", decode_text_lines, chunks, args.repeat)
+    decoder = json.JSONDecoder()
+    ndjson.loads = lambda line: decoder.decode(line.decode())
+    measure("bytes + json", decode_bytes, chunks, args.repeat)
+    if ndjson.orjson is not None:
+        ndjson.loads = ndjson.orjson.loads
+        measure("bytes + orjson", decode_bytes, chunks, args.repeat)
+    else:
+        print("bytes + orjson     skipped (orjson not installed)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Semantic cache benchmark: lookup latency and hit rate of a VectorIndex at a given size.
+
+    python -m benchmarks.semantic_cache --entries 1000000 --dim 384 --dir /tmp/semantic-bench
+
+Half of the queries are paraphrase-like perturbations of stored vectors (should hit), the other
+half are unrelated vectors (should miss). Embeddings are synthetic, so no Ollama is needed.
+"""
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+from utils.semantic_cache import VectorIndex
+
+
+def random_units(rng: np.random.Generator, count: int, dim: int) -> np.ndarray:
+    vectors = rng.standard_normal((count, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def perturb(rng: np.random.Generator, vector: np.ndarray, similarity: float) -> np.ndarray:
+    """
+    Unit vector with the given cosine similarity to `vector`.
+    """
+    noise = rng.standard_normal(vector.shape[0]).astype(np.float32)
+    noise -= noise.dot(vector) * vector
+    noise /= np.linalg.norm(noise)
+    return similarity * vector + np.sqrt(1 - similarity ** 2) * noise
+
+
+def fill(index: VectorIndex, rng: np.random.Generator, entries: int, chunk: int = 65536):
+    for start in range(0, entries, chunk):
+        count = min(chunk, entries - start)
+        index.vectors[start:start + count] = random_units(rng, count, index.dim)
+        index.values[start:start + count] = [f"answer {i}" for i in range(start, start + count)]
+    index.size = entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--threshold", type=float, default=0.95)
+    parser.add_argument("--similarity", type=float, default=0.97, help="Cosine of the near-duplicate queries.")
+    parser.add_argument("--dir", default=None, help="Memory-map the vectors here (default: a temp dir).")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    directory = Path(args.dir or tempfile.mkdtemp(prefix="semantic-bench-"))
+    index = VectorIndex(args.dim, args.entries, directory / "bench.f32")
+    started = time.perf_counter()
+    fill(index, rng, args.entries)
+    print(f"filled {args.entries} x {args.dim} ({args.entries * args.dim * 4 / 2**20:.0f} MiB) "
+          f"in {time.perf_counter() - started:.1f}s")
+
+    latencies, expected_hits, hits, wrong = [], 0, 0, 0
+    for i in range(args.queries):
+        duplicate = i % 2 == 0
+        if duplicate:
+            target = int(rng.integers(args.entries))
+            query = perturb(rng, np.array(index.vectors[target]), args.similarity)
+            expected_hits += 1
+        else:
+            target, query = -1, random_units(rng, 1, args.dim)[0]
+        started = time.perf_counter()
+        row, score = index.search(query)
+        latencies.append((time.perf_counter() - started) * 1000)
+        if score >= args.threshold:
+            hits += 1
+            wrong += row != target
+    latencies.sort()
+    print(f"lookup ms: p50={statistics.median(latencies):.2f} "
+          f"p95={latencies[int(len(latencies) * 0.95) - 1]:.2f} max={latencies[-1]:.2f}")
+    print(f"hit rate: {hits}/{args.queries} (expected {expected_hits}), wrong answers: {wrong}")
+
+
+if __name__ == "__main__":
+    main()
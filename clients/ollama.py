@@ -0,0 +1,214 @@
+import asyncio
+import hashlib
+import httpx
+from contextlib import asynccontextmanager
+from os import getenv
+from typing import Iterable, List, Optional, Set
+from utils.logger_config import configure_logger
+
+
+logger = configure_logger("OllamaClient")
+
+OLLAMA_BASE_URL = getenv("OLLAMA_BASE_URL", "http://192.168.1.20:11434")
+# Comma-separated pool of Ollama backends; defaults to the single OLLAMA_BASE_URL.
+OLLAMA_BASE_URLS = getenv("OLLAMA_BASE_URLS", OLLAMA_BASE_URL)
+OLLAMA_LB_STRATEGY = getenv("OLLAMA_LB_STRATEGY", "least_outstanding")  # or "model_affinity"
+OLLAMA_HTTP2 = getenv("OLLAMA_HTTP2", "true").lower() == "true"
+OLLAMA_MAX_CONNECTIONS = int(getenv("OLLAMA_MAX_CONNECTIONS", "100"))
+OLLAMA_MAX_KEEPALIVE_CONNECTIONS = int(getenv("OLLAMA_MAX_KEEPALIVE_CONNECTIONS", "20"))
+OLLAMA_KEEPALIVE_EXPIRY = float(getenv("OLLAMA_KEEPALIVE_EXPIRY", "30.0"))
+OLLAMA_CONNECT_TIMEOUT = float(getenv("OLLAMA_CONNECT_TIMEOUT", "5.0"))
+OLLAMA_READ_TIMEOUT = float(getenv("OLLAMA_READ_TIMEOUT", "60.0"))
+OLLAMA_POOL_TIMEOUT = float(getenv("OLLAMA_POOL_TIMEOUT", "10.0"))
+OLLAMA_HEALTH_INTERVAL = float(getenv("OLLAMA_HEALTH_INTERVAL", "10.0"))
+OLLAMA_HEALTH_TIMEOUT = float(getenv("OLLAMA_HEALTH_TIMEOUT", "2.0"))
+OLLAMA_EJECT_AFTER_FAILURES = int(getenv("OLLAMA_EJECT_AFTER_FAILURES", "3"))
+
+
+def _strip_latest(model: str) -> str:
+    return model.removesuffix(":latest")
+
+
+class OllamaBackend:
+    """
+    One Ollama instance in the pool, with its routing and health state.
+    """
+    def __init__(self, url: str, eject_after_failures: int = OLLAMA_EJECT_AFTER_FAILURES):
+        self.url = url.rstrip("/")
+        self.eject_after_failures = eject_after_failures
+        self.healthy = True
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.loaded_models: Set[str] = set()
+
+    def has_model(self, model: str) -> bool:
+        return _strip_latest(model) in self.loaded_models
+
+    @asynccontextmanager
+    async def track(self):
+        self.outstanding += 1
+        self.requests += 1
+        try:
+            yield self
+        finally:
+            self.outstanding -= 1
+
+    def mark_success(self):
+        self.failures = 0
+        if not self.healthy:
+            self.healthy = True
+            logger.info(f"Ollama backend re-admitted: {self.url}")
+
+    def mark_failure(self):
+        self.failures += 1
+        if self.healthy and self.failures >= self.eject_after_failures:
+            self.healthy = False
+            logger.warning(f"Ollama backend ejected after {self.failures} failures: {self.url}")
+
+    def stats(self) -> dict:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "loaded_models": sorted(self.loaded_models),
+        }
+
+
+class OllamaClient:
+    """
+    Long-lived, connection-pooled HTTP client for a pool of Ollama backends.
+    A single instance is shared by every tool so connections are kept alive between calls.
+    """
+    def __init__(
+            self,
+            base_urls: Iterable[str] | str = OLLAMA_BASE_URLS,
+            strategy: str = OLLAMA_LB_STRATEGY,
+            http2: bool = OLLAMA_HTTP2,
+            max_connections: int = OLLAMA_MAX_CONNECTIONS,
+            max_keepalive_connections: int = OLLAMA_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry: float = OLLAMA_KEEPALIVE_EXPIRY,
+            connect_timeout: float = OLLAMA_CONNECT_TIMEOUT,
+            read_timeout: float = OLLAMA_READ_TIMEOUT,
+            pool_timeout: float = OLLAMA_POOL_TIMEOUT,
+            health_interval: float = OLLAMA_HEALTH_INTERVAL,
+            transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        if isinstance(base_urls, str):
+            base_urls = base_urls.split(",")
+        self.backends: List[OllamaBackend] = [OllamaBackend(url.strip()) for url in base_urls if url.strip()]
+        if not self.backends:
+            raise ValueError("At least one Ollama backend URL is required")
+        self.strategy = strategy
+        self.http2 = http2
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout, pool=pool_timeout)
+        self.health_interval = health_interval
+        self.transport = transport
+        self.client: Optional[httpx.AsyncClient] = None
+        self._health_task: Optional[asyncio.Task] = None
+
+    @property
+    def base_url(self) -> str:
+        return self.backends[0].url
+
+    async def connect(self):
+        if self.client is None:
+            http2 = self.http2
+            if http2:
+                try:
+                    import h2  # noqa: F401
+                except ImportError:
+                    logger.warning("HTTP/2 requested but 'h2' is not installed, falling back to HTTP/1.1.")
+                    http2 = False
+            self.client = httpx.AsyncClient(
+                http2=http2,
+                limits=self.limits,
+                timeout=self.timeout,
+                transport=self.transport,
+            )
+            logger.info(f"Ollama client ready: {[b.url for b in self.backends]} (http2={http2}, strategy={self.strategy})")
+            if self.health_interval > 0:
+                self._health_task = asyncio.create_task(self._health_loop())
+
+    async def close(self):
+        if self._health_task:
+            # Let an in-flight probe unwind before its HTTP client goes away.
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+        if self.client:
+            await self.client.aclose()
+            self.client = None
+            logger.info("Ollama client closed")
+
+    async def get_client(self) -> httpx.AsyncClient:
+        await self.connect()
+        return self.client
+
+    def pick(self, model: str, exclude: Iterable[OllamaBackend] = ()) -> OllamaBackend:
+        """
+        Choose a backend for `model`: healthy nodes first, then nodes that already have the model loaded,
+        then by strategy (least outstanding requests, or rendezvous-hash affinity per model).
+        Falls back to ejected nodes rather than failing when nothing healthy is left.
+        """
+        excluded = set(map(id, exclude))
+        available = [b for b in self.backends if id(b) not in excluded] or self.backends
+        candidates = [b for b in available if b.healthy] or available
+        candidates = [b for b in candidates if b.has_model(model)] or candidates
+        if self.strategy == "model_affinity":
+            return max(candidates, key=lambda b: hashlib.md5(f"{model}|{b.url}".encode()).digest())
+        return min(candidates, key=lambda b: (b.outstanding, b.requests))
+
+    async def probe(self, backend: OllamaBackend):
+        client = await self.get_client()
+        try:
+            response = await client.get(f"{backend.url}/api/ps", timeout=OLLAMA_HEALTH_TIMEOUT)
+            response.raise_for_status()
+            models = response.json().get("models", [])
+            backend.loaded_models = {_strip_latest(m.get("name") or m.get("model", "")) for m in models}
+            backend.mark_success()
+        except Exception as e:
+            logger.debug("Health probe failed for %s: %s", backend.url, e)
+            backend.mark_failure()
+
+    async def probe_all(self):
+        await asyncio.gather(*(self.probe(backend) for backend in self.backends))
+
+    async def _health_loop(self):
+        while True:
+            await self.probe_all()
+            await asyncio.sleep(self.health_interval)
+
+    def stats(self) -> dict:
+        return {"strategy": self.strategy, "backends": [b.stats() for b in self.backends]}
+
+
+_shared_client: Optional[OllamaClient] = None
+
+
+def set_ollama_client(client: Optional[OllamaClient]):
+    """
+    Register the process-wide client. Called by the lifespan on startup and shutdown.
+    """
+    global _shared_client
+    _shared_client = client
+
+
+def get_ollama_client() -> OllamaClient:
+    """
+    Return the process-wide client, creating one lazily when no lifespan registered it (e.g. server.py).
+    """
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = OllamaClient()
+    return _shared_client
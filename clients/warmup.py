@@ -0,0 +1,95 @@
+import asyncio
+from os import getenv
+from typing import List, Optional
+from clients.ollama import OllamaClient, OllamaBackend
+from utils.logger_config import configure_logger
+
+
+logger = configure_logger("ModelWarmer")
+
+OLLAMA_KEEP_ALIVE = getenv("OLLAMA_KEEP_ALIVE", "30m")
+# Extra models to keep resident besides DEFAULT_MODEL (comma-separated).
+OLLAMA_PRELOAD_MODELS = getenv("OLLAMA_PRELOAD_MODELS", "")
+OLLAMA_WARMUP_REFRESH = float(getenv("OLLAMA_WARMUP_REFRESH", "600"))
+OLLAMA_WARMUP_RETRY = float(getenv("OLLAMA_WARMUP_RETRY", "5"))
+OLLAMA_WARMUP_TIMEOUT = float(getenv("OLLAMA_WARMUP_TIMEOUT", "300"))
+
+
+def configured_models() -> List[str]:
+    models = [getenv("DEFAULT_MODEL", "llama3.2:1b-instruct-q4_K_M")]
+    models += [m.strip() for m in OLLAMA_PRELOAD_MODELS.split(",") if m.strip()]
+    return list(dict.fromkeys(models))
+
+
+class ModelWarmer:
+    """
+    Load the configured models on every backend at startup and refresh them before Ollama's
+    keep_alive expires, so interactive callers never pay the cold-start penalty.
+    `ready` turns true once every model has been loaded at least once.
+    """
+    def __init__(
+            self,
+            ollama: OllamaClient,
+            models: Optional[List[str]] = None,
+            keep_alive: str = OLLAMA_KEEP_ALIVE,
+            refresh_interval: float = OLLAMA_WARMUP_REFRESH,
+            retry_interval: float = OLLAMA_WARMUP_RETRY,
+    ):
+        self.ollama = ollama
+        self.models = models if models is not None else configured_models()
+        self.keep_alive = keep_alive
+        self.refresh_interval = refresh_interval
+        self.retry_interval = retry_interval
+        self.ready = not self.models
+        self.warm = {model: False for model in self.models}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None and self.models:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def preload(self, backend: OllamaBackend, model: str) -> bool:
+        client = await self.ollama.get_client()
+        try:
+            # An empty prompt makes Ollama load the model and keep it resident for `keep_alive`.
+            response = await client.post(
+                f"{backend.url}/api/generate",
+                json={"model": model, "keep_alive": self.keep_alive},
+                timeout=OLLAMA_WARMUP_TIMEOUT,
+            )
+            response.raise_for_status()
+            backend.loaded_models.add(model.removesuffix(":latest"))
+            return True
+        except Exception as e:
+            logger.warning(f"Preloading {model} on {backend.url} failed: {e}")
+            return False
+
+    async def warm_all(self) -> bool:
+        for model in self.models:
+            results = await asyncio.gather(*(self.preload(b, model) for b in self.ollama.backends if b.healthy))
+            if any(results):
+                if not self.warm[model]:
+                    logger.info(f"Model {model} warmed on {sum(results)}/{len(results)} backends.")
+                self.warm[model] = True
+        self.ready = all(self.warm.values())
+        return self.ready
+
+    async def _run(self):
+        while not await self.warm_all():
+            await asyncio.sleep(self.retry_interval)
+        logger.info(f"Warm-up complete: {self.models}")
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self.warm_all()
+
+    def stats(self) -> dict:
+        return {"ready": self.ready, "keep_alive": self.keep_alive, "models": self.warm}
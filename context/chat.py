@@ -1,17 +1,23 @@
 from mcp.server.fastmcp import Context
-from typing import List, Dict
+from typing import List, Dict, Union
+from context.session_kv import SessionKVStore
+from context.session_store import SessionStore
 from utils.logger_config import configure_logger
 
 LAST_N_MESSAGES = 2
-chat_memory_store: Dict[str, List[Dict]] = {}
+chat_memory_store = SessionStore("chat", max_turns=LAST_N_MESSAGES)
+# Ollama KV contexts of the multi-turn chat sessions, keyed like chat_memory_store.
+chat_kv_store = SessionKVStore()
 
 logger = configure_logger("ChatContext")
 
-def get_chat_context(ctx: Context) -> List[Dict]:
-    return chat_memory_store.get(ctx.request_id, [])
+def _session_id(ctx: Union[Context, str]) -> str:
+    return ctx if isinstance(ctx, str) else ctx.request_id
 
-def update_chat_context(ctx: Context, new_turn: Dict):
-    session_id = ctx.request_id
-    chat_memory_store.setdefault(session_id, []).append(new_turn)
-    chat_memory_store[session_id] = chat_memory_store[session_id][-LAST_N_MESSAGES:]
-    logger.info(f"[{session_id}] Memory updated with {len(chat_memory_store[session_id])} turns.")
+async def get_chat_context(ctx: Union[Context, str]) -> List[Dict]:
+    return await chat_memory_store.get(_session_id(ctx))
+
+async def update_chat_context(ctx: Union[Context, str], *new_turns: Dict):
+    session_id = _session_id(ctx)
+    await chat_memory_store.append(session_id, *new_turns)
+    logger.info("[%s] Memory updated with %d turns.", session_id, len(new_turns))
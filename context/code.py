@@ -1,18 +1,23 @@
 from mcp.server.fastmcp import Context
-from typing import Dict, List
+from typing import Dict, List, Union
+from context.session_kv import SessionKVStore
+from context.session_store import SessionStore
 from utils.logger_config import configure_logger
 
 LAST_N_MESSAGES = 3
-code_thread_store: Dict[str, List[Dict]] = {}  # Each message is a dict with role + content
+code_thread_store = SessionStore("code", max_turns=LAST_N_MESSAGES)  # Each turn is a dict with role + content
+# Ollama KV contexts of the coding threads, keyed like code_thread_store.
+code_kv_store = SessionKVStore()
 
 logger = configure_logger("CodingContext")
 
-def get_code_context(ctx: Context) -> List[Dict]:
-    return code_thread_store.get(ctx.request_id, [])
+def _session_id(ctx: Union[Context, str]) -> str:
+    return ctx if isinstance(ctx, str) else ctx.request_id
 
-def append_code_context(ctx: Context, new_turn: Dict):
-    session_id = ctx.request_id
-    code_thread_store.setdefault(session_id, []).append(new_turn)
-    code_thread_store[session_id] = code_thread_store[session_id][-LAST_N_MESSAGES:]
-    logger.info(f"[{session_id}] Memory updated with {len(code_thread_store[session_id])} turns.")
+async def get_code_context(ctx: Union[Context, str]) -> List[Dict]:
+    return await code_thread_store.get(_session_id(ctx))
 
+async def append_code_context(ctx: Union[Context, str], *new_turns: Dict):
+    session_id = _session_id(ctx)
+    await code_thread_store.append(session_id, *new_turns)
+    logger.info("[%s] Memory updated with %d turns.", session_id, len(new_turns))
@@ -0,0 +1,81 @@
+import time
+from array import array
+from collections import OrderedDict
+from os import getenv
+from typing import List, Optional, Tuple
+
+
+SESSION_KV_MAX_SESSIONS = int(getenv("SESSION_KV_MAX_SESSIONS", "1000"))
+SESSION_KV_MAX_TOKENS = int(getenv("SESSION_KV_MAX_TOKENS", "4000000"))
+SESSION_KV_MAX_TOKENS_PER_SESSION = int(getenv("SESSION_KV_MAX_TOKENS_PER_SESSION", "8192"))
+SESSION_KV_TTL = float(getenv("SESSION_KV_TTL", "1800"))
+
+
+class SessionKVStore:
+    """
+    Bounded LRU of the `context` token arrays returned by Ollama's /api/generate, per session.
+    Sending the array back on the next turn lets Ollama reuse the already evaluated prompt.
+    Tokens are kept as compact int32 arrays; sessions are evicted by TTL, count and total tokens.
+    Each entry records the session history version it covers: the history may be shared with other workers,
+    and a context that misses turns they served must not be reused.
+    """
+    def __init__(
+            self,
+            max_sessions: int = SESSION_KV_MAX_SESSIONS,
+            max_tokens: int = SESSION_KV_MAX_TOKENS,
+            max_tokens_per_session: int = SESSION_KV_MAX_TOKENS_PER_SESSION,
+            ttl: float = SESSION_KV_TTL,
+    ):
+        self.max_sessions = max_sessions
+        self.max_tokens = max_tokens
+        self.max_tokens_per_session = max_tokens_per_session
+        self.ttl = ttl
+        self.total_tokens = 0
+        self._data: "OrderedDict[str, Tuple[str, array, float, int]]" = OrderedDict()
+        self.metrics = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, session_id: str, model: str, version: int = 0) -> Optional[List[int]]:
+        item = self._data.get(session_id)
+        if item is None or item[0] != model or item[2] < time.monotonic() or item[3] != version:
+            if item is not None:
+                self._remove(session_id)
+            self.metrics["misses"] += 1
+            return None
+        self._data.move_to_end(session_id)
+        self.metrics["hits"] += 1
+        return item[1].tolist()
+
+    def put(self, session_id: str, model: str, tokens: List[int], version: int = 0):
+        self._remove(session_id)
+        if not tokens or len(tokens) > self.max_tokens_per_session:
+            # Too long to be worth keeping: the next turn re-primes from the text history instead.
+            return
+        self._data[session_id] = (model, array("i", tokens), time.monotonic() + self.ttl, version)
+        self.total_tokens += len(tokens)
+        self._evict()
+
+    def drop(self, session_id: str):
+        self._remove(session_id)
+
+    def _remove(self, session_id: str):
+        item = self._data.pop(session_id, None)
+        if item is not None:
+            self.total_tokens -= len(item[1])
+
+    def _evict(self):
+        now = time.monotonic()
+        for session_id in [s for s, (_, _, expires, _) in self._data.items() if expires < now]:
+            self._remove(session_id)
+            self.metrics["evictions"] += 1
+        while self._data and (len(self._data) > self.max_sessions or self.total_tokens > self.max_tokens):
+            session_id, (_, tokens, _, _) = self._data.popitem(last=False)
+            self.total_tokens -= len(tokens)
+            self.metrics["evictions"] += 1
+
+    def stats(self) -> dict:
+        return {
+            **self.metrics,
+            "sessions": len(self._data),
+            "total_tokens": self.total_tokens,
+            "approx_bytes": self.total_tokens * 4,
+        }
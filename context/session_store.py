@@ -0,0 +1,401 @@
+import json
+import sys
+import time
+from collections import OrderedDict, deque
+from os import getenv
+from typing import Callable, Deque, Dict, List, NamedTuple, Optional, Tuple
+from utils.logger_config import configure_logger
+from utils.metrics import gauge_callbacks
+
+
+logger = configure_logger("SessionStore")
+
+# "auto" keeps sessions in Redis once LifespanContext attaches it (shared by all workers), in-process otherwise.
+SESSION_STORE_BACKEND = getenv("SESSION_STORE_BACKEND", "auto").lower()
+SESSION_MAX_SESSIONS = int(getenv("SESSION_MAX_SESSIONS", "10000"))
+SESSION_MAX_BYTES = int(getenv("SESSION_MAX_BYTES", str(64 * 2**20)))
+SESSION_MAX_SESSION_BYTES = int(getenv("SESSION_MAX_SESSION_BYTES", str(64 * 2**10)))
+SESSION_TTL = float(getenv("SESSION_TTL", "1800"))
+SESSION_KEY_PREFIX = getenv("SESSION_KEY_PREFIX", "mcp:session")
+
+Turn = Tuple[str, str]  # (role, content)
+RawState = Tuple[str, List[Turn], List[Turn], int, int]  # (summary, turns, pending, version, pending_start)
+
+
+class SessionState(NamedTuple):
+    summary: str
+    turns: List[Dict]  # the most recent turns, kept verbatim
+    pending: List[Dict]  # older turns pushed out of the ring buffer, not yet folded into the summary
+    version: int = 0  # turns appended since the session started: tells whether a cached KV context is current
+    pending_start: int = 0  # sequence number of the first pending turn: turns left pending, folded or trimmed
+
+
+def _turn_bytes(turn: Turn) -> int:
+    return sys.getsizeof(turn[0]) + sys.getsizeof(turn[1])
+
+
+def _as_dicts(turns) -> List[Dict]:
+    return [{"role": role, "content": content} for role, content in turns]
+
+
+def _session_state(raw: RawState) -> SessionState:
+    summary, turns, pending, version, pending_start = raw
+    return SessionState(summary, _as_dicts(turns), _as_dicts(pending), version, pending_start)
+
+
+def _push(turns: Deque[Turn], pending: List[Turn], new_turns: List[Turn]):
+    """
+    Append to the ring buffer; turns it pushes out move to `pending`, awaiting summarization.
+    """
+    for turn in new_turns:
+        if len(turns) == turns.maxlen:
+            pending.append(turns.popleft())
+        turns.append(turn)
+
+
+def _trim(turns: Deque[Turn], pending: List[Turn], size: int, max_bytes: int) -> int:
+    """
+    Drop the oldest pending turns, then the oldest recent ones, while the session is over `max_bytes`;
+    the newest turn is always kept. Returns the remaining size.
+    """
+    while size > max_bytes and pending:
+        size -= _turn_bytes(pending.pop(0))
+    while size > max_bytes and len(turns) > 1:
+        size -= _turn_bytes(turns.popleft())
+    return size
+
+
+class _Session:
+    __slots__ = ("turns", "pending", "summary", "version", "pending_start", "size", "expires")
+
+    def __init__(self, max_turns: int):
+        self.turns: Deque[Turn] = deque(maxlen=max_turns)
+        self.pending: List[Turn] = []
+        self.summary = ""
+        self.version = 0
+        self.pending_start = 0
+        self.size = sys.getsizeof(self.summary)
+        self.expires = 0.0
+
+
+def _raw_state(session: _Session) -> RawState:
+    return session.summary, list(session.turns), list(session.pending), session.version, session.pending_start
+
+
+class InMemorySessionStore:
+    """
+    Per-process session turns: a fixed-size ring buffer of (role, content) tuples per session, plus the turns
+    it pushed out and the rolling summary of older ones, in an LRU with a sliding TTL, bounded by session count
+    and by the total size of the stored strings.
+    """
+    def __init__(
+            self,
+            max_turns: int,
+            max_sessions: int = SESSION_MAX_SESSIONS,
+            max_bytes: int = SESSION_MAX_BYTES,
+            max_session_bytes: int = SESSION_MAX_SESSION_BYTES,
+            ttl: float = SESSION_TTL,
+    ):
+        self.max_turns = max_turns
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.max_session_bytes = max_session_bytes
+        self.ttl = ttl
+        self.total_bytes = 0
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self.metrics = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def _touch(self, session_id: str) -> Optional[_Session]:
+        session = self._sessions.get(session_id)
+        if session is None or session.expires < time.monotonic():
+            if session is not None:
+                self._remove(session_id)
+                self.metrics["expirations"] += 1
+            self.metrics["misses"] += 1
+            return None
+        session.expires = time.monotonic() + self.ttl
+        self._sessions.move_to_end(session_id)
+        self.metrics["hits"] += 1
+        return session
+
+    def get(self, session_id: str) -> List[Turn]:
+        session = self._touch(session_id)
+        return list(session.turns) if session else []
+
+    def state(self, session_id: str) -> RawState:
+        session = self._touch(session_id)
+        return _raw_state(session) if session else ("", [], [], 0, 0)
+
+    def append(self, session_id: str, turns: List[Turn]) -> RawState:
+        """
+        Add turns to the session; returns its state afterwards.
+        """
+        session = self._sessions.get(session_id)
+        if session is None or session.expires < time.monotonic():
+            self._remove(session_id)
+            session = self._sessions[session_id] = _Session(self.max_turns)
+            self.total_bytes += session.size
+        before = session.size
+        _push(session.turns, session.pending, turns)
+        session.version += len(turns)
+        session.size += sum(map(_turn_bytes, turns))
+        pending = len(session.pending)
+        session.size = _trim(session.turns, session.pending, session.size, self.max_session_bytes)
+        session.pending_start += pending - len(session.pending)
+        session.expires = time.monotonic() + self.ttl
+        self.total_bytes += session.size - before
+        self._sessions.move_to_end(session_id)
+        self._evict()
+        return _raw_state(session)
+
+    def set_summary(self, session_id: str, summary: str, start: int, consumed: int) -> bool:
+        """
+        Replace the summary with one covering the `consumed` pending turns from sequence number `start`, and drop
+        those. Returns False, leaving the session as is, when the pending turns no longer start there (trimmed
+        or folded meanwhile): the summary would not cover what it replaces.
+        """
+        session = self._sessions.get(session_id)
+        if session is None or session.pending_start != start or len(session.pending) < consumed:
+            return False
+        before = session.size
+        folded, session.pending = session.pending[:consumed], session.pending[consumed:]
+        session.pending_start += consumed
+        session.size += sys.getsizeof(summary) - sys.getsizeof(session.summary) - sum(map(_turn_bytes, folded))
+        session.summary = summary
+        self.total_bytes += session.size - before
+        self._evict()
+        return True
+
+    def drop(self, session_id: str):
+        self._remove(session_id)
+
+    def _remove(self, session_id: str):
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self.total_bytes -= session.size
+
+    def _evict(self):
+        now = time.monotonic()
+        # Sliding expiry keeps the LRU order by expiry too: expired sessions are all at the front.
+        while self._sessions and next(iter(self._sessions.values())).expires < now:
+            self._remove(next(iter(self._sessions)))
+            self.metrics["expirations"] += 1
+        while self._sessions and (len(self._sessions) > self.max_sessions or self.total_bytes > self.max_bytes):
+            self._remove(next(iter(self._sessions)))
+            self.metrics["evictions"] += 1
+
+    def stats(self) -> dict:
+        return {**self.metrics, "sessions": len(self._sessions), "bytes": self.total_bytes}
+
+
+class RedisSessionStore:
+    """
+    Session turns shared by all workers: one compact JSON document per session under `<prefix>:<name>:<id>`,
+    with the TTL refreshed on every write. Updates are read-modify-writes in a WATCH/MULTI transaction
+    (`RedisDB.transform`), so concurrent turns and summaries from different workers do not overwrite each
+    other. The ring-buffer and per-session size limits are applied before writing; Redis' own maxmemory
+    policy is the global cap.
+    """
+    def __init__(
+            self,
+            redis_db,
+            name: str,
+            max_turns: int,
+            max_session_bytes: int = SESSION_MAX_SESSION_BYTES,
+            ttl: float = SESSION_TTL,
+            prefix: str = SESSION_KEY_PREFIX,
+    ):
+        self.redis = redis_db
+        self.name = name
+        self.max_turns = max_turns
+        self.max_session_bytes = max_session_bytes
+        self.ttl = ttl
+        self.prefix = prefix
+        self.metrics = {"hits": 0, "misses": 0, "writes": 0, "bytes_written": 0}
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.prefix}:{self.name}:{session_id}"
+
+    def _decode(self, value: Optional[str]) -> Tuple[str, Deque[Turn], List[Turn], int, int]:
+        document = json.loads(value) if value else {}
+        return (
+            document.get("summary", ""),
+            deque((tuple(turn) for turn in document.get("turns", ())), maxlen=self.max_turns),
+            [tuple(turn) for turn in document.get("pending", ())],
+            document.get("version", 0),
+            document.get("start", 0),
+        )
+
+    def _encode(self, summary: str, turns: Deque[Turn], pending: List[Turn], version: int, start: int) -> str:
+        size = sys.getsizeof(summary) + sum(map(_turn_bytes, turns)) + sum(map(_turn_bytes, pending))
+        count = len(pending)
+        _trim(turns, pending, size, self.max_session_bytes)
+        return json.dumps(
+            {"summary": summary, "turns": list(turns), "pending": pending, "version": version,
+             "start": start + count - len(pending)},
+            ensure_ascii=False, separators=(",", ":"),
+        )
+
+    def _raw(self, value: Optional[str]) -> RawState:
+        summary, turns, pending, version, start = self._decode(value)
+        return summary, list(turns), pending, version, start
+
+    async def state(self, session_id: str) -> RawState:
+        rows = await self.redis.read({"key": self._key(session_id)})
+        value = rows[0]["value"] if rows else None
+        self.metrics["hits" if value else "misses"] += 1
+        return self._raw(value)
+
+    async def get(self, session_id: str) -> List[Turn]:
+        return (await self.state(session_id))[1]
+
+    async def _update(self, session_id: str, fn: Callable[[Optional[str]], Optional[str]]) -> Optional[str]:
+        value = await self.redis.transform(self._key(session_id), fn, ttl=int(self.ttl))
+        if value is not None:
+            self.metrics["writes"] += 1
+            self.metrics["bytes_written"] += len(value)
+        return value
+
+    async def append(self, session_id: str, turns: List[Turn]) -> RawState:
+        def add(value: Optional[str]) -> str:
+            summary, stored, pending, version, start = self._decode(value)
+            _push(stored, pending, turns)
+            return self._encode(summary, stored, pending, version + len(turns), start)
+
+        return self._raw(await self._update(session_id, add))
+
+    async def set_summary(self, session_id: str, summary: str, start: int, consumed: int) -> bool:
+        def fold(value: Optional[str]) -> Optional[str]:
+            _, stored, pending, version, pending_start = self._decode(value)
+            if not stored or pending_start != start or len(pending) < consumed:
+                return None
+            return self._encode(summary, stored, pending[consumed:], version, start + consumed)
+
+        return await self._update(session_id, fold) is not None
+
+    async def drop(self, session_id: str):
+        await self.redis.delete({"key": self._key(session_id)})
+
+    def stats(self) -> dict:
+        return dict(self.metrics)
+
+
+class SessionStore:
+    """
+    Remembered turns of multi-turn tool sessions. Served in-process until a `RedisDB` is attached (see
+    LifespanContext); Redis failures fall back to the in-process store, so a session degrades to local
+    memory rather than losing its history mid-turn. Turns written locally during an outage are replayed
+    into Redis by the first access to the session after it recovers; until then they are not summarized.
+    """
+    def __init__(self, name: str, max_turns: int, backend: str = SESSION_STORE_BACKEND):
+        self.name = name
+        self.max_turns = max_turns
+        self.backend = backend
+        self.local = InMemorySessionStore(max_turns)
+        self.redis: Optional[RedisSessionStore] = None
+        self.errors = 0
+        # Sessions with turns only in the local store, written while Redis failed.
+        self._unsynced: "OrderedDict[str, None]" = OrderedDict()
+        gauge_callbacks.register(
+            "session_store_sessions", "Sessions held by the in-process session stores.", ["store"], self._sessions_gauge
+        )
+        gauge_callbacks.register(
+            "session_store_bytes", "Approximate bytes of turns held by the in-process session stores.", ["store"], self._bytes_gauge
+        )
+
+    def attach_redis(self, redis_db):
+        """
+        Share sessions across workers through a connected `RedisDB`, unless SESSION_STORE_BACKEND=memory.
+        """
+        self.redis = RedisSessionStore(redis_db, self.name, self.max_turns) if redis_db and self.backend != "memory" else None
+
+    async def _replay(self, session_id: str):
+        if session_id not in self._unsynced:
+            return
+        _, turns, pending, _, _ = self.local.state(session_id)
+        if pending or turns:
+            await self.redis.append(session_id, pending + turns)
+            logger.info("Replayed %d turns of %s written during a Redis outage", len(pending) + len(turns), session_id)
+        del self._unsynced[session_id]
+        self.local.drop(session_id)
+
+    def _mark_unsynced(self, session_id: str):
+        self._unsynced[session_id] = None
+        self._unsynced.move_to_end(session_id)
+        while len(self._unsynced) > self.local.max_sessions:
+            self._unsynced.popitem(last=False)
+
+    async def get(self, session_id: str) -> List[Dict]:
+        if self.redis is not None:
+            try:
+                await self._replay(session_id)
+                return _as_dicts(await self.redis.get(session_id))
+            except Exception as e:
+                self.errors += 1
+                logger.warning("Redis session read failed for %s: %s", session_id, e)
+        return _as_dicts(self.local.get(session_id))
+
+    async def state(self, session_id: str) -> SessionState:
+        if self.redis is not None:
+            try:
+                await self._replay(session_id)
+                return _session_state(await self.redis.state(session_id))
+            except Exception as e:
+                self.errors += 1
+                logger.warning("Redis session read failed for %s: %s", session_id, e)
+        return _session_state(self.local.state(session_id))
+
+    async def append(self, session_id: str, *turns: Dict) -> SessionState:
+        """
+        Remember turns; returns the session's state afterwards (its pending turns await the summary).
+        """
+        packed = [(turn["role"], turn["content"]) for turn in turns]
+        if self.redis is not None:
+            try:
+                await self._replay(session_id)
+                return _session_state(await self.redis.append(session_id, packed))
+            except Exception as e:
+                self.errors += 1
+                logger.warning("Redis session write failed for %s: %s", session_id, e)
+                self._mark_unsynced(session_id)
+        return _session_state(self.local.append(session_id, packed))
+
+    async def set_summary(self, session_id: str, summary: str, start: int, consumed: int) -> bool:
+        """
+        Fold the `consumed` pending turns from sequence number `start` (see SessionState) into the summary.
+        Returns False when they are no longer the first pending turns, e.g. trimmed or folded by another worker.
+        """
+        if self.redis is not None:
+            try:
+                return await self.redis.set_summary(session_id, summary, start, consumed)
+            except Exception as e:
+                self.errors += 1
+                logger.warning("Redis session write failed for %s: %s", session_id, e)
+        if session_id in self._unsynced:
+            # Unsynced turns stay pending locally, to be replayed (and summarized) once Redis is back.
+            return False
+        return self.local.set_summary(session_id, summary, start, consumed)
+
+    async def drop(self, session_id: str):
+        self.local.drop(session_id)
+        self._unsynced.pop(session_id, None)
+        if self.redis is not None:
+            try:
+                await self.redis.drop(session_id)
+            except Exception as e:
+                self.errors += 1
+                logger.warning("Redis session delete failed for %s: %s", session_id, e)
+
+    def _sessions_gauge(self) -> Dict[tuple, int]:
+        return {(self.name,): len(self.local._sessions)}
+
+    def _bytes_gauge(self) -> Dict[tuple, int]:
+        return {(self.name,): self.local.total_bytes}
+
+    def stats(self) -> dict:
+        return {
+            "backend": "redis" if self.redis is not None else "memory",
+            "errors": self.errors,
+            "local": self.local.stats(),
+            **({"redis": self.redis.stats()} if self.redis is not None else {}),
+        }
@@ -1,8 +1,13 @@
 from abc import ABC, abstractmethod
 from typing import Any, Dict, List
+from utils.metrics import instrument_operations
 
 
 class BaseDB(ABC):
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        instrument_operations(cls, ("connect", "close", "read", "write", "update", "delete"))
+
     @abstractmethod
     async def connect(self) -> None:
         pass
@@ -1,8 +1,12 @@
 from abc import ABC, abstractmethod
 from typing import Dict
+from utils.metrics import instrument_operations
 
 
 class BaseFetcher(ABC):
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        instrument_operations(cls, ("fetch",))
 
     @abstractmethod
     async def fetch(self, url: str, params: Dict = None) -> Dict:
@@ -1,8 +1,13 @@
 from abc import ABC, abstractmethod
 from typing import BinaryIO
+from utils.metrics import instrument_operations
 
 
 class BaseStorage(ABC):
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        instrument_operations(cls, ("upload", "download", "delete"))
+
     @abstractmethod
     async def upload(self, path: str, data: bytes | BinaryIO):
         pass
@@ -24,7 +24,7 @@ class LocalStorage(BaseStorage):
         makedirs(full_path.parent, exist_ok=True)
         async with open(full_path, 'wb') as f:
             await f.write(data)
-        logger.info(f"Uploaded to {full_path}")
+        logger.info("Uploaded to %s", full_path)
 
     @local_fs_retry()
     async def download(self, path: str) -> bytes:
@@ -42,5 +42,5 @@ class LocalStorage(BaseStorage):
             raise ValueError("Access outside base_path is not allowed")
 
         await os.remove(full_path)
-        logger.info(f"Deleted {full_path}")
+        logger.info("Deleted %s", full_path)
 
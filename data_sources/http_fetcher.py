@@ -1,5 +1,4 @@
 import httpx
-from bs4 import BeautifulSoup
 from utils.retries import http_retry
 from data_sources.abstract_fetcher import BaseFetcher
 from utils.logger_config import configure_logger
@@ -12,6 +11,8 @@ class WebsiteFetcher(BaseFetcher):
 
     @http_retry()
     async def fetch(self, url: str, params: dict = None) -> dict:
+        from bs4 import BeautifulSoup
+
         async with httpx.AsyncClient() as client:
             try:
                 response = await client.get(url, params=params)
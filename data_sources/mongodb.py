@@ -1,11 +1,12 @@
-from typing import Optional, Dict, Any, List
-from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo.errors import PyMongoError
+from typing import TYPE_CHECKING, Optional, Dict, Any, List
 from data_sources.abstract_db import BaseDB
 from utils.logger_config import configure_logger
 from utils.retries import db_retry
 
 
+if TYPE_CHECKING:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
 logger = configure_logger("MongoDB")
 
 
@@ -14,11 +15,14 @@ class MongoDB(BaseDB):
         self.uri = uri
         self.db_name = db_name
         self.collection_name = collection_name
-        self.client: Optional[AsyncIOMotorClient] = None
+        self.client: Optional["AsyncIOMotorClient"] = None
         self.collection = None
 
     async def connect(self):
         if self.client is None:
+            from motor.motor_asyncio import AsyncIOMotorClient
+            from pymongo.errors import PyMongoError
+
             try:
                 self.client = AsyncIOMotorClient(self.uri)
                 await self.client.server_info()
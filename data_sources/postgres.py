@@ -1,7 +1,7 @@
-import asyncpg
 from typing import List, Dict, Any
 from data_sources.abstract_db import BaseDB
 from utils.logger_config import configure_logger
+from utils.metrics import gauge_callbacks
 from utils.retries import db_retry
 
 
@@ -13,9 +13,14 @@ class PostgresDB(BaseDB):
         self.dsn = dsn
         self.table = table_name
         self.pool = None
+        gauge_callbacks.register(
+            "data_source_pool_connections", "Connections of data source pools by state.", ["source", "state"], self.pool_usage
+        )
 
     async def connect(self):
         if not self.pool:
+            import asyncpg
+
             try:
                 self.pool = await asyncpg.create_pool(dsn=self.dsn)
                 logger.info(f"Connected to Postgres: {self.dsn}")
@@ -23,6 +28,12 @@ class PostgresDB(BaseDB):
                 logger.exception("Postgres connection failed")
                 raise RuntimeError("Postgres connection failed") from e
 
+    def pool_usage(self) -> Dict[tuple, int]:
+        if not self.pool:
+            return {}
+        size, idle = self.pool.get_size(), self.pool.get_idle_size()
+        return {("PostgresDB", "in_use"): size - idle, ("PostgresDB", "idle"): idle}
+
     async def close(self):
         if self.pool:
             await self.pool.close()
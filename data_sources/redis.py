@@ -1,5 +1,4 @@
-import redis.asyncio as redis
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Optional
 from data_sources.abstract_db import BaseDB
 from utils.logger_config import configure_logger
 from utils.retries import db_retry
@@ -8,6 +7,12 @@ from utils.retries import db_retry
 logger = configure_logger("RedisDB")
 
 
+class ConcurrentUpdateError(RuntimeError):
+    """
+    A `transform` kept losing to other writers. Not a RedisError, so `db_retry` does not run it again.
+    """
+
+
 class RedisDB(BaseDB):
     def __init__(self, url: str):
         self.url = url
@@ -15,6 +20,8 @@ class RedisDB(BaseDB):
 
     async def connect(self):
         if self.client is None:
+            import redis.asyncio as redis
+
             self.client = redis.from_url(self.url)
             logger.info(f"Connected to Redis: {self.url}")
 
@@ -33,7 +40,56 @@ class RedisDB(BaseDB):
     @db_retry()
     async def write(self, document: Dict[str, Any], **kwargs) -> None:
         await self.connect()
-        await self.client.set(document["key"], document["value"])
+        await self.client.set(document["key"], document["value"], ex=kwargs.get("ttl"))
+
+    @db_retry()
+    async def read_many(self, keys: List[str]) -> Dict[str, Optional[str]]:
+        """
+        Values of `keys` in one MGET round trip; missing keys map to None.
+        """
+        await self.connect()
+        values = await self.client.mget(keys) if keys else []
+        return {key: value.decode() if value else None for key, value in zip(keys, values)}
+
+    @db_retry()
+    async def write_many(self, documents: Dict[str, str], ttl: Optional[int] = None) -> None:
+        """
+        SET every key/value of `documents` in one pipelined round trip.
+        """
+        await self.connect()
+        async with self.client.pipeline(transaction=False) as pipe:
+            for key, value in documents.items():
+                pipe.set(key, value, ex=ttl)
+            await pipe.execute()
+
+    @db_retry()
+    async def transform(
+            self, key: str, fn: Callable[[Optional[str]], Optional[str]], ttl: Optional[int] = None, attempts: int = 10,
+    ) -> Optional[str]:
+        """
+        Atomic read-modify-write of `key`: WATCH it, SET fn(current value) in a MULTI/EXEC transaction and start
+        over when another client changed the key in between. `fn` may run several times; when it returns None
+        the key is left as is. Returns the value written; raises ConcurrentUpdateError once `attempts` runs out.
+        """
+        from redis.exceptions import WatchError
+
+        await self.connect()
+        async with self.client.pipeline(transaction=True) as pipe:
+            for _ in range(attempts):
+                try:
+                    await pipe.watch(key)
+                    current = await pipe.get(key)
+                    value = fn(current.decode() if current else None)
+                    if value is None:
+                        await pipe.unwatch()
+                        return None
+                    pipe.multi()
+                    pipe.set(key, value, ex=ttl)
+                    await pipe.execute()
+                    return value
+                except WatchError:
+                    continue
+        raise ConcurrentUpdateError(f"{key} kept changing during {attempts} update attempts")
 
     @db_retry()
     async def update(self, filter_query: Dict[str, Any], update_doc: Dict[str, Any], upsert: bool = False) -> int:
@@ -1,22 +1,39 @@
+import hmac
 from contextlib import asynccontextmanager
+from typing import Dict, Literal
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from fastmcp import FastMCP
 from api.v1.chat import router as chat_router
 from api.v1.code import router as code_router
 from agents.chat import chat_mcp
 from agents.code import code_mcp
 from context.lifespan_context import LifespanContext
-from tools.chat import *
-from tools.code import *
-from prompts.chat import *
-from resources.chat import *
-from resources.chat_templates import *
-from resources.code import *
-from resources.code_templates import *
-from prompts.coding import *
+# Imported for their side effect: registering tools, prompts and resources on chat_mcp / code_mcp.
+import tools.chat  # noqa: F401
+import tools.code  # noqa: F401
+import prompts.chat  # noqa: F401
+import prompts.coding  # noqa: F401
+import resources.chat  # noqa: F401
+import resources.chat_templates  # noqa: F401
+import resources.code  # noqa: F401
+import resources.code_templates  # noqa: F401
 from fastapi.middleware.cors import CORSMiddleware
-from utils.logger_config import configure_logger
+from utils.logger_config import RequestIdMiddleware, configure_logger
+from utils.cache import result_cache
+from utils.semantic_cache import semantic_cache
+from utils.translation_memory import translation_memory
+from utils.admission import admission
+from clients.ollama import get_ollama_client
+from utils.cancellation import cancellation_metrics
+from utils.hedging import hedge_policy
+from utils.metrics import gauge_callbacks, model_label
+from utils.tracing import TracingMiddleware, tracer
+from utils.profiling import PROFILE_TOKEN, ProfilingMiddleware, profile_store
+from context.chat import chat_kv_store, chat_memory_store
+from context.code import code_kv_store, code_thread_store
 
 
 logger = configure_logger("MainAgent")
@@ -29,9 +46,12 @@ async def lifespan_context(app):
     app.state.lifespan = lifespan
 
     try:
-        yield
+        # The streamable-HTTP session manager of the mounted MCP app needs its own lifespan too.
+        async with mcp_app.router.lifespan_context(app):
+            yield
     finally:
         await lifespan.shutdown()
+        tracer.shutdown()
 
 mcp = FastMCP(
     name="MainAgent",
@@ -39,13 +59,12 @@ mcp = FastMCP(
     dependencies=[],
 )
 
-mcp.lifespan_context = lifespan_context
 logger.info("Mounting Sub-Agents ...")
 mcp.mount(prefix='chat', server=chat_mcp)
 mcp.mount(prefix='code', server=code_mcp)
 mcp_app = mcp.http_app(path='/mcp')
 
-app = FastAPI(title="MCP API", lifespan=mcp_app.router.lifespan_context)
+app = FastAPI(title="MCP API", lifespan=lifespan_context)
 app.mount("/service", mcp_app, name="main")
 app.include_router(chat_router, prefix="/api/v1")
 app.include_router(code_router, prefix="/api/v1")
@@ -56,6 +75,31 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost, so the server span covers CORS handling and the mounted MCP app.
+app.add_middleware(TracingMiddleware)
+app.add_middleware(ProfilingMiddleware)
+# Outermost of all, so every log record of a request (including the middlewares' own) carries its id.
+app.add_middleware(RequestIdMiddleware)
+
+
+def admission_usage() -> Dict[tuple, int]:
+    # Models outside the known set share the "other" label: sum them rather than keep the last one.
+    usage: Dict[tuple, int] = {}
+    for model, stats in admission.stats().items():
+        for state, key in (("active", "active"), ("queued", "queue_depth")):
+            label = (model_label(model), state)
+            usage[label] = usage.get(label, 0) + stats[key]
+    return usage
+
+
+gauge_callbacks.register(
+    "ollama_admission_requests", "Requests holding or waiting for an admission slot, per model.", ["model", "state"],
+    admission_usage,
+)
+gauge_callbacks.register(
+    "ollama_backend_outstanding", "Requests in flight per Ollama backend.", ["backend"],
+    lambda: {(backend["url"],): backend["outstanding"] for backend in get_ollama_client().stats()["backends"]},
+)
 
 @app.get("/")
 async def home():
@@ -65,6 +109,62 @@ async def home():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/ready")
+async def readiness_check(request: Request):
+    lifespan = getattr(request.app.state, "lifespan", None)
+    if lifespan is None or not lifespan.ready:
+        warmup = lifespan.warmer.stats() if lifespan else {}
+        return JSONResponse(status_code=503, content={"status": "warming up", **warmup})
+    return {"status": "ready", **lifespan.warmer.stats()}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/profiles/{profile_id}", include_in_schema=False)
+async def get_profile(
+        profile_id: str,
+        format: Literal["json", "folded"] = "json",
+        x_profile: str = Header("", alias="X-Profile"),
+):
+    if not PROFILE_TOKEN or not hmac.compare_digest(x_profile, PROFILE_TOKEN):
+        raise HTTPException(status_code=403, detail="A valid X-Profile token is required")
+    try:
+        profile = await profile_store.load(profile_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "folded":
+        return PlainTextResponse(profile["folded"])
+    return profile
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {
+        **result_cache.stats(),
+        "semantic": semantic_cache.stats(),
+        "translation_memory": translation_memory.stats(),
+    }
+
+@app.get("/admission/stats")
+async def admission_stats():
+    return admission.stats()
+
+@app.get("/ollama/backends")
+async def ollama_backends():
+    return {**get_ollama_client().stats(), "hedging": hedge_policy.stats()}
+
+@app.get("/sessions/stats")
+async def session_stats():
+    return {
+        "chat": chat_kv_store.stats(),
+        "code": code_kv_store.stats(),
+        "memory": {"chat": chat_memory_store.stats(), "code": code_thread_store.stats()},
+    }
+
+@app.get("/cancellation/stats")
+async def cancellation_stats():
+    return cancellation_metrics
+
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,11 +1,26 @@
-from typing import Optional
-from pydantic import BaseModel
+from typing import List, Optional
+from pydantic import BaseModel, Field
 
 
 class ChatResponse(BaseModel):
     result: str
 
 
+class BatchTextInput(BaseModel):
+    texts: List[str] = Field(..., min_length=1, max_length=1000)
+    model: Optional[str] = None
+
+
+class BatchResponse(BaseModel):
+    results: List[str]
+
+
+class SessionMessage(BaseModel):
+    message: str = Field(..., min_length=1)
+    session_id: str = Field(..., min_length=1, max_length=128)
+    model: Optional[str] = None
+
+
 class CodePrompt(BaseModel):
     prompt: str
     language: Optional[str] = "python"
@@ -1,15 +1,13 @@
 from fastmcp import Context
 from agents.chat import chat_mcp
-import aiohttp
-import boto3
-from botocore.exceptions import BotoCoreError, ClientError
-import psycopg2
 import logging
 
 logger = logging.getLogger(__name__)
 
 @chat_mcp.resource("resource://website-content/{website_url}")
 async def get_website_content(website_url: str, ctx: Context) -> str:
+    import aiohttp
+
     try:
         async with aiohttp.ClientSession() as session:
             async with session.get(website_url) as response:
@@ -21,6 +19,8 @@ async def get_website_content(website_url: str, ctx: Context) -> str:
 
 @chat_mcp.resource("resource://api-data/{api_url}")
 async def get_api_data(api_url: str, ctx: Context) -> dict:
+    import aiohttp
+
     try:
         async with aiohttp.ClientSession() as session:
             async with session.get(api_url) as response:
@@ -32,6 +32,8 @@ async def get_api_data(api_url: str, ctx: Context) -> dict:
 
 @chat_mcp.resource("resource://github-repo/{repository_url}")
 async def get_github_repo(repository_url: str, ctx: Context) -> str:
+    import aiohttp
+
     try:
         async with aiohttp.ClientSession() as session:
             async with session.get(repository_url) as response:
@@ -54,6 +56,8 @@ async def get_mongo_data(collection_name: str, ctx: Context) -> dict:
 
 @chat_mcp.resource("resource://postgres-data/{postgres_dsn}")
 async def get_postgres_data(postgres_dsn: str, ctx: Context) -> dict:
+    import psycopg2
+
     try:
         with psycopg2.connect(postgres_dsn) as conn:
             with conn.cursor() as cursor:
@@ -67,6 +71,9 @@ async def get_postgres_data(postgres_dsn: str, ctx: Context) -> dict:
 
 @chat_mcp.resource("resource://s3-data/{s3_bucket_name}/{s3_bucket_key}")
 async def get_s3_data(s3_bucket_name: str, s3_bucket_key: str, ctx: Context) -> str:
+    import boto3
+    from botocore.exceptions import BotoCoreError, ClientError
+
     try:
         s3 = boto3.client("s3")
         response = s3.get_object(Bucket=s3_bucket_name, Key=s3_bucket_key)
@@ -0,0 +1,49 @@
+import asyncio
+import pytest
+from utils.admission import AdmissionController, ModelLimiter, Overloaded
+
+
+@pytest.mark.asyncio
+async def test_limiter_queues_then_admits_in_order():
+    limiter = ModelLimiter("m", max_concurrency=1, max_queue=2, max_queue_time=1)
+    order = []
+
+    async def job(name):
+        async with limiter.slot():
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(job("a"), job("b"), job("c"))
+    assert order == ["a", "b", "c"]
+    assert limiter.active == 0
+    assert limiter.stats()["admitted"] == 3
+
+
+@pytest.mark.asyncio
+async def test_limiter_rejects_when_queue_is_full():
+    limiter = ModelLimiter("m", max_concurrency=1, max_queue=0, max_queue_time=1)
+    async with limiter.slot():
+        with pytest.raises(Overloaded) as exc:
+            await limiter.acquire()
+    assert exc.value.status_code == 429
+    assert exc.value.retry_after >= 1
+
+
+@pytest.mark.asyncio
+async def test_limiter_sheds_after_queue_time():
+    limiter = ModelLimiter("m", max_concurrency=1, max_queue=4, max_queue_time=0.01)
+    async with limiter.slot():
+        with pytest.raises(Overloaded) as exc:
+            await limiter.acquire()
+    assert exc.value.status_code == 503
+    assert limiter.waiters == type(limiter.waiters)()
+
+
+@pytest.mark.asyncio
+async def test_controller_evicts_idle_limiters_of_unknown_models():
+    controller = AdmissionController(default_concurrency=1, max_models=2)
+    async with controller.slot("busy"):
+        for i in range(10):
+            controller.limiter(f"junk-{i}")
+        assert list(controller.stats()) == ["busy", "junk-9"]
+    assert controller.limiter("busy").stats()["admitted"] == 1
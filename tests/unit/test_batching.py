@@ -0,0 +1,85 @@
+import asyncio
+import json
+import re
+from collections import OrderedDict
+import pytest
+import tools.batch as batch
+from tools.batch import parse_batch_labels
+from utils.admission import admission
+from utils.batching import MicroBatcher
+
+
+def test_parse_json_array_answer():
+    output = 'Sure! ["positive", "negative", "neutral"]'
+    assert parse_batch_labels(output, 3) == ["positive", "negative", "neutral"]
+
+
+def test_parse_numbered_lines_with_missing_label():
+    output = "1. sports\n3) finance"
+    assert parse_batch_labels(output, 3) == ["sports", None, "finance"]
+
+
+@pytest.mark.asyncio
+async def test_micro_batcher_groups_concurrent_submissions():
+    seen = []
+
+    async def handler(items):
+        seen.append(list(items))
+        return [item.upper() for item in items]
+
+    batcher = MicroBatcher(handler, max_batch_size=3, max_wait=0.01)
+    results = await asyncio.gather(*(batcher.submit(text) for text in ["a", "b", "c", "d"]))
+    assert results == ["A", "B", "C", "D"]
+    assert seen == [["a", "b", "c"], ["d"]]
+
+
+@pytest.mark.asyncio
+async def test_label_many_caps_batches_in_flight_and_retries_invalid_labels(monkeypatch):
+    active, peak, prompts, retried = 0, 0, [], []
+
+    async def fake_call_ollama(prompt, model, options=None):
+        nonlocal active, peak
+        prompts.append((prompt, options))
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        count = len(re.findall(r"^\d+\. ", prompt, re.MULTILINE))
+        yield json.dumps(["Positive" if i % 2 else "meh" for i in range(count)])
+
+    async def fake_call_ollama_label(prompt, model, labels, options=None):
+        retried.append(asyncio.get_running_loop().time())
+        await asyncio.sleep(0.01)
+        return "neutral"
+
+    monkeypatch.setattr(batch, "call_ollama", fake_call_ollama)
+    monkeypatch.setattr(batch, "call_ollama_label", fake_call_ollama_label)
+    monkeypatch.setattr(batch, "_batchers", OrderedDict())
+    monkeypatch.setattr(batch, "MICRO_BATCH_SIZE", 4)
+
+    results = await batch.label_many("sentiment", [f"text {i}" for i in range(40)], "batch-test-model")
+
+    assert peak <= admission.limiter("batch-test-model").max_concurrency
+    assert set(results) == {"positive", "neutral"} and results[1] == "positive" and results[0] == "neutral"
+    assert "positive, neutral, negative" in prompts[0][0] and prompts[0][1]["num_predict"] == 16 * 4 + 8
+    # Invalid labels of one batch are retried concurrently, not one after another.
+    assert len(retried) == 20 and max(retried) - min(retried) < 0.1
+
+
+@pytest.mark.asyncio
+async def test_label_one_validates_custom_labels_and_evicts_idle_batchers(monkeypatch):
+    prompts = []
+
+    async def fake_call_ollama(prompt, model, options=None):
+        prompts.append(prompt)
+        yield '["Billing"]'
+
+    monkeypatch.setattr(batch, "call_ollama", fake_call_ollama)
+    monkeypatch.setattr(batch, "_batchers", OrderedDict())
+    monkeypatch.setattr(batch, "MICRO_BATCH_MAX_BATCHERS", 2)
+
+    assert await batch.label_one("classify", "my invoice", "batch-test-model", ["billing", "bug"]) == "billing"
+    assert "billing, bug" in prompts[0]
+    for i in range(5):
+        await batch.label_one("classify", "my invoice", "batch-test-model", ["billing", f"other-{i}"])
+    assert len(batch._batchers) == 2
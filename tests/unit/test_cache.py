@@ -0,0 +1,46 @@
+import asyncio
+import pytest
+from utils.cache import LRUTTLCache, ResultCache, make_cache_key, is_cacheable_result
+
+
+def test_lru_evicts_oldest_entry():
+    cache = LRUTTLCache(max_entries=2, ttl=60)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+
+
+def test_lru_expires_entries():
+    cache = LRUTTLCache(max_entries=2, ttl=60)
+    cache.set("a", "1", ttl=-1)
+    assert cache.get("a") is None
+
+
+def test_cache_key_normalizes_whitespace():
+    assert make_cache_key("t", "m", {"text": "  hello   world "}) == make_cache_key("t", "m", {"text": "hello world"})
+    assert make_cache_key("t", "m", {"text": "a"}) != make_cache_key("t", "other", {"text": "a"})
+
+
+def test_error_results_are_not_cacheable():
+    assert not is_cacheable_result("⏱️ Timeout: The model took too long to respond.")
+    assert is_cacheable_result("positive")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_compute_once():
+    cache = ResultCache(local=LRUTTLCache(max_entries=8, ttl=60))
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "positive"
+
+    results = await asyncio.gather(*(cache.get_or_compute("k", compute) for _ in range(5)))
+    assert results == ["positive"] * 5
+    assert calls == 1
+    assert cache.stats()["misses"] == 1
@@ -0,0 +1,65 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from api.v1.cancellation import run_until_disconnected
+from utils.cancellation import cancellation_metrics, with_deadline
+
+
+class DisconnectingRequest:
+    def __init__(self, after: int):
+        self.polls = 0
+        self.after = after
+
+    async def is_disconnected(self) -> bool:
+        self.polls += 1
+        return self.polls > self.after
+
+
+@pytest.mark.asyncio
+async def test_deadline_stops_slow_stream():
+    closed = asyncio.Event()
+
+    async def slow():
+        try:
+            yield "first"
+            await asyncio.sleep(10)
+            yield "never"
+        finally:
+            closed.set()
+
+    received = []
+    with pytest.raises(TimeoutError):
+        async for item in with_deadline(slow(), timeout=0.05):
+            received.append(item)
+    assert received == ["first"]
+    assert closed.is_set()
+
+
+@pytest.mark.asyncio
+async def test_disconnect_cancels_work(monkeypatch):
+    monkeypatch.setattr("api.v1.cancellation.DISCONNECT_POLL_INTERVAL", 0.01)
+    started, cancelled = asyncio.Event(), asyncio.Event()
+    before = cancellation_metrics["rest_disconnects"]
+
+    async def generation():
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    with pytest.raises(HTTPException) as exc:
+        await run_until_disconnected(DisconnectingRequest(after=2), generation())
+    await asyncio.wait_for(cancelled.wait(), timeout=1)
+    assert exc.value.status_code == 499
+    assert cancellation_metrics["rest_disconnects"] == before + 1
+
+
+@pytest.mark.asyncio
+async def test_result_returned_while_connected():
+    async def generation():
+        await asyncio.sleep(0.01)
+        return "done"
+
+    assert await run_until_disconnected(DisconnectingRequest(after=100), generation()) == "done"
@@ -0,0 +1,49 @@
+import httpx
+import pytest
+import pytest_asyncio
+from benchmarks.fake_ollama import FakeOllamaConfig, create_app
+from benchmarks.load_test import compare, percentile
+from clients.ollama import OllamaClient, set_ollama_client
+from tools.utils import call_ollama, call_ollama_embed, call_ollama_label
+
+
+@pytest_asyncio.fixture
+async def fake_ollama(request):
+    config = getattr(request, "param", FakeOllamaConfig(ttft=0, tokens_per_second=10_000, tokens=5))
+    client = OllamaClient("http://fake:11434", health_interval=0, transport=httpx.ASGITransport(app=create_app(config)))
+    set_ollama_client(client)
+    yield client
+    set_ollama_client(None)
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_streams_tokens_and_final_stats(fake_ollama):
+    final = {}
+    text = "".join([chunk async for chunk in call_ollama("a fresh prompt", "m", final=final)])
+    assert text == " tok0 tok1 tok2 tok3 tok4"
+    assert final["eval_count"] == 5 and final["prompt_eval_count"] >= 1 and final["context"]
+
+
+@pytest.mark.asyncio
+async def test_structured_answers_and_embeddings(fake_ollama):
+    assert await call_ollama_label("fake label prompt", "m", ["positive", "negative"]) == "positive"
+    first, again = await call_ollama_embed("hello", "e"), await call_ollama_embed("hello", "e")
+    assert first == again and len(first) == 384
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("fake_ollama", [FakeOllamaConfig(ttft=0, error_rate=1.0)], indirect=True)
+async def test_injected_failures_surface_as_errors(fake_ollama):
+    text = "".join([chunk async for chunk in call_ollama("failing prompt", "m")])
+    assert "500" in text
+
+
+def test_percentile_and_baseline_comparison():
+    assert percentile([], 95) == 0.0
+    assert percentile(list(range(1, 101)), 95) == 95
+    baseline = {"rest": {"requests": 100, "errors": 0, "throughput_rps": 20.0, "p95_ms": 100.0, "p99_ms": 150.0, "peak_rss_mb": 100}}
+    steady = {"rest": {"requests": 100, "errors": 0, "throughput_rps": 18.0, "p95_ms": 110.0, "p99_ms": 160.0, "peak_rss_mb": 105}}
+    slower = {"rest": {"requests": 100, "errors": 5, "throughput_rps": 10.0, "p95_ms": 200.0, "p99_ms": 150.0, "peak_rss_mb": 200}}
+    assert compare(steady, baseline, tolerance=0.25) == []
+    assert len(compare(slower, baseline, tolerance=0.25)) == 4
@@ -0,0 +1,78 @@
+import asyncio
+import json
+import httpx
+import pytest
+from clients.ollama import OllamaClient, set_ollama_client
+from tools.utils import _hedged_generate
+from utils.hedging import HedgePolicy
+
+
+class SlowStream(httpx.AsyncByteStream):
+    def __init__(self, delay: float, token: str):
+        self.delay = delay
+        self.token = token
+        self.closed = False
+
+    async def __aiter__(self):
+        await asyncio.sleep(self.delay)
+        yield (json.dumps({"response": self.token, "done": True}) + "\n").encode()
+
+    async def aclose(self):
+        self.closed = True
+
+
+def test_delay_tracks_percentile_and_budget_caps_hedges():
+    policy = HedgePolicy(percentile=90, min_samples=10, default_delay=1.0, budget=0.5, burst=1)
+    assert policy.delay("m") == 1.0
+    for i in range(1, 11):
+        policy.observe("m", i / 10)
+    assert policy.delay("m") == pytest.approx(0.9)
+    policy.on_request()
+    assert policy.try_hedge()
+    policy.on_request()
+    assert not policy.try_hedge()
+    policy.on_request()
+    assert policy.try_hedge()
+
+
+@pytest.mark.asyncio
+async def test_slow_backend_is_hedged_and_cancelled(monkeypatch):
+    policy = HedgePolicy(default_delay=0.05, burst=1)
+    monkeypatch.setattr("tools.utils.hedge_policy", policy)
+    streams = {"slow": SlowStream(5, "slow"), "fast": SlowStream(0, "fast")}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, stream=streams[request.url.host])
+
+    client = OllamaClient(["http://slow:11434", "http://fast:11434"], health_interval=0, transport=httpx.MockTransport(handler))
+    set_ollama_client(client)
+    try:
+        frames = [frame async for frame in _hedged_generate("p", "m")]
+    finally:
+        set_ollama_client(None)
+        await client.close()
+
+    assert [f["response"] for f in frames] == ["fast"]
+    assert streams["slow"].closed
+    assert policy.metrics["hedged"] == policy.metrics["hedge_wins"] == 1
+
+
+@pytest.mark.asyncio
+async def test_single_backend_requests_earn_no_hedge_budget(monkeypatch):
+    policy = HedgePolicy(budget=0.5, burst=5)
+    monkeypatch.setattr("tools.utils.hedge_policy", policy)
+    while policy.try_hedge():
+        pass
+    client = OllamaClient(
+        "http://only:11434", health_interval=0,
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, stream=SlowStream(0, "ok"))),
+    )
+    set_ollama_client(client)
+    try:
+        for _ in range(4):
+            assert [f["response"] async for f in _hedged_generate("p", "m")] == ["ok"]
+    finally:
+        set_ollama_client(None)
+        await client.close()
+
+    assert policy.metrics["requests"] == 0 and not policy.try_hedge()
@@ -0,0 +1,24 @@
+import os
+from benchmarks.import_time import loaded_lazy_modules, measure, parse_importtime
+
+
+# Generous on purpose: this guards against drivers creeping back onto the startup path, not against noise.
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "5000"))
+
+
+def test_parse_importtime():
+    stderr = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |     _io\n"
+        "import time:      5000 |      90000 |   fastapi.routing\n"
+        "import time:      3000 |     100000 | main\n"
+    )
+    assert parse_importtime(stderr) == {
+        "_io": (120, 120, 2), "fastapi.routing": (5000, 90000, 1), "main": (3000, 100000, 0),
+    }
+
+
+def test_main_imports_without_drivers_within_budget():
+    modules = measure("main")
+    assert loaded_lazy_modules(modules) == []
+    assert modules["main"][1] / 1000 < IMPORT_BUDGET_MS
@@ -0,0 +1,60 @@
+import json
+import logging
+import time
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import utils.logger_config as logger_config
+from utils.logger_config import RequestIdMiddleware, SamplingFilter, bind_request_id, configure_logger, flush_logging
+
+
+def make_record(level=logging.INFO, lineno=10, msg="step %d", args=(1,)):
+    return logging.LogRecord("test", level, "/app/tools/x.py", lineno, msg, args, None)
+
+
+def test_sampling_keeps_bursts_warnings_and_counts_drops():
+    sampler = SamplingFilter(rate=0.0, burst=3, window=0.05)
+    kept = [sampler.filter(make_record()) for _ in range(10)]
+    assert kept == [True] * 3 + [False] * 7
+    assert sampler.filter(make_record(level=logging.WARNING))
+    assert sampler.filter(make_record(lineno=11))
+    time.sleep(0.06)
+    record = make_record()
+    assert sampler.filter(record) and record.sampled_out == 7
+
+
+def test_queue_mode_writes_json_with_request_ids(monkeypatch, tmp_path):
+    monkeypatch.setattr(logger_config, "LOG_FORMAT", "json")
+    log_file = tmp_path / "app.log"
+    logger = configure_logger("JsonQueueTest", log_file=str(log_file))
+    assert isinstance(logger.handlers[0], logger_config.NonBlockingQueueHandler)
+
+    with bind_request_id("req-1"):
+        logger.info("answered %s", "ok", extra={"model": "m"})
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.exception("failed")
+    flush_logging()
+
+    answered, failed = [json.loads(line) for line in log_file.read_text().splitlines()]
+    assert answered["message"] == "answered ok" and answered["request_id"] == "req-1" and answered["model"] == "m"
+    assert failed["request_id"] is None and "ValueError: boom" in failed["exc_info"]
+
+
+def test_middleware_binds_and_echoes_request_ids(caplog):
+    logger = logging.getLogger("RequestIdTest")
+    logger.addFilter(logger_config.RequestIdFilter())
+    app = FastAPI()
+
+    @app.get("/work")
+    async def work():
+        logger.warning("working")
+        return {"ok": True}
+
+    app.add_middleware(RequestIdMiddleware)
+    client = TestClient(app)
+
+    assert client.get("/work", headers={"X-Request-ID": "abc-123"}).headers["x-request-id"] == "abc-123"
+    generated = client.get("/work", headers={"X-Request-ID": "bad id\n"}).headers["x-request-id"]
+    assert len(generated) == 32
+    assert [record.request_id for record in caplog.records if record.name == "RequestIdTest"] == ["abc-123", generated]
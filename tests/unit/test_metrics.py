@@ -0,0 +1,87 @@
+import pytest
+from prometheus_client import REGISTRY, generate_latest
+from data_sources.abstract_db import BaseDB
+from utils.admission import Overloaded
+import utils.metrics as metrics
+from utils.metrics import gauge_callbacks, measured_tool
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class MemoryDB(BaseDB):
+    def __init__(self):
+        self.rows = []
+
+    async def connect(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def read(self, filter_query, **kwargs):
+        return list(self.rows)
+
+    async def write(self, document, **kwargs):
+        if "bad" in document:
+            raise ValueError("bad document")
+        self.rows.append(document)
+
+    async def update(self, filter_query, update_doc, upsert=False):
+        return 0
+
+    async def delete(self, filter_query):
+        return 0
+
+    def pool_usage(self):
+        return {("MemoryDB", "in_use"): len(self.rows)}
+
+
+@pytest.mark.asyncio
+async def test_tool_outcomes_are_counted(monkeypatch):
+    monkeypatch.setattr(metrics, "KNOWN_MODELS", frozenset({"m"}))
+
+    @measured_tool("metrics_test_tool")
+    async def tool(text: str, model: str = "m", ctx=None) -> str:
+        if text == "overload":
+            raise Overloaded(model, 429, 1, "queue full")
+        return "💥 Unexpected error: boom" if text == "fail" else text.upper()
+
+    await tool("ok")
+    # Models outside the known set share one label value.
+    await tool("fail", model="any-model-a-client-sends")
+    with pytest.raises(Overloaded):
+        await tool("overload")
+
+    assert sample("mcp_tool_requests_total", tool="metrics_test_tool", model="m", status="ok") == 1
+    assert sample("mcp_tool_requests_total", tool="metrics_test_tool", model="other", status="error") == 1
+    assert sample("mcp_tool_requests_total", tool="metrics_test_tool", model="m", status="overloaded") == 1
+    assert sample("mcp_tool_in_flight", tool="metrics_test_tool") == 0
+
+
+@pytest.mark.asyncio
+async def test_data_source_operations_and_pool_gauge():
+    db = MemoryDB()
+    before = sample("data_source_operation_seconds_count", source="MemoryDB", operation="write")
+    await db.write({"a": 1})
+    with pytest.raises(ValueError):
+        await db.write({"bad": 1})
+    gauge_callbacks.register("test_pool_connections", "Test pool.", ["source", "state"], db.pool_usage)
+
+    assert sample("data_source_operation_seconds_count", source="MemoryDB", operation="write") == before + 2
+    assert sample("data_source_errors_total", source="MemoryDB", operation="write") == 1
+    assert 'test_pool_connections{source="MemoryDB",state="in_use"} 1.0' in generate_latest().decode()
+
+
+@pytest.mark.asyncio
+async def test_admission_gauge_folds_unknown_models_into_other(monkeypatch):
+    import main
+    from utils.admission import AdmissionController
+
+    controller = AdmissionController(default_concurrency=1)
+    monkeypatch.setattr(main, "admission", controller)
+    monkeypatch.setattr(metrics, "KNOWN_MODELS", frozenset({"m"}))
+    async with controller.slot("m"), controller.slot("client-model-a"), controller.slot("client-model-b"):
+        usage = main.admission_usage()
+    assert usage[("m", "active")] == 1 and usage[("other", "active")] == 2 and usage[("other", "queued")] == 0
@@ -0,0 +1,56 @@
+import json
+import httpx
+import pytest
+from clients.ollama import OllamaClient, set_ollama_client
+from tools.utils import call_ollama
+from utils.ndjson import FrameTooLarge, NDJSONDecoder, frame_stats
+
+
+FRAMES = [
+    {"response": "Hola", "done": False},
+    {"response": " señor", "done": False},
+    {"response": "", "done": True, "eval_count": 2, "eval_duration": 1000, "prompt_eval_count": 5, "context": [1]},
+]
+STREAM = "".join(json.dumps(frame, ensure_ascii=False) + "\n" for frame in FRAMES).encode()
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, len(STREAM)])
+def test_frames_survive_any_chunking(size):
+    decoder = NDJSONDecoder()
+    frames = []
+    for offset in range(0, len(STREAM), size):
+        frames.extend(decoder.feed(STREAM[offset:offset + size]))
+    frames.extend(decoder.flush())
+    assert frames == FRAMES
+
+
+def test_last_line_without_newline_and_garbage():
+    decoder = NDJSONDecoder()
+    assert decoder.feed(b'not json\n\n{"done": tr') == []
+    assert decoder.feed(b"ue}") == []
+    assert decoder.flush() == [{"done": True}]
+    assert decoder.errors == 1
+
+
+def test_line_without_newline_is_capped():
+    decoder = NDJSONDecoder(max_line=16)
+    assert decoder.feed(b'{"done": true}\n{"response": "') == [{"done": True}]
+    with pytest.raises(FrameTooLarge):
+        decoder.feed(b"x" * 32)
+
+
+@pytest.mark.asyncio
+async def test_call_ollama_captures_final_stats():
+    client = OllamaClient(
+        "http://stub:11434", health_interval=0,
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, content=STREAM)),
+    )
+    set_ollama_client(client)
+    final = {}
+    try:
+        text = "".join([chunk async for chunk in call_ollama("p", "m", final=final)])
+    finally:
+        set_ollama_client(None)
+        await client.close()
+    assert text == "Hola señor"
+    assert frame_stats(final) == {"eval_count": 2, "eval_duration": 1000, "prompt_eval_count": 5}
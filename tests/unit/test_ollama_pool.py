@@ -0,0 +1,78 @@
+import asyncio
+import httpx
+import pytest
+from clients.ollama import OllamaClient
+
+
+def stub_servers(state: dict) -> httpx.MockTransport:
+    """
+    Stub Ollama instances keyed by host: `state[host]` is the list of loaded models, or None when down.
+    """
+    def handler(request: httpx.Request) -> httpx.Response:
+        models = state.get(request.url.host)
+        if models is None:
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(200, json={"models": [{"name": name} for name in models]})
+    return httpx.MockTransport(handler)
+
+
+@pytest.mark.asyncio
+async def test_prefers_backend_with_model_loaded():
+    state = {"a": [], "b": ["llama3:latest"]}
+    client = OllamaClient("http://a:11434,http://b:11434", health_interval=0, transport=stub_servers(state))
+    await client.probe_all()
+    assert client.pick("llama3").url == "http://b:11434"
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_least_outstanding_routing():
+    client = OllamaClient("http://a:11434,http://b:11434", health_interval=0)
+    first = client.pick("m")
+    async with first.track():
+        assert client.pick("m") is not first
+
+
+@pytest.mark.asyncio
+async def test_ejects_and_readmits_backend():
+    state = {"a": [], "b": None}
+    client = OllamaClient("http://a:11434,http://b:11434", health_interval=0, transport=stub_servers(state))
+    backend_b = client.backends[1]
+    for _ in range(backend_b.eject_after_failures):
+        await client.probe_all()
+    assert not backend_b.healthy
+    assert all(client.pick("m").url == "http://a:11434" for _ in range(3))
+
+    state["b"] = []
+    await client.probe_all()
+    assert backend_b.healthy
+    await client.close()
+
+
+def test_model_affinity_is_stable():
+    client = OllamaClient("http://a:11434,http://b:11434,http://c:11434", strategy="model_affinity", health_interval=0)
+    assert len({client.pick("llama3").url for _ in range(5)}) == 1
+
+
+@pytest.mark.asyncio
+async def test_close_waits_for_the_health_probe():
+    probing = asyncio.Event()
+
+    async def slow_probe(request: httpx.Request) -> httpx.Response:
+        probing.set()
+        await asyncio.sleep(10)
+        return httpx.Response(200, json={"models": []})
+
+    client = OllamaClient("http://a:11434", health_interval=60, transport=httpx.MockTransport(slow_probe))
+    await client.connect()
+    await probing.wait()
+    task, aclose = client._health_task, client.client.aclose
+    probe_done_at_close = []
+
+    async def recording_aclose():
+        probe_done_at_close.append(task.done())
+        await aclose()
+
+    client.client.aclose = recording_aclose
+    await client.close()
+    assert probe_done_at_close == [True] and task.cancelled()
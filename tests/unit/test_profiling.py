@@ -0,0 +1,67 @@
+import asyncio
+import json
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import utils.profiling as profiling
+from utils.profiling import ProfileStore, ProfilingMiddleware, RequestProfile, activate, sampler
+
+
+def burn(rounds: int) -> int:
+    return sum(json.loads(json.dumps({"i": i}))["i"] for i in range(rounds))
+
+
+async def busy(seconds: float):
+    deadline = asyncio.get_running_loop().time() + seconds
+    while asyncio.get_running_loop().time() < deadline:
+        burn(2000)
+        await asyncio.sleep(0)
+
+
+def test_should_profile(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "s3cret")
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 0.0)
+    assert profiling.should_profile("s3cret") == "header"
+    assert profiling.should_profile("guess") is None
+    assert profiling.should_profile(None) is None
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "")
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 1.0)
+    assert profiling.should_profile(None) == "sampled"
+
+
+@pytest.mark.asyncio
+async def test_child_tasks_are_attributed_and_other_work_is_not():
+    profile = RequestProfile("test", "header")
+    sampler.start(profile)
+    neighbour = asyncio.create_task(busy(0.3))
+    with activate(profile):
+        await asyncio.gather(busy(0.3))
+    sampler.stop(profile)
+    await neighbour
+
+    report = profile.to_dict()
+    assert report["samples"] > 5 and report["other_samples"] > 5
+    assert report["categories"]["json_decoding"]["samples"] > 0
+    assert all("test_profiling.py:busy" in stack for stack in report["folded"].splitlines())
+
+
+def test_middleware_profiles_authorized_requests(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "s3cret")
+    store = ProfileStore(str(tmp_path))
+    app = FastAPI()
+
+    @app.get("/work")
+    async def work():
+        await busy(0.1)
+        return {"ok": True}
+
+    app.add_middleware(ProfilingMiddleware, store=store)
+    client = TestClient(app)
+
+    assert "x-profile-id" not in client.get("/work").headers
+    profile_id = client.get("/work", headers={"X-Profile": "s3cret"}).headers["x-profile-id"]
+    report = asyncio.run(store.load(profile_id))
+    assert report["request"] == "GET /work" and report["reason"] == "header"
+    assert report["samples"] > 0 and report["wall_ms"] >= 100
+    with pytest.raises(KeyError):
+        asyncio.run(store.load("../" + profile_id))
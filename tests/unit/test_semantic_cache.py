@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+import utils.semantic_cache as semantic_cache_module
+from utils.semantic_cache import SemanticCache, VectorIndex, claim_path, semantic_cached_tool
+
+
+VECTORS = {
+    "how do i reverse a list in python": [1.0, 0.0, 0.0],
+    "how can i reverse a python list": [0.99, 0.05, 0.0],
+    "what is the capital of france": [0.0, 1.0, 0.0],
+}
+
+
+async def fake_embed(text: str):
+    return VECTORS[text]
+
+
+def test_index_replaces_least_recently_used_row():
+    index = VectorIndex(dim=2, capacity=2)
+    index.add(np.array([1.0, 0.0], dtype=np.float32), "a")
+    index.add(np.array([0.0, 1.0], dtype=np.float32), "b")
+    index.touch(0)
+    index.add(np.array([0.6, 0.8], dtype=np.float32), "c")
+    assert index.values == ["a", "c"]
+
+
+@pytest.mark.asyncio
+async def test_near_duplicate_served_from_cache_per_model(monkeypatch, tmp_path):
+    monkeypatch.setattr(semantic_cache_module, "SEMANTIC_CACHE_ENABLED", True)
+    cache = SemanticCache(embed=fake_embed, max_entries=8, directory=str(tmp_path), thresholds={"ask": 0.95})
+    calls = []
+
+    @semantic_cached_tool("ask", "question", cache=cache)
+    async def ask(question: str, model: str = "m", ctx=None) -> str:
+        calls.append((question, model))
+        return f"answer to {question}"
+
+    first = await ask("how do i reverse a list in python")
+    assert await ask("how can i reverse a python list") == first
+    assert await ask("what is the capital of france") != first
+    await ask("how can i reverse a python list", model="other")
+
+    assert len(calls) == 3
+    assert cache.stats()["hits"] == 1
+    assert (tmp_path / "ask__m.0.f32").exists()
+
+
+def test_index_file_is_reopened_with_its_answers_and_claimed_per_worker(tmp_path):
+    index = VectorIndex(dim=2, capacity=4, path=tmp_path / "ask.0.f32")
+    index.add(np.array([1.0, 0.0], dtype=np.float32), "a")
+    index.add(np.array([0.0, 1.0], dtype=np.float32), "b")
+    index.vectors.flush()
+
+    reopened = VectorIndex(dim=2, capacity=4, path=tmp_path / "ask.0.f32")
+    assert len(reopened) == 2 and reopened.values[:2] == ["a", "b"]
+    assert reopened.search(np.array([0.0, 1.0], dtype=np.float32))[0] == 1
+
+    first, lock = claim_path(tmp_path, "ask")
+    second, _ = claim_path(tmp_path, "ask")
+    assert (first.name, second.name) == ("ask.0.f32", "ask.1.f32")
+    lock.close()
+    assert claim_path(tmp_path, "ask")[0].name == "ask.0.f32"
+
+
+@pytest.mark.asyncio
+async def test_row_replaced_during_search_is_not_served(monkeypatch):
+    cache = SemanticCache(embed=fake_embed, max_entries=1, thresholds={"ask": 0.95})
+    cache.store("ask", "m", np.array([1.0, 0.0, 0.0], dtype=np.float32), "reverse answer")
+    index = cache._indexes[("ask", "m")]
+    search = index.search
+
+    def racing_search(query):
+        hit = search(query)
+        cache.store("ask", "m", np.array([0.0, 1.0, 0.0], dtype=np.float32), "paris")
+        return hit
+
+    monkeypatch.setattr(index, "search", racing_search)
+    assert (await cache.lookup("ask", "m", "how can i reverse a python list"))[1] is None
+
+
+@pytest.mark.asyncio
+async def test_missing_embedding_model_disables_the_cache(monkeypatch):
+    class NotFound(Exception):
+        response = type("Response", (), {"status_code": 404})()
+
+    async def missing_model(text):
+        raise NotFound("model 'nomic-embed-text' not found")
+
+    monkeypatch.setattr(semantic_cache_module, "SEMANTIC_CACHE_ENABLED", True)
+    cache = SemanticCache(embed=missing_model)
+
+    @semantic_cached_tool("ask", "question", cache=cache)
+    async def ask(question: str, model: str = "m") -> str:
+        return "answer"
+
+    assert await ask("a") == await ask("b") == "answer"
+    assert cache.disabled and cache.metrics["embed_errors"] == 1
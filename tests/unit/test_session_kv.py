@@ -0,0 +1,91 @@
+import json
+import httpx
+import pytest
+from clients.ollama import OllamaClient, set_ollama_client
+from context.session_kv import SessionKVStore
+from context.session_store import SessionStore
+from tools.session import session_turn
+
+
+def test_store_evicts_by_total_tokens():
+    store = SessionKVStore(max_sessions=10, max_tokens=10, max_tokens_per_session=8)
+    store.put("a", "m", [1, 2, 3, 4])
+    store.put("b", "m", [5, 6, 7, 8])
+    store.put("c", "m", [9, 10, 11])
+    assert store.get("a", "m") is None
+    assert store.get("b", "m") == [5, 6, 7, 8]
+    assert store.total_tokens == 7
+    store.put("d", "m", list(range(9)))
+    assert store.get("d", "m") is None
+    assert store.get("b", "other-model") is None
+
+
+@pytest.mark.asyncio
+async def test_follow_up_turn_sends_only_new_message_with_context():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        requests.append(body)
+        turn = len(requests)
+        lines = [
+            {"response": f"reply {turn}", "done": False},
+            {"response": "", "done": True, "context": list(range(turn * 3))},
+        ]
+        return httpx.Response(200, content="".join(json.dumps(line) + "\n" for line in lines))
+
+    client = OllamaClient("http://stub:11434", health_interval=0, transport=httpx.MockTransport(handler))
+    set_ollama_client(client)
+    store, memory = SessionKVStore(), SessionStore("test", max_turns=4)
+    try:
+        first = await session_turn("s1", "hello", "m", store, memory)
+        second = await session_turn("s1", "and then?", "m", store, memory)
+        store.drop("s1")
+        await session_turn("s1", "again", "m", store, memory)
+    finally:
+        set_ollama_client(None)
+        await client.close()
+
+    assert (first, second) == ("reply 1", "reply 2")
+    assert "context" not in requests[0]
+    assert requests[1]["prompt"] == "and then?"
+    assert requests[1]["context"] == [0, 1, 2]
+    # Without a cached context the session is re-primed from the text history.
+    assert "context" not in requests[2]
+    assert "User: hello\nAssistant: reply 1" in requests[2]["prompt"]
+    assert requests[2]["prompt"].endswith("User: again")
+
+
+@pytest.mark.asyncio
+async def test_context_cached_by_one_worker_is_not_reused_after_another_served_a_turn():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        requests.append(body)
+        turn = len(requests)
+        lines = [
+            {"response": f"reply {turn}", "done": False},
+            {"response": "", "done": True, "context": list(range(turn * 3))},
+        ]
+        return httpx.Response(200, content="".join(json.dumps(line) + "\n" for line in lines))
+
+    client = OllamaClient("http://stub:11434", health_interval=0, transport=httpx.MockTransport(handler))
+    set_ollama_client(client)
+    # Two workers: each caches KV contexts in-process, the history is shared.
+    worker_a, worker_b, memory = SessionKVStore(), SessionKVStore(), SessionStore("shared", max_turns=8)
+    try:
+        await session_turn("s1", "one", "m", worker_a, memory)
+        await session_turn("s1", "two", "m", worker_a, memory)
+        await session_turn("s1", "three", "m", worker_b, memory)
+        await session_turn("s1", "four", "m", worker_a, memory)
+        await session_turn("s1", "five", "m", worker_a, memory)
+    finally:
+        set_ollama_client(None)
+        await client.close()
+
+    assert requests[1]["prompt"] == "two" and "context" in requests[1]
+    assert "context" not in requests[3]
+    assert "User: three\nAssistant: reply 3" in requests[3]["prompt"]
+    # Re-primed with the full history, worker A's fresh context is current again.
+    assert requests[4]["prompt"] == "five" and requests[4]["context"] == list(range(12))
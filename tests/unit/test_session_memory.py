@@ -0,0 +1,92 @@
+import asyncio
+import json
+import httpx
+import pytest
+import tools.session as session
+from clients.ollama import OllamaClient, set_ollama_client
+from context.session_kv import SessionKVStore
+from context.session_store import SessionStore
+from tools.session import fit_history, session_turn
+from tools.summarize import estimate_tokens
+
+
+def test_fit_history_keeps_newest_turns_within_budget():
+    history = [{"role": "user", "content": f"turn {i} " + "x" * 200} for i in range(10)]
+    summary, kept = fit_history("s " * 400, history, budget=400)
+    assert estimate_tokens(summary) <= 100 + 1 and summary.endswith("…")
+    assert [turn["content"][:6] for turn in kept] == [f"turn {i}" for i in range(5, 10)]
+    assert fit_history("", history[:1], budget=10) == ("", [])
+
+
+@pytest.mark.asyncio
+async def test_old_turns_are_summarized_in_the_background_and_prompts_stay_bounded(monkeypatch):
+    monkeypatch.setattr(session, "MEMORY_TOKEN_BUDGET", 120)
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        requests.append(body)
+        if body["prompt"].startswith("You maintain the running summary"):
+            lines = [{"response": f"SUMMARY after {len(requests)}", "done": False}, {"response": "", "done": True}]
+        else:
+            # A KV context longer than the budget: every turn re-primes from the summary and recent turns.
+            lines = [{"response": f"reply {len(requests)} " + "y" * 60, "done": False},
+                     {"response": "", "done": True, "context": list(range(500))}]
+        return httpx.Response(200, content="".join(json.dumps(line) + "\n" for line in lines))
+
+    client = OllamaClient("http://stub:11434", health_interval=0, transport=httpx.MockTransport(handler))
+    set_ollama_client(client)
+    kv_store, memory = SessionKVStore(), SessionStore("memory-test", max_turns=2)
+    try:
+        for i in range(8):
+            await session_turn("s1", f"question {i} " + "x" * 60, "m", kv_store, memory)
+            await asyncio.gather(*session._compactions.values())
+    finally:
+        set_ollama_client(None)
+        await client.close()
+
+    turns = [body for body in requests if not body["prompt"].startswith("You maintain")]
+    summaries = [body for body in requests if body["prompt"].startswith("You maintain")]
+    assert summaries and all(body["options"]["num_predict"] == 32 for body in summaries)
+    assert "context" not in turns[-1]
+    last = turns[-1]["prompt"]
+    assert last.startswith("Summary of the earlier conversation: SUMMARY after")
+    assert "question 6" in last and "question 0" not in last
+    assert max(estimate_tokens(body["prompt"]) for body in turns) <= 120 + estimate_tokens("User: question 7 " + "x" * 60)
+    state = await memory.state("s1")
+    assert state.pending == [] and len(state.turns) == 2
+
+
+@pytest.mark.asyncio
+async def test_no_compaction_while_kv_context_is_used_or_pending_turns_are_small(monkeypatch):
+    monkeypatch.setattr(session, "MEMORY_TOKEN_BUDGET", 400)
+    context_size, summaries = 10, []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        if body["prompt"].startswith("You maintain the running summary"):
+            summaries.append(body)
+            lines = [{"response": "SUMMARY", "done": False}, {"response": "", "done": True}]
+        else:
+            lines = [{"response": "ok " + "y" * 40, "done": False}, {"response": "", "done": True, "context": list(range(context_size))}]
+        return httpx.Response(200, content="".join(json.dumps(line) + "\n" for line in lines))
+
+    client = OllamaClient("http://stub:11434", health_interval=0, transport=httpx.MockTransport(handler))
+    set_ollama_client(client)
+    kv_store, memory = SessionKVStore(), SessionStore("compact-test", max_turns=2)
+    try:
+        for i in range(6):
+            await session_turn("s1", f"question {i} " + "x" * 40, "m", kv_store, memory)
+        assert not session._compactions and len((await memory.state("s1")).pending) == 10
+
+        # KV context over budget: the pending turns (~170 tokens) are past a quarter of it and get folded.
+        context_size = 1000
+        await session_turn("s1", "question 6", "m", kv_store, memory)
+        await asyncio.gather(*session._compactions.values())
+    finally:
+        set_ollama_client(None)
+        await client.close()
+
+    assert len(summaries) == 1
+    state = await memory.state("s1")
+    assert state.summary == "SUMMARY" and state.pending == []
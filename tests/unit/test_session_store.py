@@ -0,0 +1,184 @@
+import asyncio
+import time
+import pytest
+from context.session_store import InMemorySessionStore, SessionStore, _turn_bytes
+
+
+class FakeRedisDB:
+    """
+    The key/value subset of RedisDB used by RedisSessionStore, with Redis-style TTLs. Reads and writes yield
+    to the loop like real round trips; `transform` is atomic, like the WATCH/MULTI transaction it stands for.
+    """
+    def __init__(self, fail: bool = False):
+        self.data = {}
+        self.fail = fail
+
+    def _get(self, key):
+        value, expires = self.data.get(key, (None, None))
+        return value if expires is None or expires > time.time() else None
+
+    async def read(self, filter_query, **kwargs):
+        await asyncio.sleep(0)
+        if self.fail:
+            raise ConnectionError("redis down")
+        return [{"key": filter_query["key"], "value": self._get(filter_query["key"])}]
+
+    async def write(self, document, **kwargs):
+        await asyncio.sleep(0)
+        if self.fail:
+            raise ConnectionError("redis down")
+        self.data[document["key"]] = (document["value"], time.time() + kwargs["ttl"])
+
+    async def transform(self, key, fn, ttl=None):
+        await asyncio.sleep(0)
+        if self.fail:
+            raise ConnectionError("redis down")
+        value = fn(self._get(key))
+        if value is not None:
+            self.data[key] = (value, time.time() + ttl)
+        return value
+
+    async def delete(self, filter_query):
+        return 1 if self.data.pop(filter_query["key"], None) else 0
+
+
+def turn(n: int, size: int = 10):
+    return ("user", f"{n}".ljust(size, "x"))
+
+
+def test_ring_buffer_lru_ttl_and_memory_cap():
+    store = InMemorySessionStore(max_turns=2, max_sessions=2, max_bytes=10**6, max_session_bytes=10**6, ttl=60)
+    store.append("a", [turn(1), turn(2), turn(3)])
+    assert [content[0] for _, content in store.get("a")] == ["2", "3"]
+    store.append("b", [turn(4)])
+    store.get("a")
+    store.append("c", [turn(5)])
+    assert store.get("b") == [] and store.get("a") and store.metrics["evictions"] == 1
+
+    expiring = InMemorySessionStore(max_turns=2, ttl=0.01)
+    expiring.append("a", [turn(1)])
+    time.sleep(0.02)
+    assert expiring.get("a") == [] and expiring.total_bytes == 0
+
+    capped = InMemorySessionStore(max_turns=10, max_bytes=600, max_session_bytes=250)
+    capped.append("a", [turn(i, 100) for i in range(5)])
+    assert len(capped.get("a")) == 1
+    capped.append("b", [turn(6, 100)])
+    capped.append("c", [turn(7, 100)])
+    sizes = sum(len(capped.get(s)) for s in "abc")
+    assert capped.total_bytes <= 600 and sizes == 2
+
+
+@pytest.mark.asyncio
+async def test_redis_backend_is_shared_and_falls_back_to_local():
+    redis = FakeRedisDB()
+    worker_1, worker_2 = SessionStore("t", max_turns=3), SessionStore("t", max_turns=3)
+    worker_1.attach_redis(redis)
+    worker_2.attach_redis(redis)
+    await worker_1.append("s", {"role": "user", "content": "hi"}, {"role": "assistant", "content": "héllo"})
+    await worker_2.append("s", {"role": "user", "content": "more"}, {"role": "assistant", "content": "sure"})
+    assert [t["content"] for t in await worker_1.get("s")] == ["héllo", "more", "sure"]
+    assert list(redis.data) == ["mcp:session:t:s"]
+
+    redis.fail = True
+    await worker_1.append("s", {"role": "user", "content": "offline"})
+    assert [t["content"] for t in await worker_1.get("s")] == ["offline"]
+    assert worker_1.stats()["errors"] == 2 and worker_1.stats()["backend"] == "redis"
+
+    # Once Redis is back, the turn written during the outage is replayed into the shared history.
+    redis.fail = False
+    state = await worker_2.state("s")
+    assert [t["content"] for t in state.pending + state.turns] == ["hi", "héllo", "more", "sure"]
+    state = await worker_1.state("s")
+    assert [t["content"] for t in state.pending + state.turns] == ["hi", "héllo", "more", "sure", "offline"]
+    assert await worker_2.get("s") == await worker_1.get("s") and worker_1.local.get("s") == []
+
+    memory_only = SessionStore("t", max_turns=3, backend="memory")
+    memory_only.attach_redis(redis)
+    assert memory_only.stats()["backend"] == "memory"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_redis_updates_from_workers_are_not_lost():
+    redis = FakeRedisDB()
+    workers = [SessionStore("t", max_turns=50) for _ in range(4)]
+    for worker in workers:
+        worker.attach_redis(redis)
+    await asyncio.gather(*(
+        worker.append("s", {"role": "user", "content": f"{n}-{i}"}) for n, worker in enumerate(workers) for i in range(5)
+    ))
+    assert len(await workers[0].get("s")) == 20
+
+    full = SessionStore("t", max_turns=2)
+    full.attach_redis(redis)
+    await full.append("f", *({"role": "user", "content": str(i)} for i in range(4)))
+    await asyncio.gather(
+        full.set_summary("f", "S", start=0, consumed=1), full.append("f", {"role": "user", "content": "4"}),
+    )
+    state = await full.state("f")
+    assert state.summary == "S" and [t["content"] for t in state.pending] == ["1", "2"] and state.pending_start == 1
+    # Another worker's compaction of the same turns lost the race: its fold is refused.
+    assert not await full.set_summary("f", "S2", start=0, consumed=1)
+    assert (await full.state("f")).summary == "S"
+
+
+def test_fold_is_refused_when_pending_turns_were_trimmed_meanwhile():
+    store = InMemorySessionStore(max_turns=1, max_session_bytes=10**6)
+    store.append("a", [turn(i) for i in range(5)])
+    summary, _, read, _, start = store.state("a")
+    assert [content[0] for _, content in read] == ["0", "1", "2", "3"] and start == 0
+
+    # The compactor is summarizing turns 0-3 while new turns push the oldest out under the byte cap.
+    store.max_session_bytes = 6 * _turn_bytes(turn(0))
+    store.append("a", [turn(5), turn(6), turn(7)])
+    _, _, pending, _, start = store.state("a")
+    assert [content[0] for _, content in pending] == ["3", "4", "5", "6"] and start == 3
+
+    assert not store.set_summary("a", "summary of 0-3", start=0, consumed=len(read))
+    _, _, pending, _, _ = store.state("a")
+    assert [content[0] for _, content in pending] == ["3", "4", "5", "6"]
+    assert store.set_summary("a", "summary of 3-4", start=3, consumed=2)
+    assert store.state("a")[4] == 5
+
+
+@pytest.mark.asyncio
+async def test_contended_transform_gives_up_without_retry_backoff():
+    from redis.exceptions import WatchError
+    from data_sources.redis import ConcurrentUpdateError, RedisDB
+
+    class LosingPipeline:
+        """
+        A transaction that always loses the race: EXEC fails as if another client wrote the key.
+        """
+        def __init__(self):
+            self.executes = 0
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        async def watch(self, key):
+            pass
+
+        async def get(self, key):
+            return None
+
+        def multi(self):
+            pass
+
+        def set(self, key, value, ex=None):
+            pass
+
+        async def execute(self):
+            self.executes += 1
+            raise WatchError("watched key changed")
+
+    pipeline = LosingPipeline()
+    db = RedisDB("redis://unused")
+    db.client = type("Client", (), {"pipeline": lambda self, transaction: pipeline})()
+    started = time.monotonic()
+    with pytest.raises(ConcurrentUpdateError):
+        await db.transform("k", lambda value: "v", attempts=3)
+    assert pipeline.executes == 3 and time.monotonic() - started < 0.5
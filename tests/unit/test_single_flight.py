@@ -0,0 +1,45 @@
+import asyncio
+import pytest
+from utils.single_flight import StreamCoalescer
+
+
+@pytest.mark.asyncio
+async def test_concurrent_subscribers_share_one_upstream():
+    coalescer = StreamCoalescer()
+    calls = 0
+
+    async def upstream():
+        nonlocal calls
+        calls += 1
+        for i in range(5):
+            await asyncio.sleep(0.01)
+            yield i
+
+    async def consume(delay):
+        await asyncio.sleep(delay)
+        return [item async for item in coalescer.subscribe("key", upstream)]
+
+    results = await asyncio.gather(consume(0), consume(0.025), consume(0))
+    assert results == [[0, 1, 2, 3, 4]] * 3
+    assert calls == 1
+    assert coalescer.in_flight() == 0
+
+
+@pytest.mark.asyncio
+async def test_upstream_cancelled_when_all_subscribers_leave():
+    coalescer = StreamCoalescer()
+    closed = asyncio.Event()
+
+    async def upstream():
+        try:
+            while True:
+                await asyncio.sleep(0.01)
+                yield "token"
+        finally:
+            closed.set()
+
+    stream = coalescer.subscribe("key", upstream)
+    assert await stream.__anext__() == "token"
+    await stream.aclose()
+    await asyncio.wait_for(closed.wait(), timeout=1)
+    assert coalescer.metrics["cancelled"] == 1
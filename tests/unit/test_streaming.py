@@ -0,0 +1,15 @@
+import json
+from api.v1.streaming import encode_frame
+
+
+def test_encode_sse_frame():
+    frame = encode_frame("token", {"token": "Hola"}, "sse").decode()
+    assert frame.startswith("event: token\ndata: ")
+    assert frame.endswith("\n\n")
+    assert json.loads(frame.split("data: ", 1)[1]) == {"token": "Hola"}
+
+
+def test_encode_ndjson_frame():
+    frame = encode_frame("done", {"chunks": 3}, "ndjson").decode()
+    assert frame.endswith("\n")
+    assert json.loads(frame) == {"event": "done", "chunks": 3}
@@ -0,0 +1,53 @@
+import asyncio
+import json
+import httpx
+import pytest
+from clients.ollama import OllamaClient, set_ollama_client
+from tools.utils import call_ollama_label
+
+
+class EndlessStream(httpx.AsyncByteStream):
+    """
+    Stub Ollama stream that answers a label and then keeps generating until it is closed.
+    """
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.sent = 0
+        self.closed = False
+
+    async def __aiter__(self):
+        for token in self.tokens:
+            self.sent += 1
+            yield (json.dumps({"response": token, "done": False}) + "\n").encode()
+        while True:
+            self.sent += 1
+            await asyncio.sleep(0)
+            yield (json.dumps({"response": " ", "done": False}) + "\n").encode()
+
+    async def aclose(self):
+        self.closed = True
+
+
+@pytest.mark.asyncio
+async def test_label_returned_and_upstream_closed_early():
+    stream = EndlessStream(['{"label"', ': "Positive"', "}"])
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(json.loads(request.content))
+        return httpx.Response(200, stream=stream)
+
+    client = OllamaClient("http://stub:11434", health_interval=0, transport=httpx.MockTransport(handler))
+    set_ollama_client(client)
+    try:
+        label = await call_ollama_label("prompt", "m", ["positive", "negative"], {"num_predict": 8})
+        await asyncio.sleep(0.01)
+    finally:
+        set_ollama_client(None)
+        await client.close()
+
+    assert label == "positive"
+    assert stream.closed
+    assert stream.sent < 10
+    assert requests[0]["format"]["properties"]["label"]["enum"] == ["positive", "negative"]
+    assert requests[0]["options"] == {"num_predict": 8}
@@ -0,0 +1,46 @@
+import json
+import httpx
+import pytest
+from clients.ollama import OllamaClient, set_ollama_client
+from tools.summarize import estimate_tokens, final_summary_prompt, split_into_chunks
+
+
+def test_chunks_respect_budget_and_keep_order():
+    paragraphs = [f"Paragraph {i}. " + "word " * 30 for i in range(10)]
+    long_sentence = "x" * 400
+    chunks = split_into_chunks("\n\n".join(paragraphs + [long_sentence]), max_tokens=60)
+    assert all(estimate_tokens(chunk) <= 60 for chunk in chunks)
+    joined = " ".join(chunks)
+    assert joined.index("Paragraph 1.") < joined.index("Paragraph 9.")
+    assert split_into_chunks("short text", max_tokens=60) == ["short text"]
+
+
+@pytest.mark.asyncio
+async def test_map_reduce_streams_partials_and_builds_final_prompt():
+    prompts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        prompt = json.loads(request.content)["prompt"]
+        prompts.append(prompt)
+        summary = f"summary {len(prompts)}"
+        return httpx.Response(200, content=json.dumps({"response": summary, "done": True}) + "\n")
+
+    client = OllamaClient("http://stub:11434", health_interval=0, transport=httpx.MockTransport(handler))
+    set_ollama_client(client)
+    partials = []
+
+    async def on_partial(done, total, summary):
+        partials.append((done, total))
+
+    text = "\n\n".join(f"Section {i}. " + "lorem ipsum " * 20 for i in range(6))
+    try:
+        prompt = await final_summary_prompt(
+            text, "m", lambda t: f"MAP:{t}", lambda t: f"REDUCE:{t}", max_tokens=80, on_partial=on_partial
+        )
+    finally:
+        set_ollama_client(None)
+        await client.close()
+
+    assert all(p.startswith("MAP:") for p in prompts)
+    assert len(prompts) == len(partials) == partials[-1][1] > 1
+    assert prompt.startswith("REDUCE:") and "summary 1" in prompt
@@ -0,0 +1,106 @@
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from clients.ollama import OllamaClient, set_ollama_client
+from data_sources.abstract_storage import BaseStorage
+from tools.utils import call_ollama
+from utils.tracing import TracingMiddleware, parse_traceparent, tracer
+
+
+STREAM = b'{"response": "hi", "done": false}\n{"response": "", "done": true, "eval_count": 1}\n'
+REMOTE = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+
+
+class ListExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, spans):
+        self.spans.extend(spans)
+
+    def shutdown(self):
+        pass
+
+    def collect(self):
+        tracer.processor.shutdown()
+        return {span.name: span for span in self.spans}
+
+
+class MemoryStorage(BaseStorage):
+    async def upload(self, path, data):
+        pass
+
+    async def download(self, path):
+        raise FileNotFoundError(path)
+
+    async def delete(self, path):
+        pass
+
+
+@pytest.fixture
+def exporter():
+    exporter = ListExporter()
+    tracer.add_exporter(exporter)
+    yield exporter
+    tracer.processor.exporters.remove(exporter)
+
+
+def test_traceparent_parsing():
+    context = parse_traceparent(REMOTE)
+    assert context.trace_id == "0af7651916cd43dd8448eb211c80319c" and context.sampled
+    assert context.traceparent == REMOTE
+    assert parse_traceparent("00-xyz-b7ad6b7169203331-01") is None
+    assert parse_traceparent("00-" + "0" * 32 + "-b7ad6b7169203331-01") is None
+
+
+@pytest.mark.asyncio
+async def test_data_source_and_ollama_spans_nest(exporter):
+    seen = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen["traceparent"] = request.headers.get("traceparent")
+        return httpx.Response(200, content=STREAM)
+
+    client = OllamaClient("http://stub:11434", health_interval=0, transport=httpx.MockTransport(handler))
+    set_ollama_client(client)
+    storage = MemoryStorage()
+    try:
+        with tracer.span("tool test") as root:
+            await storage.upload("a", b"x")
+            with pytest.raises(FileNotFoundError):
+                await storage.download("a")
+            assert "".join([chunk async for chunk in call_ollama("traced prompt", "m")]) == "hi"
+    finally:
+        set_ollama_client(None)
+        await client.close()
+
+    spans = exporter.collect()
+    generate = spans["ollama.generate"]
+    assert spans["MemoryStorage.upload"].parent_id == root.context.span_id
+    assert spans["MemoryStorage.download"].status == "error"
+    assert generate.parent_id == root.context.span_id
+    assert generate.context.trace_id == root.context.trace_id
+    assert seen["traceparent"] == generate.context.traceparent
+    assert [event["name"] for event in generate.events] == ["admitted", "response_headers", "first_token", "done"]
+    assert generate.status == "ok" and "ttft_ms" in generate.attributes
+
+
+def test_middleware_continues_incoming_trace(exporter):
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        with tracer.span("handler"):
+            return {"ok": True}
+
+    app.add_middleware(TracingMiddleware)
+    response = TestClient(app).get("/ping", headers={"traceparent": REMOTE})
+
+    spans = exporter.collect()
+    server = spans["GET /ping"]
+    assert server.context.trace_id == "0af7651916cd43dd8448eb211c80319c"
+    assert server.parent_id == "b7ad6b7169203331"
+    assert server.attributes["http.status_code"] == 200
+    assert spans["handler"].parent_id == server.context.span_id
+    assert response.headers["traceparent"] == server.context.traceparent
@@ -0,0 +1,83 @@
+import asyncio
+import json
+import httpx
+import pytest
+from clients.ollama import OllamaClient, set_ollama_client
+from tools.translate import split_segments, translate_with_memory
+from utils.translation_memory import TranslationMemory, segment_key
+
+
+def test_segments_round_trip():
+    text = "Hello there. How are you?\n\nFine!  Thanks."
+    parts = split_segments(text)
+    assert "".join(parts) == text
+    assert parts[0::2] == ["Hello there.", "How are you?", "Fine!", "Thanks."]
+
+
+@pytest.mark.asyncio
+async def test_only_missing_segments_are_translated(tmp_path):
+    prompts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        prompt = json.loads(request.content)["prompt"]
+        prompts.append(prompt)
+        if "Segments:" in prompt:
+            segments = [json.loads(line.split(". ", 1)[1]) for line in prompt.split("Segments:\n")[1].splitlines()]
+            answer = json.dumps([f"<{segment}>" for segment in segments])
+        else:
+            answer = f"<{prompt.split(': ', 1)[1]}>"
+        return httpx.Response(200, content=json.dumps({"response": answer, "done": True}) + "\n")
+
+    client = OllamaClient("http://stub:11434", health_interval=0, transport=httpx.MockTransport(handler))
+    set_ollama_client(client)
+    memory = TranslationMemory(path=str(tmp_path / "tm.jsonl"))
+    prompt = lambda text, language: f"Translate to {language}: {text}"
+    try:
+        first = await translate_with_memory("One. Two.\nThree.", "French", "m", prompt, memory=memory)
+        # A fresh memory reloads the units from the file.
+        memory = TranslationMemory(path=str(tmp_path / "tm.jsonl"))
+        second = await translate_with_memory("Two. Four. One.", "French", "m", prompt, memory=memory)
+    finally:
+        set_ollama_client(None)
+        await client.close()
+
+    assert first == "<One.> <Two.>\n<Three.>"
+    assert second == "<Two.> <Four.> <One.>"
+    assert len(prompts) == 2
+    assert prompts[1] == "Translate to French: Four."
+    assert memory.stats()["hits"] == 2
+
+
+class FakeRedisDB:
+    def __init__(self):
+        self.data, self.calls = {}, []
+
+    async def read_many(self, keys):
+        self.calls.append(("mget", len(keys)))
+        return {key: self.data.get(key) for key in keys}
+
+    async def write_many(self, documents, ttl=None):
+        self.calls.append(("pipeline", len(documents)))
+        self.data.update(documents)
+
+
+@pytest.mark.asyncio
+async def test_memory_batches_redis_loads_once_and_bounds_its_file(monkeypatch, tmp_path):
+    assert segment_key("One.", "French", "a") != segment_key("One.", "French", "b")
+    path = tmp_path / "tm.jsonl"
+    path.write_text("".join(json.dumps({"key": f"old{i}", "value": "x"}) + "\n" for i in range(3)))
+    memory = TranslationMemory(path=str(path), max_entries=4)
+    loads = []
+    load = memory._load
+    monkeypatch.setattr(memory, "_load", lambda: loads.append(1) or load())
+    redis = FakeRedisDB()
+    memory.attach_redis(redis)
+
+    await asyncio.gather(*(memory.get_many([f"k{i}"]) for i in range(5)))
+    assert loads == [1]
+    for i in range(6):
+        await memory.put_many({f"a{i}": "1", f"b{i}": "2"})
+    assert await memory.get_many(["a0", "b5"]) == {"a0": "1", "b5": "2"}
+
+    assert redis.calls[5:] == [("pipeline", 2)] * 6 + [("mget", 1)]
+    assert len(path.read_text().splitlines()) <= 2 * 4
@@ -0,0 +1,35 @@
+import json
+import httpx
+import pytest
+from clients.ollama import OllamaClient
+from clients.warmup import ModelWarmer
+
+
+@pytest.mark.asyncio
+async def test_ready_once_every_model_is_loaded():
+    loaded = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        loaded.append((request.url.host, json.loads(request.content)))
+        return httpx.Response(200, json={"done": True})
+
+    ollama = OllamaClient("http://a:11434,http://b:11434", health_interval=0, transport=httpx.MockTransport(handler))
+    warmer = ModelWarmer(ollama, models=["llama3"], keep_alive="10m")
+    assert not warmer.ready
+    assert await warmer.warm_all()
+    assert {host for host, _ in loaded} == {"a", "b"}
+    assert all(body == {"model": "llama3", "keep_alive": "10m"} for _, body in loaded)
+    assert ollama.pick("llama3").has_model("llama3")
+    await ollama.close()
+
+
+@pytest.mark.asyncio
+async def test_not_ready_while_backends_fail():
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(500)
+
+    ollama = OllamaClient("http://a:11434", health_interval=0, transport=httpx.MockTransport(handler))
+    warmer = ModelWarmer(ollama, models=["llama3"])
+    assert not await warmer.warm_all()
+    assert warmer.stats()["models"] == {"llama3": False}
+    await ollama.close()
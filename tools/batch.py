@@ -0,0 +1,148 @@
+import asyncio
+import json
+import logging
+import re
+from os import getenv
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from tools.utils import CLASSIFY_CATEGORIES, LABEL_OPTIONS, SENTIMENT_LABELS, call_ollama, call_ollama_label
+from utils.admission import admission
+from utils.batching import MicroBatcher
+from utils.cache import ERROR_MARKERS
+
+
+logger = logging.getLogger(__name__)
+MICRO_BATCH_SIZE = int(getenv("MICRO_BATCH_SIZE", "16"))
+MICRO_BATCH_WAIT = float(getenv("MICRO_BATCH_WAIT", "0.05"))
+# Route single classify/sentiment calls through the micro-batcher as well.
+MICRO_BATCH_SINGLE_CALLS = getenv("MICRO_BATCH_SINGLE_CALLS", "false").lower() == "true"
+# Batchers kept per (task, model, labels); models and categories come from clients, so idle ones are evicted.
+MICRO_BATCH_MAX_BATCHERS = int(getenv("MICRO_BATCH_MAX_BATCHERS", "64"))
+
+LABEL_TASKS = {
+    "classify": "Classify {subject} into exactly one of these categories: {labels}.",
+    "sentiment": "Classify the sentiment of {subject} as one of: {labels}.",
+}
+DEFAULT_LABELS = {"classify": CLASSIFY_CATEGORIES, "sentiment": SENTIMENT_LABELS}
+
+_NUMBERED_LINE = re.compile(r"^\s*(\d+)\s*[.):\-]\s*(.+?)\s*$")
+
+_batchers: "OrderedDict[Tuple[str, str, Tuple[str, ...]], MicroBatcher]" = OrderedDict()
+
+
+def batch_labels_prompt(task: str, texts: List[str], labels: List[str]) -> str:
+    numbered = "\n".join(f"{i}. {json.dumps(text, ensure_ascii=False)}" for i, text in enumerate(texts, start=1))
+    return (
+        f"{LABEL_TASKS[task].format(subject='each of the following texts', labels=', '.join(labels))}\n"
+        f"Answer only with a JSON array of exactly {len(texts)} strings: one label per text, "
+        f"in the same order. No explanations.\n\n"
+        f"Texts:\n{numbered}\n"
+    )
+
+
+def label_prompt(task: str, text: str, labels: List[str]) -> str:
+    return (
+        f"{LABEL_TASKS[task].format(subject='the following text', labels=', '.join(labels))}\n"
+        f'Answer with JSON: {{"label": "<label>"}}.\n{text}'
+    )
+
+
+def batch_label_options(count: int) -> dict:
+    """
+    LABEL_OPTIONS with the token cap scaled to `count` labels plus the JSON array punctuation.
+    """
+    return {**LABEL_OPTIONS, "num_predict": LABEL_OPTIONS["num_predict"] * count + 8}
+
+
+def match_label(answer: Optional[str], labels: List[str]) -> Optional[str]:
+    """
+    The allowed label `answer` names (case-insensitively, ignoring quotes and a trailing period), or None.
+    """
+    if answer is None:
+        return None
+    answer = answer.strip().strip('"\'').rstrip(".").strip().lower()
+    return next((label for label in labels if label.lower() == answer), None)
+
+
+def parse_batch_labels(output: str, count: int) -> List[Optional[str]]:
+    """
+    Split a batched answer back into one label per input. Missing labels are returned as None.
+    """
+    start, end = output.find("["), output.rfind("]")
+    if start != -1 and end > start:
+        try:
+            labels = json.loads(output[start:end + 1])
+            if isinstance(labels, list) and len(labels) == count:
+                return [str(label).strip() or None for label in labels]
+        except json.JSONDecodeError:
+            pass
+
+    labels: List[Optional[str]] = [None] * count
+    for line in output.splitlines():
+        match = _NUMBERED_LINE.match(line)
+        if match and 1 <= int(match.group(1)) <= count:
+            labels[int(match.group(1)) - 1] = match.group(2).strip().strip('"') or None
+    return labels
+
+
+async def _generate_labels(task: str, texts: List[str], labels: List[str], model: str) -> List[Optional[str]]:
+    chunks = []
+    async for chunk in call_ollama(batch_labels_prompt(task, texts, labels), model, batch_label_options(len(texts))):
+        chunks.append(chunk)
+    output = "".join(chunks).strip()
+    if output.startswith(ERROR_MARKERS):
+        raise RuntimeError(output)
+    return [match_label(answer, labels) for answer in parse_batch_labels(output, len(texts))]
+
+
+def _make_handler(task: str, model: str, labels: List[str]):
+    # Batches of one batcher never hold more Ollama slots than the model admits at once: the rest wait
+    # here instead of overflowing the admission queue (which would fail the whole label_many call).
+    slots = asyncio.Semaphore(admission.limiter(model).max_concurrency)
+
+    async def retry(text: str) -> str:
+        async with slots:
+            return await call_ollama_label(label_prompt(task, text, labels), model, labels, LABEL_OPTIONS)
+
+    async def handler(texts: List[str]) -> List[str]:
+        async with slots:
+            answers = await _generate_labels(task, texts, labels, model)
+        missing = [i for i, label in enumerate(answers) if label is None]
+        if missing:
+            logger.warning(
+                "%s batch answer missing %d/%d valid labels, retrying them individually.", task, len(missing), len(texts)
+            )
+            for i, label in zip(missing, await asyncio.gather(*(retry(texts[i]) for i in missing))):
+                answers[i] = label
+        return answers
+    return handler
+
+
+def get_label_batcher(task: str, model: str, labels: Optional[List[str]] = None) -> MicroBatcher:
+    labels = list(labels or DEFAULT_LABELS[task])
+    key = (task, model, tuple(labels))
+    if key not in _batchers:
+        _batchers[key] = MicroBatcher(_make_handler(task, model, labels), MICRO_BATCH_SIZE, MICRO_BATCH_WAIT)
+        for old in list(_batchers)[:-1]:
+            if len(_batchers) <= MICRO_BATCH_MAX_BATCHERS:
+                break
+            if _batchers[old].idle:
+                del _batchers[old]
+    _batchers.move_to_end(key)
+    return _batchers[key]
+
+
+async def label_one(task: str, text: str, model: str, labels: Optional[List[str]] = None) -> str:
+    return await get_label_batcher(task, model, labels).submit(text)
+
+
+async def label_many(task: str, texts: List[str], model: str, labels: Optional[List[str]] = None) -> List[str]:
+    batcher = get_label_batcher(task, model, labels)
+    return list(await asyncio.gather(*(batcher.submit(text) for text in texts)))
+
+
+def batcher_stats() -> dict:
+    return {
+        f"{task}:{model}" if list(labels) == DEFAULT_LABELS[task] else f"{task}:{model}:{','.join(labels)}": batcher.stats()
+        for (task, model, labels), batcher in _batchers.items()
+    }
@@ -2,28 +2,90 @@ import logging
 from os import getenv
 from fastmcp import Context
 from agents.chat import chat_mcp
-from tools.utils import call_ollama
-from typing import Annotated
+from tools.utils import (
+    CLASSIFY_CATEGORIES, LABEL_OPTIONS, SENTIMENT_LABELS, call_ollama, call_ollama_label, collect_with_progress,
+)
+from tools.session import session_turn
+from tools.summarize import final_summary_prompt, read_document
+from tools.translate import translate_with_memory
+from context.chat import chat_kv_store, chat_memory_store
+from utils.admission import Overloaded
+from tools.batch import MICRO_BATCH_SINGLE_CALLS, label_one, label_many
+from utils.cache import cached_tool
+from utils.metrics import measured_tool
+from utils.semantic_cache import semantic_cached_tool
+from typing import Annotated, List, Optional
 
 
 logger = logging.getLogger(__name__)
 DEFAULT_MODEL = getenv("DEFAULT_MODEL", "llama3.2:1b-instruct-q4_K_M")
 
 
+# === Prompt builders (shared by the buffered tools and the streaming REST endpoints) ===
+def ask_question_prompt(question: str) -> str:
+    return f"Respond to the following question: {question}"
+
+
+def classify_prompt(text: str, categories: Optional[List[str]] = None) -> str:
+    categories = categories or CLASSIFY_CATEGORIES
+    return (
+        f"Classify the following text into one of these categories: {', '.join(categories)}.\n"
+        f'Answer with JSON: {{"label": "<category>"}}.\n{text}'
+    )
+
+
+def sentiment_prompt(text: str) -> str:
+    return (
+        f"What is the sentiment of this text? Answer positive, neutral, or negative.\n"
+        f'Answer with JSON: {{"label": "<sentiment>"}}.\n{text}'
+    )
+
+
+def complete_text_prompt(text: str) -> str:
+    return f"Continue the following:\n{text}"
+
+
+def generate_text_prompt(topic: str) -> str:
+    return f"Write a paragraph about:\n{topic}"
+
+
+def summarize_prompt(text: str) -> str:
+    return f"Summarize the following text:\n{text}"
+
+
+def combine_summaries_prompt(summaries: str) -> str:
+    return f"Combine these partial summaries of one document into a single concise summary:\n{summaries}"
+
+
+def translate_prompt(text: str, language: str) -> str:
+    return f"Translate this to {language}:\n{text}"
+
+
+def paraphrase_prompt(text: str) -> str:
+    return f"Paraphrase this to sound more formal:\n{text}"
+
+
+def instruction_prompt(task: str) -> str:
+    return f"Give step-by-step instructions to:\n{task}"
+
+
+
 # === Tool: QA ===
 @chat_mcp.tool(
     name="ask_question_tool",
     description="Answer a natural language question using the AI model."
 )
+@measured_tool("ask_question_tool")
+@semantic_cached_tool("ask_question_tool", "question")
 async def ask_question_tool(
         question: Annotated[str, "The natural language question to answer."],
         model: Annotated[str, "LLM model to use."] = DEFAULT_MODEL,
+        ctx: Context = None
 ) -> str:
     try:
-        chunks = []
-        async for chunk in call_ollama(prompt=f"Respond to the following question: {question}", model=model):
-            chunks.append(chunk)
-        return "".join(chunks).strip()
+        return (await collect_with_progress(call_ollama(prompt=ask_question_prompt(question), model=model), ctx)).strip()
+    except Overloaded:
+        raise
     except Exception as e:
         logger.exception(f"ask_question_tool failed: {e}")
         return "An error occurred while processing the request."
@@ -33,13 +95,21 @@ async def ask_question_tool(
     name="classify_tool",
     description="Classify a block of text into a predefined category."
 )
+@measured_tool("classify_tool")
+@cached_tool("classify_tool", options=LABEL_OPTIONS)
 async def classify_tool(
         text: Annotated[str, "Text to classify into a category."],
-        model: Annotated[str, "LLM model to use."] = DEFAULT_MODEL
+        model: Annotated[str, "LLM model to use."] = DEFAULT_MODEL,
+        categories: Annotated[Optional[List[str]], "Allowed categories (defaults to CLASSIFY_CATEGORIES)."] = None
 ) -> str:
     try:
-        result = await call_ollama(f"Classify the following text into a category:\n{text}", model).__anext__()
-        return result
+        labels = categories or CLASSIFY_CATEGORIES
+        if MICRO_BATCH_SINGLE_CALLS:
+            # Batched calls are validated against the same labels and capped by the same options.
+            return await label_one("classify", text, model, labels)
+        return await call_ollama_label(classify_prompt(text, labels), model, labels, LABEL_OPTIONS, hedge=True)
+    except Overloaded:
+        raise
     except Exception as e:
         logger.exception(f"classify_tool failed: {e}")
         return "An error occurred while processing the request."
@@ -49,31 +119,61 @@ async def classify_tool(
     name="sentiment_tool",
     description="Analyze the sentiment of a text and classify it as positive, neutral, or negative."
 )
+@measured_tool("sentiment_tool")
+@cached_tool("sentiment_tool", options=LABEL_OPTIONS)
 async def sentiment_tool(
         text: Annotated[str, "Text whose sentiment is being analyzed."],
         model: Annotated[str, "LLM model to use."] = DEFAULT_MODEL
 ) -> str:
     try:
-        result = await call_ollama(f"What is the sentiment of this text?\n{text}", model).__anext__()
-        return result
+        if MICRO_BATCH_SINGLE_CALLS:
+            return await label_one("sentiment", text, model, SENTIMENT_LABELS)
+        return await call_ollama_label(sentiment_prompt(text), model, SENTIMENT_LABELS, LABEL_OPTIONS, hedge=True)
+    except Overloaded:
+        raise
     except Exception as e:
         logger.exception(f"sentiment_tool failed: {e}")
         return "An error occurred while processing the request."
 
+# === Tool: Batch Classification ===
+@chat_mcp.tool(
+    name="classify_batch",
+    description="Classify many texts at once. Returns one category per text, in order."
+)
+@measured_tool("classify_batch")
+async def classify_batch_tool(
+        texts: Annotated[List[str], "Texts to classify into a category."],
+        model: Annotated[str, "LLM model to use."] = DEFAULT_MODEL
+) -> List[str]:
+    return await label_many("classify", texts, model)
+
+# === Tool: Batch Sentiment Analysis ===
+@chat_mcp.tool(
+    name="sentiment_batch",
+    description="Analyze the sentiment of many texts at once. Returns positive, neutral, or negative per text, in order."
+)
+@measured_tool("sentiment_batch")
+async def sentiment_batch_tool(
+        texts: Annotated[List[str], "Texts whose sentiment is being analyzed."],
+        model: Annotated[str, "LLM model to use."] = DEFAULT_MODEL
+) -> List[str]:
+    return await label_many("sentiment", texts, model)
+
 # === Tool: Text Completion ===
 @chat_mcp.tool(
     name="complete_text_tool",
     description="Complete a partial sentence or paragraph with a coherent continuation."
 )
+@measured_tool("complete_text_tool")
 async def complete_text_tool(
         text: Annotated[str, "Text fragment to be completed."],
-        model: Annotated[str, "LLM model to use."] = DEFAULT_MODEL
+        model: Annotated[str, "LLM model to use."] = DEFAULT_MODEL,
+        ctx: Context = None
 ) -> str:
     try:
-        chunks = []
-        async for chunk in call_ollama(f"Continue the following:\n{text}", model):
-            chunks.append(chunk)
-        return "".join(chunks).strip()
+        return (await collect_with_progress(call_ollama(complete_text_prompt(text), model), ctx)).strip()
+    except Overloaded:
+        raise
     except Exception as e:
         logger.exception(f"complete_text_tool failed: {e}")
         return "An error occurred while processing the request."
@@ -83,15 +183,16 @@ async def complete_text_tool(
     name="generate_text_tool",
     description="Generate a paragraph of text about a given topic."
 )
+@measured_tool("generate_text_tool")
 async def generate_text_tool(
         topic: Annotated[str, "Topic to write about."],
-        model: Annotated[str, "LLM model to use."] = DEFAULT_MODEL
+        model: Annotated[str, "LLM model to use."] = DEFAULT_MODEL,
+        ctx: Context = None
 ) -> str:
     try:
-        chunks = []
-        async for chunk in call_ollama(f"Write a paragraph about:\n{topic}", model):
-            chunks.append(chunk)
-        return "".join(chunks).strip()
+        return (await collect_with_progress(call_ollama(generate_text_prompt(topic), model), ctx)).strip()
+    except Overloaded:
+        raise
     except Exception as e:
         logger.exception(f"generate_text_tool failed: {e}")
         return "An error occurred while processing the request."
@@ -101,34 +202,72 @@ async def generate_text_tool(
     name="summarize_tool",
     description="Summarize a long body of text into a concise summary."
 )
+@measured_tool("summarize_tool")
 async def summarize_tool(
         text: Annotated[str, "Text to summarize."],
-        model: Annotated[str, "LLM model to use."] = DEFAULT_MODEL
+        model: Annotated[str, "LLM model to use."] = DEFAULT_MODEL,
+        ctx: Context = None
 ) -> str:
     try:
-        chunks = []
-        async for chunk in call_ollama(f"Summarize the following text:\n{text}", model):
-            chunks.append(chunk)
-        return "".join(chunks).strip()
+        return await summarize_document(text, model, ctx)
+    except Overloaded:
+        raise
     except Exception as e:
         logger.exception(f"summarize_tool failed: {e}")
         return "An error occurred while processing the request."
 
+
+@chat_mcp.tool(
+    name="summarize_file_tool",
+    description="Summarize a text document stored on the local file store or in S3."
+)
+@measured_tool("summarize_file_tool")
+async def summarize_file_tool(
+        path: Annotated[str, "Path of the document, relative to the store root or the S3 key."],
+        source: Annotated[str, "Where the document lives: 'local' or 's3'."] = "local",
+        model: Annotated[str, "LLM model to use."] = DEFAULT_MODEL,
+        ctx: Context = None
+) -> str:
+    try:
+        return await summarize_document(await read_document(path, source), model, ctx)
+    except Overloaded:
+        raise
+    except Exception as e:
+        logger.exception(f"summarize_file_tool failed: {e}")
+        return "An error occurred while processing the request."
+
+
+async def summarize_document(text: str, model: str, ctx: Optional[Context] = None) -> str:
+    """
+    Map-reduce summary of an arbitrarily long text; chunk summaries are forwarded to MCP clients as they complete.
+    """
+    async def on_partial(done: int, total: int, summary: str):
+        if ctx is not None:
+            try:
+                await ctx.report_progress(progress=done, total=total)
+                await ctx.info(summary)
+            except Exception as e:
+                logger.debug("Progress notification failed: %s", e)
+
+    prompt = await final_summary_prompt(text, model, summarize_prompt, combine_summaries_prompt, on_partial=on_partial)
+    return (await collect_with_progress(call_ollama(prompt, model), ctx)).strip()
+
 # === Tool: Translation ===
 @chat_mcp.tool(
     name="translate_tool",
     description="Translate a given text into another language."
 )
+@measured_tool("translate_tool")
 async def translate_tool(
         text: Annotated[str, "Text to translate."],
         language: Annotated[str, "Target language."] = "Spanish",
-        model: Annotated[str, "LLM model to use."] = DEFAULT_MODEL
+        model: Annotated[str, "LLM model to use."] = DEFAULT_MODEL,
+        ctx: Context = None
 ) -> str:
     try:
-        chunks = []
-        async for chunk in call_ollama(f"Translate this to {language}:\n{text}", model):
-            chunks.append(chunk)
-        return "".join(chunks).strip()
+        return await translate_with_memory(text, language, model, translate_prompt, ctx)
+    except Overloaded:
+        raise
     except Exception as e:
         logger.exception(f"translate_tool failed: {e}")
         return "An error occurred while processing the request."
@@ -138,15 +277,16 @@ async def translate_tool(
     name="paraphrase_tool",
     description="Rephrase a given text to sound more formal or fluent."
 )
+@measured_tool("paraphrase_tool")
 async def paraphrase_tool(
         text: Annotated[str, "Text to paraphrase."],
-        model: Annotated[str, "LLM model to use."] = DEFAULT_MODEL
+        model: Annotated[str, "LLM model to use."] = DEFAULT_MODEL,
+        ctx: Context = None
 ) -> str:
     try:
-        chunks = []
-        async for chunk in call_ollama(f"Paraphrase this to sound more formal:\n{text}", model):
-            chunks.append(chunk)
-        return "".join(chunks).strip()
+        return (await collect_with_progress(call_ollama(paraphrase_prompt(text), model), ctx)).strip()
+    except Overloaded:
+        raise
     except Exception as e:
         logger.exception(f"paraphrase_tool failed: {e}")
         return "An error occurred while processing the request."
@@ -156,16 +296,38 @@ async def paraphrase_tool(
     name="instruction_tool",
     description="Provide a step-by-step guide to accomplish a given task."
 )
+@measured_tool("instruction_tool")
 async def instruction_tool(
         task: Annotated[str, "The task you want instructions for."],
-        model: Annotated[str, "LLM model to use."] = DEFAULT_MODEL
+        model: Annotated[str, "LLM model to use."] = DEFAULT_MODEL,
+        ctx: Context = None
 ) -> str:
     try:
-        chunks = []
-        async for chunk in call_ollama(f"Give step-by-step instructions to:\n{task}", model):
-            chunks.append(chunk)
-        return "".join(chunks).strip()
+        return (await collect_with_progress(call_ollama(instruction_prompt(task), model), ctx)).strip()
+    except Overloaded:
+        raise
     except Exception as e:
         logger.exception(f"instruction_tool failed: {e}")
         return "An error occurred while processing the request."
 
+# === Tool: Multi-turn Chat ===
+@chat_mcp.tool(
+    name="chat_tool",
+    description="Continue a multi-turn conversation. Reuse the same session_id to keep the conversation context."
+)
+@measured_tool("chat_tool")
+async def chat_tool(
+        message: Annotated[str, "The next user message."],
+        session_id: Annotated[str, "Conversation id chosen by the client; empty for a one-off turn."] = "",
+        model: Annotated[str, "LLM model to use."] = DEFAULT_MODEL,
+        ctx: Context = None
+) -> str:
+    try:
+        return await session_turn(
+            session_id, message, model, chat_kv_store, chat_memory_store, ctx
+        )
+    except Overloaded:
+        raise
+    except Exception as e:
+        logger.exception(f"chat_tool failed: {e}")
+        return "An error occurred while processing the request."
@@ -2,7 +2,13 @@ import logging
 from os import getenv
 from fastmcp import Context
 from agents.code import code_mcp
-from tools.utils import call_ollama
+from tools.utils import call_ollama, collect_with_progress
+from tools.session import session_turn
+from context.code import code_kv_store, code_thread_store
+from utils.admission import Overloaded
+from utils.cache import cached_tool
+from utils.metrics import measured_tool
+from utils.semantic_cache import semantic_cached_tool
 from typing import Annotated
 
 
@@ -10,6 +16,41 @@ logger = logging.getLogger(__name__)
 DEFAULT_MODEL = getenv("DEFAULT_MODEL", "llama3.2:1b-instruct-q4_K_M")
 
 
+# === Prompt builders (shared by the buffered tools and the streaming REST endpoints) ===
+def generate_code_prompt(prompt: str, language: str = "python") -> str:
+    language = language.lower()
+    instructions = {
+        "python": "Respond with well-structured Python code including functions, docstrings, and comments.",
+        "javascript": "Respond with idiomatic JavaScript using modern ES6+ syntax and inline comments.",
+        "typescript": "Respond with TypeScript using proper type annotations and best practices.",
+        "bash": "Write Bash shell script with comments explaining each major step.",
+        "go": "Generate Go code with idiomatic structure and comments."
+    }
+    instruction = instructions.get(language, f"Write code in {language} with best practices and clear structure.")
+    return f"You are a professional software engineer. {instruction}\n\nTask: {prompt}\n\n--- Begin {language} code ---\n"
+
+
+def fix_code_prompt(code: str) -> str:
+    return f"Fix and improve the following code:\n\n{code}"
+
+
+def explain_code_prompt(code: str) -> str:
+    return f"Explain this code clearly:\n\n{code}"
+
+
+def write_tests_prompt(code: str, language: str = "python") -> str:
+    return f"Write unit tests for this {language} code:\n\n{code}"
+
+
+def debug_code_prompt(code: str) -> str:
+    return f"Find bugs or errors in the following code:\n\n{code}"
+
+
+def docstring_prompt(code: str) -> str:
+    return f"Write a clear docstring for this function:\n\n{code}"
+
+
+
 @code_mcp.tool(
 
     name="analyze_structure",
@@ -34,26 +75,18 @@ def analyze_structure(
     name="generate_code",
     description="Generate source code in the specified language based on a prompt."
 )
+@measured_tool("generate_code")
 async def generate_code_tool(
         prompt: Annotated[str, "Natural language prompt describing what to code."],
         language: Annotated[str, "Programming language."] = "python",
-        model: Annotated[str, "LLM model to use."] = DEFAULT_MODEL
+        model: Annotated[str, "LLM model to use."] = DEFAULT_MODEL,
+        ctx: Context = None
 ) -> str:
     try:
-        language = language.lower()
-        instructions = {
-            "python": "Respond with well-structured Python code including functions, docstrings, and comments.",
-            "javascript": "Respond with idiomatic JavaScript using modern ES6+ syntax and inline comments.",
-            "typescript": "Respond with TypeScript using proper type annotations and best practices.",
-            "bash": "Write Bash shell script with comments explaining each major step.",
-            "go": "Generate Go code with idiomatic structure and comments."
-        }
-        instruction = instructions.get(language, f"Write code in {language} with best practices and clear structure.")
-        full_prompt = f"You are a professional software engineer. {instruction}\n\nTask: {prompt}\n\n--- Begin {language} code ---\n"
-        chunks = []
-        async for chunk in call_ollama(prompt=full_prompt, model=model):
-            chunks.append(chunk)
-        return "".join(chunks).strip()
+        full_prompt = generate_code_prompt(prompt, language)
+        return (await collect_with_progress(call_ollama(prompt=full_prompt, model=model), ctx)).strip()
+    except Overloaded:
+        raise
     except Exception as e:
         logger.exception(f"generate_code_tool failed: {e}")
         return "An error occurred while generating code."
@@ -62,16 +95,17 @@ async def generate_code_tool(
     name="fix_code_tool",
     description="Fix and refactor provided code."
 )
+@measured_tool("fix_code_tool")
 async def fix_code_tool(
         code: Annotated[str, "Code snippet to fix or refactor."],
-        model: Annotated[str, "LLM model to use."] = DEFAULT_MODEL
+        model: Annotated[str, "LLM model to use."] = DEFAULT_MODEL,
+        ctx: Context = None
 ) -> str:
     try:
-        prompt = f"Fix and improve the following code:\n\n{code}"
-        chunks = []
-        async for chunk in call_ollama(prompt, model):
-            chunks.append(chunk)
-        return "".join(chunks).strip()
+        prompt = fix_code_prompt(code)
+        return (await collect_with_progress(call_ollama(prompt, model), ctx)).strip()
+    except Overloaded:
+        raise
     except Exception as e:
         logger.exception(f"fix_code_tool failed: {e}")
         return "An error occurred while fixing the code."
@@ -80,16 +114,19 @@ async def fix_code_tool(
     name="explain_code_tool",
     description="Explain the logic and purpose of a given code snippet."
 )
+@measured_tool("explain_code_tool")
+@cached_tool("explain_code_tool")
+@semantic_cached_tool("explain_code_tool", "code")
 async def explain_code_tool(
         code: Annotated[str, "Code snippet to explain."],
-        model: Annotated[str, "LLM model to use."] = DEFAULT_MODEL
+        model: Annotated[str, "LLM model to use."] = DEFAULT_MODEL,
+        ctx: Context = None
 ) -> str:
     try:
-        prompt = f"Explain this code clearly:\n\n{code}"
-        chunks = []
-        async for chunk in call_ollama(prompt, model):
-            chunks.append(chunk)
-        return "".join(chunks).strip()
+        prompt = explain_code_prompt(code)
+        return (await collect_with_progress(call_ollama(prompt, model), ctx)).strip()
+    except Overloaded:
+        raise
     except Exception as e:
         logger.exception(f"explain_code_tool failed: {e}")
         return "An error occurred while explaining the code."
@@ -98,17 +135,18 @@ async def explain_code_tool(
     name="write_tests_tool",
     description="Generate unit tests for the given code."
 )
+@measured_tool("write_tests_tool")
 async def write_tests_tool(
         code: Annotated[str, "Code to generate unit tests for."],
         language: Annotated[str, "Programming language."] = "python",
-        model: Annotated[str, "LLM model to use."] = DEFAULT_MODEL
+        model: Annotated[str, "LLM model to use."] = DEFAULT_MODEL,
+        ctx: Context = None
 ) -> str:
     try:
-        prompt = f"Write unit tests for this {language} code:\n\n{code}"
-        chunks = []
-        async for chunk in call_ollama(prompt, model):
-            chunks.append(chunk)
-        return "".join(chunks).strip()
+        prompt = write_tests_prompt(code, language)
+        return (await collect_with_progress(call_ollama(prompt, model), ctx)).strip()
+    except Overloaded:
+        raise
     except Exception as e:
         logger.exception(f"write_tests_tool failed: {e}")
         return "An error occurred while generating unit tests."
@@ -117,16 +155,17 @@ async def write_tests_tool(
     name="debug_code_tool",
     description="Detect bugs and logical errors in the provided code."
 )
+@measured_tool("debug_code_tool")
 async def debug_code_tool(
         code: Annotated[str, "Code to debug."],
-        model: Annotated[str, "LLM model to use."] = DEFAULT_MODEL
+        model: Annotated[str, "LLM model to use."] = DEFAULT_MODEL,
+        ctx: Context = None
 ) -> str:
     try:
-        prompt = f"Find bugs or errors in the following code:\n\n{code}"
-        chunks = []
-        async for chunk in call_ollama(prompt, model):
-            chunks.append(chunk)
-        return "".join(chunks).strip()
+        prompt = debug_code_prompt(code)
+        return (await collect_with_progress(call_ollama(prompt, model), ctx)).strip()
+    except Overloaded:
+        raise
     except Exception as e:
         logger.exception(f"debug_code_tool failed: {e}")
         return "An error occurred while debugging the code."
@@ -135,17 +174,39 @@ async def debug_code_tool(
     name="generate_function_docstring_tool",
     description="Generate a clear and informative docstring for the given function."
 )
+@measured_tool("generate_function_docstring_tool")
+@cached_tool("generate_function_docstring_tool")
 async def generate_function_docstring_tool(
         code: Annotated[str, "Function code to document."],
         model: Annotated[str, "LLM model to use."] = DEFAULT_MODEL,
         ctx: Context = None
 ) -> str:
     try:
-        prompt = f"Write a clear docstring for this function:\n\n{code}"
-        chunks = []
-        async for chunk in call_ollama(prompt, model):
-            chunks.append(chunk)
-        return "".join(chunks).strip()
+        prompt = docstring_prompt(code)
+        return (await collect_with_progress(call_ollama(prompt, model, hedge=True), ctx)).strip()
+    except Overloaded:
+        raise
     except Exception as e:
         logger.exception(f"generate_function_docstring_tool failed: {e}")
         return "An error occurred while generating a docstring."
+
+@code_mcp.tool(
+    name="code_chat_tool",
+    description="Ask follow-up coding questions in a thread. Reuse the same session_id to keep the thread context."
+)
+@measured_tool("code_chat_tool")
+async def code_chat_tool(
+        message: Annotated[str, "The next question or code snippet."],
+        session_id: Annotated[str, "Thread id chosen by the client; empty for a one-off turn."] = "",
+        model: Annotated[str, "LLM model to use."] = DEFAULT_MODEL,
+        ctx: Context = None
+) -> str:
+    try:
+        return await session_turn(
+            session_id, message, model, code_kv_store, code_thread_store, ctx
+        )
+    except Overloaded:
+        raise
+    except Exception as e:
+        logger.exception(f"code_chat_tool failed: {e}")
+        return "An error occurred while processing the request."
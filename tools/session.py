@@ -0,0 +1,170 @@
+import asyncio
+import logging
+from os import getenv
+from typing import Dict, List, Optional, Tuple
+from fastmcp import Context
+from context.session_kv import SessionKVStore
+from context.session_store import SessionStore
+from tools.summarize import estimate_tokens
+from tools.utils import call_ollama, collect_with_progress
+from utils.cache import ERROR_MARKERS
+
+
+logger = logging.getLogger(__name__)
+
+# Token budget of the remembered history sent with a turn (summary + verbatim turns), per model.
+MEMORY_TOKEN_BUDGET = int(getenv("MEMORY_TOKEN_BUDGET", "2048"))
+# Per-model overrides, e.g. "llama3.2:1b=1024,qwen2.5-coder:14b=6144".
+MEMORY_TOKEN_BUDGETS: Dict[str, int] = {
+    model.strip(): int(budget)
+    for model, _, budget in (item.partition("=") for item in getenv("MEMORY_TOKEN_BUDGETS", "").split(","))
+    if model.strip() and budget.strip()
+}
+# Share of the budget the rolling summary may take; the rest goes to the most recent turns.
+MEMORY_SUMMARY_SHARE = float(getenv("MEMORY_SUMMARY_SHARE", "0.25"))
+# Pending turns are re-sent verbatim until they take this share of the budget; only then are they summarized.
+MEMORY_COMPACT_SHARE = float(getenv("MEMORY_COMPACT_SHARE", "0.25"))
+
+# Running summarizations, one per session; a running one picks up turns that become pending meanwhile.
+_compactions: Dict[Tuple[str, str], asyncio.Task] = {}
+
+
+def memory_budget(model: str) -> int:
+    return MEMORY_TOKEN_BUDGETS.get(model, MEMORY_TOKEN_BUDGET)
+
+
+def turn_tokens(turns: List[Dict]) -> int:
+    return sum(estimate_tokens(turn["content"]) + 2 for turn in turns)
+
+
+def session_prompt(history: List[Dict], message: str, summary: str = "") -> str:
+    """
+    Render the conversation summary, the remembered turns and the new message, used when the session has
+    no KV context yet.
+    """
+    lines = [f"Summary of the earlier conversation: {summary}"] if summary else []
+    lines.extend(f"{turn['role'].capitalize()}: {turn['content']}" for turn in history)
+    lines.append(f"User: {message}")
+    return "\n".join(lines)
+
+
+def fit_history(summary: str, history: List[Dict], budget: int) -> Tuple[str, List[Dict]]:
+    """
+    Cut the summary to its share of `budget`, then keep the newest turns that fit in what is left.
+    """
+    summary_budget = int(budget * MEMORY_SUMMARY_SHARE)
+    if estimate_tokens(summary) > summary_budget:
+        summary = summary[:summary_budget * 4].rsplit(" ", 1)[0] + " …"
+    remaining = budget - (estimate_tokens(summary) if summary else 0)
+    kept = []
+    for turn in reversed(history):
+        remaining -= estimate_tokens(turn["content"]) + 2
+        if remaining < 0:
+            break
+        kept.append(turn)
+    return summary, kept[::-1]
+
+
+def summary_prompt(summary: str, turns: List[Dict], max_tokens: int) -> str:
+    transcript = "\n".join(f"{turn['role'].capitalize()}: {turn['content']}" for turn in turns)
+    return (
+        "You maintain the running summary of a conversation between a user and an assistant.\n"
+        "Update the summary with the new turns below. Keep facts, decisions, names, code identifiers and open "
+        "questions; drop pleasantries and repetition. Answer with the updated summary only, in at most "
+        f"{max_tokens * 3 // 4} words.\n\n"
+        f"Current summary:\n{summary or '(none)'}\n\n"
+        f"New turns:\n{transcript}"
+    )
+
+
+async def compact_session(memory: SessionStore, session_id: str, model: str):
+    """
+    Fold the session's pending turns into its rolling summary while they take more than MEMORY_COMPACT_SHARE
+    of the budget. On failure the turns stay pending (bounded by the store's per-session size cap) and are
+    retried after the next turn.
+    """
+    max_tokens = max(32, int(memory_budget(model) * MEMORY_SUMMARY_SHARE))
+    min_tokens = int(memory_budget(model) * MEMORY_COMPACT_SHARE)
+    rejected_start = None
+    try:
+        while True:
+            state = await memory.state(session_id)
+            if not state.pending or turn_tokens(state.pending) < min_tokens or state.pending_start == rejected_start:
+                return
+            prompt = summary_prompt(state.summary, state.pending, max_tokens)
+            chunks = [chunk async for chunk in call_ollama(prompt, model, options={"num_predict": max_tokens})]
+            summary = "".join(chunks).strip()
+            if not summary or summary.startswith(ERROR_MARKERS):
+                logger.warning("[%s] Summarizing %d turns failed: %s", session_id, len(state.pending), summary[:200])
+                return
+            if not await memory.set_summary(session_id, summary, start=state.pending_start, consumed=len(state.pending)):
+                # Turns were trimmed or folded elsewhere while summarizing: start over from the current state,
+                # unless nothing moved (the store refused the fold for another reason).
+                logger.debug("[%s] Pending turns changed while summarizing, retrying", session_id)
+                rejected_start = state.pending_start
+                continue
+            logger.debug("[%s] Folded %d turns into the summary", session_id, len(state.pending))
+    except Exception as e:
+        logger.warning("[%s] Summarizing the session failed: %s", session_id, e)
+
+
+def schedule_compaction(memory: SessionStore, session_id: str, model: str) -> Optional[asyncio.Task]:
+    """
+    Summarize pending turns in the background, off the request path; at most one task per session.
+    """
+    key = (memory.name, session_id)
+    if key in _compactions:
+        return _compactions[key]
+    task = asyncio.create_task(compact_session(memory, session_id, model))
+    _compactions[key] = task
+    task.add_done_callback(lambda _: _compactions.pop(key, None))
+    return task
+
+
+async def session_turn(
+        session_id: str,
+        message: str,
+        model: str,
+        kv_store: SessionKVStore,
+        memory: SessionStore,
+        ctx: Optional[Context] = None,
+) -> str:
+    """
+    Run one turn of a multi-turn session. While the session's Ollama KV context is cached and covers the
+    whole shared history, only the new message is sent; otherwise (first turn, evicted, other model, over
+    budget, turns served by another worker) the rolling summary and the most recent turns that fit the
+    model's memory budget re-prime the session.
+    """
+    budget = memory_budget(model)
+    state = await memory.state(session_id) if session_id else None
+    # The history is shared by all workers: a cached context is only current if no other worker served a turn.
+    context = kv_store.get(session_id, model, state.version) if session_id else None
+    prompt = message
+    if session_id and not context:
+        # Pending turns are older than the ring buffer's but not summarized yet: send them while they fit.
+        summary, history = fit_history(state.summary, state.pending + state.turns, budget)
+        if summary or history:
+            prompt = session_prompt(history, message, summary)
+    final = {}
+    result = (await collect_with_progress(call_ollama(prompt, model, context=context, final=final), ctx)).strip()
+    if not session_id:
+        return result
+    if not final.get("done"):
+        # The turn failed: keep the history as it was and re-prime from text next time.
+        kv_store.drop(session_id)
+        return result
+    turns = ({"role": "user", "content": message}, {"role": "assistant", "content": result})
+    updated = await memory.append(session_id, *turns)
+    tokens = final.get("context") or []
+    # Keep the context while it fits the budget and holds every turn: none appended by another worker meanwhile.
+    kv_active = len(tokens) <= budget and updated.version == state.version + len(turns)
+    if kv_active:
+        kv_store.put(session_id, model, tokens, updated.version)
+    else:
+        # The next turn re-primes from the summary and the recent turns instead.
+        kv_store.drop(session_id)
+    if updated.pending and not kv_active:
+        # The summary is only read when re-priming: while the KV context is used, leave the turns pending.
+        schedule_compaction(memory, session_id, model)
+    logger.debug("[%s] turn done, prompt_eval_count=%s", session_id, final.get("prompt_eval_count"))
+    return result
@@ -0,0 +1,160 @@
+import asyncio
+import re
+from os import getenv
+from typing import Awaitable, Callable, List, Optional
+from data_sources.abstract_storage import BaseStorage
+from tools.utils import call_ollama
+from utils.admission import admission
+from utils.cache import ERROR_MARKERS
+from utils.logger_config import configure_logger
+
+
+logger = configure_logger("Summarize")
+
+# Input budget of one map/reduce prompt, in (estimated) tokens.
+SUMMARY_CHUNK_TOKENS = int(getenv("SUMMARY_CHUNK_TOKENS", "1500"))
+SUMMARY_MAX_LEVELS = int(getenv("SUMMARY_MAX_LEVELS", "4"))
+LOCAL_BASE_PATH = getenv("LOCAL_BASE_PATH", "/data")
+S3_BUCKET = getenv("S3_BUCKET", "my-bucket")
+S3_REGION = getenv("S3_REGION", "us-east-1")
+
+_PARAGRAPHS = re.compile(r"\n\s*\n")
+_SENTENCES = re.compile(r"(?<=[.!?。！？])\s+")
+
+PartialCallback = Callable[[int, int, str], Awaitable[None]]
+
+
+def _tokens(chars: int) -> int:
+    # ~4 characters per token for English text with Llama-style tokenizers.
+    return chars // 4 + 1
+
+
+def estimate_tokens(text: str) -> int:
+    return _tokens(len(text))
+
+
+def _pieces(text: str, max_tokens: int) -> List[str]:
+    """
+    Split into paragraphs, oversized paragraphs into sentences, and oversized sentences into words.
+    """
+    pieces = []
+    for paragraph in filter(None, (p.strip() for p in _PARAGRAPHS.split(text))):
+        if estimate_tokens(paragraph) <= max_tokens:
+            pieces.append(paragraph)
+            continue
+        for sentence in filter(None, (s.strip() for s in _SENTENCES.split(paragraph))):
+            if estimate_tokens(sentence) <= max_tokens:
+                pieces.append(sentence)
+                continue
+            # Words longer than the whole budget (URLs, base64, minified code) are cut into slices.
+            width = max_tokens * 4 - 4
+            words = [w[i:i + width] for w in sentence.split() for i in range(0, len(w), width)]
+            current = []
+            for word in words:
+                if current and estimate_tokens(" ".join(current + [word])) > max_tokens:
+                    pieces.append(" ".join(current))
+                    current = []
+                current.append(word)
+            if current:
+                pieces.append(" ".join(current))
+    return pieces
+
+
+def split_into_chunks(text: str, max_tokens: int = SUMMARY_CHUNK_TOKENS) -> List[str]:
+    """
+    Pack paragraphs (or sentences, for long paragraphs) into chunks of at most `max_tokens`.
+    """
+    chunks, current, chars = [], [], 0
+    for piece in _pieces(text, max_tokens):
+        # `chars` is the length of the chunk joined with its "\n\n" separators.
+        if current and _tokens(chars + 2 + len(piece)) > max_tokens:
+            chunks.append("\n\n".join(current))
+            current, chars = [], 0
+        chars += len(piece) + (2 if current else 0)
+        current.append(piece)
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+async def _summarize(prompt: str, model: str) -> str:
+    result = "".join([chunk async for chunk in call_ollama(prompt, model)]).strip()
+    if result.startswith(ERROR_MARKERS):
+        raise RuntimeError(f"Chunk summary failed: {result}")
+    return result
+
+
+async def _summarize_all(
+        texts: List[str],
+        prompt: Callable[[str], str],
+        model: str,
+        on_partial: Optional[PartialCallback] = None,
+) -> List[str]:
+    """
+    Summarize `texts` concurrently, never holding more generations than the model's admission
+    limit so the document does not fill the shared wait queue. Results keep the input order.
+    """
+    limit = asyncio.Semaphore(admission.limiter(model).max_concurrency)
+    results: List[Optional[str]] = [None] * len(texts)
+    done = 0
+
+    async def run(index: int, text: str):
+        nonlocal done
+        async with limit:
+            results[index] = await _summarize(prompt(text), model)
+        done += 1
+        if on_partial is not None:
+            await on_partial(done, len(texts), results[index])
+
+    tasks = [asyncio.create_task(run(index, text)) for index, text in enumerate(texts)]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        # First failure (or cancellation) aborts the remaining chunks; Overloaded reaches the caller as is.
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    return results
+
+
+async def final_summary_prompt(
+        text: str,
+        model: str,
+        map_prompt: Callable[[str], str],
+        reduce_prompt: Callable[[str], str],
+        max_tokens: int = SUMMARY_CHUNK_TOKENS,
+        on_partial: Optional[PartialCallback] = None,
+) -> str:
+    """
+    Map-reduce `text` until what is left fits a single prompt and return that last prompt, so the
+    caller can stream the final answer. Short texts come back as `map_prompt(text)` unchanged.
+    """
+    chunks = split_into_chunks(text, max_tokens)
+    if len(chunks) <= 1:
+        return map_prompt(text)
+    logger.info("Summarizing %d chunks with %s", len(chunks), model)
+    summaries = await _summarize_all(chunks, map_prompt, model, on_partial)
+    for _ in range(SUMMARY_MAX_LEVELS):
+        joined = "\n\n".join(summaries)
+        groups = split_into_chunks(joined, max_tokens)
+        if len(groups) <= 1:
+            break
+        summaries = await _summarize_all(groups, reduce_prompt, model, on_partial)
+    return reduce_prompt("\n\n".join(summaries))
+
+
+async def read_document(path: str, source: str = "local") -> str:
+    """
+    Load a UTF-8 document from LocalStorage (under LOCAL_BASE_PATH) or S3Storage (S3_BUCKET).
+    """
+    storage: BaseStorage
+    if source == "local":
+        from data_sources.filesystem import LocalStorage
+        storage = LocalStorage(base_path=LOCAL_BASE_PATH)
+    elif source == "s3":
+        from data_sources.s3 import S3Storage
+        storage = S3Storage(bucket=S3_BUCKET, region=S3_REGION)
+    else:
+        raise ValueError(f"Unknown document source '{source}', expected 'local' or 's3'")
+    return (await storage.download(path)).decode("utf-8", errors="replace")
@@ -0,0 +1,137 @@
+import asyncio
+import json
+import logging
+import re
+from os import getenv
+from typing import Callable, Dict, List, Optional, Tuple
+from fastmcp import Context
+from tools.utils import call_ollama, collect_with_progress
+from utils.admission import admission
+from utils.cache import ERROR_MARKERS
+from utils.translation_memory import TM_ENABLED, TranslationMemory, segment_key, translation_memory
+
+
+logger = logging.getLogger(__name__)
+TRANSLATION_BATCH_SEGMENTS = int(getenv("TRANSLATION_BATCH_SEGMENTS", "20"))
+
+# Sentence ends (followed by whitespace) and line breaks separate segments; separators are kept verbatim.
+_SEPARATOR = re.compile(r"((?<=[.!?。！？])[ \t]+|\s*\n\s*)")
+_TRANSLATABLE = re.compile(r"[^\W\d_]")
+
+
+def split_segments(text: str) -> List[str]:
+    """
+    Alternating [segment, separator, segment, ...] list; "".join() gives back the original text.
+    """
+    return _SEPARATOR.split(text)
+
+
+def translate_batch_prompt(segments: List[str], language: str) -> str:
+    numbered = "\n".join(f"{i}. {json.dumps(s, ensure_ascii=False)}" for i, s in enumerate(segments, start=1))
+    return (
+        f"Translate each of the following segments to {language}.\n"
+        f"Answer only with a JSON array of exactly {len(segments)} strings: one translation per segment, "
+        f"in the same order. No explanations.\n\n"
+        f"Segments:\n{numbered}\n"
+    )
+
+
+def parse_batch_translations(output: str, count: int) -> Optional[List[str]]:
+    start, end = output.find("["), output.rfind("]")
+    if start == -1 or end <= start:
+        return None
+    try:
+        translations = json.loads(output[start:end + 1])
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(translations, list) or len(translations) != count:
+        return None
+    return [str(t).strip() for t in translations]
+
+
+async def _generate(prompt: str, model: str) -> str:
+    output = "".join([chunk async for chunk in call_ollama(prompt, model)]).strip()
+    if output.startswith(ERROR_MARKERS):
+        raise RuntimeError(output)
+    return output
+
+
+async def _translate_missing(
+        segments: List[str],
+        language: str,
+        model: str,
+        prompt: Callable[[str, str], str],
+) -> List[str]:
+    """
+    Translate `segments` in batched prompts run concurrently (within the model's admission limit).
+    A batch whose answer cannot be split back is retried one segment per prompt.
+    """
+    limit = asyncio.Semaphore(admission.limiter(model).max_concurrency)
+
+    async def one(segment: str) -> str:
+        async with limit:
+            return await _generate(prompt(segment, language), model)
+
+    async def batch(part: List[str]) -> List[str]:
+        if len(part) == 1:
+            return [await one(part[0])]
+        async with limit:
+            output = await _generate(translate_batch_prompt(part, language), model)
+        translations = parse_batch_translations(output, len(part))
+        if translations is None:
+            logger.warning(f"Batched translation of {len(part)} segments could not be split, retrying one by one.")
+            translations = list(await asyncio.gather(*(one(segment) for segment in part)))
+        return translations
+
+    parts = [segments[i:i + TRANSLATION_BATCH_SEGMENTS] for i in range(0, len(segments), TRANSLATION_BATCH_SEGMENTS)]
+    results = await asyncio.gather(*(batch(part) for part in parts))
+    return [translation for part in results for translation in part]
+
+
+def _strip(segment: str) -> Tuple[str, str, str]:
+    core = segment.strip()
+    if not core:
+        return segment, "", ""
+    start = segment.index(core)
+    return segment[:start], core, segment[start + len(core):]
+
+
+async def translate_with_memory(
+        text: str,
+        language: str,
+        model: str,
+        prompt: Callable[[str, str], str],
+        ctx: Optional[Context] = None,
+        memory: Optional[TranslationMemory] = None,
+) -> str:
+    """
+    Translate `text` segment by segment, reusing stored translations and only sending the missing
+    segments to the model. Separators and surrounding whitespace are preserved in the output.
+    """
+    if not TM_ENABLED:
+        return (await collect_with_progress(call_ollama(prompt(text, language), model), ctx)).strip()
+    memory = memory or translation_memory
+    parts = split_segments(text)
+    # Even indexes are segments, odd ones separators; segments without letters are kept as they are.
+    cores: Dict[int, Tuple[str, str, str]] = {
+        i: _strip(part) for i, part in enumerate(parts) if i % 2 == 0 and _TRANSLATABLE.search(part)
+    }
+    keys = {core: segment_key(core, language, model) for _, core, _ in cores.values()}
+    known = await memory.get_many(list(set(keys.values())))
+    missing = [core for core, key in keys.items() if key not in known]
+    if missing:
+        logger.info("Translating %d/%d segments to %s", len(missing), len(keys), language)
+        if len(cores) == 1:
+            # A single sentence: stream it like any other tool call.
+            translated = [(await collect_with_progress(call_ollama(prompt(missing[0], language), model), ctx)).strip()]
+            if translated[0].startswith(ERROR_MARKERS):
+                return translated[0]
+        else:
+            translated = await _translate_missing(missing, language, model, prompt)
+        fresh = {keys[core]: translation for core, translation in zip(missing, translated) if translation}
+        known.update(fresh)
+        await memory.put_many(fresh)
+
+    for i, (lead, core, trail) in cores.items():
+        parts[i] = lead + known.get(keys[core], core) + trail
+    return "".join(parts).strip()
@@ -1,43 +1,255 @@
+import asyncio
 import json
+import time
 import httpx
 import logging
 from os import getenv
+from contextlib import aclosing
+from typing import AsyncIterator, Dict, Any, List, Optional, Union
+from fastmcp import Context
+from clients.ollama import OllamaBackend, get_ollama_client
+from clients.warmup import OLLAMA_KEEP_ALIVE
+from utils.admission import Overloaded, admission
+from utils.cancellation import cancellation_metrics, with_deadline
+from utils.hedging import HEDGE_ENABLED, hedge_policy
+from utils.metrics import LLM_IN_FLIGHT, LLM_QUEUE_TIME, model_label, observe_generation
+from utils.ndjson import NDJSONDecoder, frame_stats
+from utils.single_flight import StreamCoalescer
+from utils.tracing import inject, tracer
 
 
 logger = logging.getLogger(__name__)
-OLLAMA_BASE_URL = getenv("OLLAMA_BASE_URL", "http://192.168.1.20:11434")
+PROGRESS_EVERY_TOKENS = int(getenv("MCP_PROGRESS_EVERY_TOKENS", "16"))
+PROGRESS_INTERVAL = float(getenv("MCP_PROGRESS_INTERVAL", "0.5"))
+OLLAMA_COALESCE = getenv("OLLAMA_COALESCE", "true").lower() == "true"
+CLASSIFY_CATEGORIES = getenv(
+    "CLASSIFY_CATEGORIES",
+    "business,technology,science,health,sports,politics,entertainment,education,other"
+).split(",")
+SENTIMENT_LABELS = ["positive", "neutral", "negative"]
+# Label-style answers need a handful of tokens: cap generation and keep it deterministic.
+LABEL_OPTIONS = {
+    "temperature": 0,
+    "num_predict": int(getenv("LABEL_MAX_TOKENS", "16")),
+    "stop": ["\n\n"],
+}
 
+ollama_flights = StreamCoalescer()
 
-async def call_ollama(prompt: str, model: str):
+
+async def stream_ollama(
+        prompt: str,
+        model: str,
+        options: Optional[dict] = None,
+        response_format: Optional[Union[dict, str]] = None,
+        context: Optional[List[int]] = None,
+        hedge: bool = False,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Yield the decoded JSON frames of an Ollama /api/generate stream, including the final `done` frame
+    that carries the eval stats. Transport errors are raised to the caller.
+    `context` is the token array returned by a previous turn; Ollama reuses it instead of re-evaluating the history.
+    Identical concurrent requests (model, prompt, options, format, context) share a single upstream generation.
+    Each caller is bounded by LLM_REQUEST_DEADLINE; cancelling the caller closes the upstream stream.
+    `hedge` lets short requests race a second backend when the first token is late (OLLAMA_HEDGE).
+    """
+    generate = _hedged_generate if hedge and HEDGE_ENABLED else _generate
+    if not OLLAMA_COALESCE:
+        frames = generate(prompt, model, options, response_format, context)
+    else:
+        key = (
+            model,
+            prompt,
+            json.dumps(options, sort_keys=True) if options else None,
+            json.dumps(response_format, sort_keys=True) if response_format else None,
+            hash(tuple(context)) if context else None,
+        )
+        frames = ollama_flights.subscribe(key, lambda: generate(prompt, model, options, response_format, context))
+    try:
+        async for data in with_deadline(frames):
+            yield data
+    except asyncio.CancelledError:
+        # Client disconnect, MCP cancellation or an outer timeout: closing `frames` aborts the upstream request.
+        cancellation_metrics["cancelled"] += 1
+        raise
+
+
+async def _generate(
+        prompt: str,
+        model: str,
+        options: Optional[dict] = None,
+        response_format: Optional[Union[dict, str]] = None,
+        context: Optional[List[int]] = None,
+        backend: Optional[OllamaBackend] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    ollama = get_ollama_client()
+    client = await ollama.get_client()
+    body = {
+        "stream": True,
+        "model": model,
+        "prompt": prompt,
+        "keep_alive": OLLAMA_KEEP_ALIVE,
+    }
+    if options:
+        body["options"] = options
+    if response_format:
+        body["format"] = response_format
+    if context:
+        body["context"] = context
+    requested = time.perf_counter()
+    # Not made current: the generator is resumed from the caller's context, possibly by another task.
+    span = tracer.start_span("ollama.generate", model=model, prompt_chars=len(prompt), reuses_context=bool(context))
+    first_token, final, status, chunks, admitted = None, None, "error", 0, False
+    try:
+        async with admission.slot(model):
+            admitted = True
+            LLM_QUEUE_TIME.labels(model_label(model)).observe(time.perf_counter() - requested)
+            span.add_event("admitted")
+            backend = backend or ollama.pick(model)
+            span.set_attribute("backend", backend.url)
+            in_flight = LLM_IN_FLIGHT.labels(model_label(model))
+            in_flight.inc()
+            try:
+                async with backend.track():
+                    try:
+                        async with client.stream(
+                                "POST", f"{backend.url}/api/generate", json=body, headers=inject({}, span),
+                        ) as response:
+                            span.add_event("response_headers", status_code=response.status_code)
+                            if response.is_error:
+                                await response.aread()
+                            response.raise_for_status()
+                            decoder = NDJSONDecoder()
+                            async for chunk in response.aiter_bytes():
+                                chunks += 1
+                                for data in decoder.feed(chunk):
+                                    if first_token is None and data.get("response"):
+                                        first_token = time.perf_counter()
+                                        span.add_event("first_token")
+                                    if data.get("done"):
+                                        final = data
+                                    yield data
+                            for data in decoder.flush():
+                                if data.get("done"):
+                                    final = data
+                                yield data
+                    except httpx.TransportError:
+                        backend.mark_failure()
+                        raise
+                    backend.mark_success()
+                status = "ok"
+            finally:
+                in_flight.dec()
+    except (asyncio.CancelledError, GeneratorExit):
+        status = "cancelled"
+        raise
+    except BaseException as e:
+        span.record_exception(e)
+        raise
+    finally:
+        if admitted:
+            observe_generation(model, requested, first_token, final, status)
+        span.set_attribute("chunks", chunks)
+        if first_token is not None:
+            span.set_attribute("ttft_ms", round((first_token - requested) * 1000, 3))
+        if final is not None:
+            span.add_event("done", **frame_stats(final))
+        span.end({"ok": "ok", "cancelled": "cancelled"}.get(status, "error"))
+
+
+async def _hedged_generate(
+        prompt: str,
+        model: str,
+        options: Optional[dict] = None,
+        response_format: Optional[Union[dict, str]] = None,
+        context: Optional[List[int]] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    `_generate` on one backend, plus a second request on another backend when no frame arrived within
+    the hedge delay. The first to produce a frame is streamed; the other is cancelled.
+    """
+    ollama = get_ollama_client()
+    if sum(b.healthy for b in ollama.backends) < 2:
+        async for data in _generate(prompt, model, options, response_format, context):
+            yield data
+        return
+    # Only requests that could be hedged earn hedge budget.
+    hedge_policy.on_request()
+
+    started = time.monotonic()
+    primary = ollama.pick(model)
+    # First-frame task -> (frame generator, backend) for each request in flight.
+    streams = {}
+
+    def start(backend: OllamaBackend):
+        frames = _generate(prompt, model, options, response_format, context, backend=backend)
+        streams[asyncio.ensure_future(anext(frames))] = (frames, backend)
+
+    start(primary)
+    winner = None
+    try:
+        done, _ = await asyncio.wait(streams, timeout=hedge_policy.delay(model))
+        limiter = admission.limiter(model)
+        # A hedge must not queue behind the admission limit, or it only adds load.
+        if not done and limiter.active < limiter.max_concurrency and hedge_policy.try_hedge():
+            logger.debug("Hedging %s: no first token from %s after %.3fs", model, primary.url, time.monotonic() - started)
+            start(ollama.pick(model, exclude=(primary,)))
+        while winner is None:
+            done, _ = await asyncio.wait(streams, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                frames, backend = streams.pop(task)
+                error = task.exception()
+                if error is None or isinstance(error, StopAsyncIteration) or not streams:
+                    winner = (task, frames, backend)
+                    break
+                logger.warning(f"Hedged request to {backend.url} failed, waiting for the other one: {error}")
+    finally:
+        for task in streams:
+            task.cancel()
+        await asyncio.gather(*streams, return_exceptions=True)
+        for frames, _ in streams.values():
+            await frames.aclose()
+
+    task, frames, backend = winner
+    if isinstance(task.exception(), StopAsyncIteration):
+        return
+    first = task.result()
+    hedge_policy.observe(model, time.monotonic() - started)
+    if backend is not primary:
+        hedge_policy.metrics["hedge_wins"] += 1
+    yield first
+    async with aclosing(frames):
+        async for data in frames:
+            yield data
+
+
+async def call_ollama(
+        prompt: str,
+        model: str,
+        options: Optional[dict] = None,
+        context: Optional[List[int]] = None,
+        final: Optional[dict] = None,
+        hedge: bool = False,
+):
+    """
+    Yield the generated text chunks; errors are reported in-band as a message chunk.
+    When `final` is given it is filled with the closing `done` frame (eval stats and the KV `context`).
+    """
     received = False
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            logger.info(f"OLLAMA_BASE_URL: {OLLAMA_BASE_URL}.")
-            async with client.stream(
-                    "POST",
-                    f"{OLLAMA_BASE_URL}/api/generate",
-                    json={
-                        "stream": True,
-                        "model": model,
-                        "prompt": prompt,
-                    }
-            ) as response:
-                response.raise_for_status()
-                async for line in response.aiter_lines():
-                    if line.strip():
-                        if line.startswith("data:"):
-                            line = line.removeprefix("data:").strip()
-                        try:
-                            data = json.loads(line)
-                            content = data.get("response", "")
-                            if content:
-                                received = True
-                                yield content
-                        except json.JSONDecodeError:
-                            logger.warning(f"Non-JSON response chunk: {line.strip()}")
+        async for data in stream_ollama(prompt, model, options, context=context, hedge=hedge):
+            content = data.get("response", "")
+            if content:
+                received = True
+                yield content
+            if data.get("done") and final is not None:
+                final.update(data)
         if not received:
             yield "⚠️ No content received from model."
-    except httpx.TimeoutException:
+    except Overloaded:
+        # Surface admission rejections to the routers (429/503) and MCP clients (tool error).
+        raise
+    except (httpx.TimeoutException, TimeoutError):
         logger.warning("Timeout communicating with Ollama.")
         yield "⏱️ Timeout: The model took too long to respond."
     except httpx.HTTPStatusError as e:
@@ -50,3 +262,112 @@ async def call_ollama(prompt: str, model: str):
         logger.exception("Unexpected error calling Ollama")
         yield f"💥 Unexpected error: {str(e)}"
 
+
+async def call_ollama_embed(text: str, model: str) -> List[float]:
+    """
+    Embed `text` with Ollama's /api/embed endpoint and return the vector.
+    """
+    ollama = get_ollama_client()
+    client = await ollama.get_client()
+    body = {"model": model, "input": text, "keep_alive": OLLAMA_KEEP_ALIVE}
+    async with admission.slot(model):
+        backend = ollama.pick(model)
+        async with backend.track():
+            try:
+                response = await client.post(f"{backend.url}/api/embed", json=body)
+            except httpx.TransportError:
+                backend.mark_failure()
+                raise
+            response.raise_for_status()
+            backend.mark_success()
+            return response.json()["embeddings"][0]
+
+
+def label_schema(labels: List[str]) -> dict:
+    """
+    JSON schema constraining the model to answer `{"label": <one of labels>}`.
+    """
+    return {
+        "type": "object",
+        "properties": {"label": {"type": "string", "enum": labels}},
+        "required": ["label"],
+    }
+
+
+async def call_ollama_json(
+        prompt: str,
+        model: str,
+        schema: dict,
+        options: Optional[dict] = None,
+        hedge: bool = False,
+) -> Dict[str, Any]:
+    """
+    Generate a JSON object constrained by `schema` and return it as soon as it is complete.
+    The upstream stream is closed right away, so Ollama stops generating tokens nobody will read.
+    """
+    text = ""
+    async with aclosing(stream_ollama(prompt, model, options, schema, hedge=hedge)) as frames:
+        async for data in frames:
+            text += data.get("response", "")
+            if "}" in text:
+                try:
+                    return json.loads(text[text.index("{"):text.rindex("}") + 1])
+                except (ValueError, json.JSONDecodeError):
+                    pass
+            if data.get("done"):
+                break
+    raise ValueError(f"Model returned no valid JSON object: {text[:200]!r}")
+
+
+async def call_ollama_label(
+        prompt: str,
+        model: str,
+        labels: List[str],
+        options: Optional[dict] = None,
+        hedge: bool = False,
+) -> str:
+    """
+    Ask for exactly one of `labels` using enum-constrained JSON output. Returns "unknown" when the
+    answer cannot be mapped onto a label.
+    """
+    try:
+        result = await call_ollama_json(prompt, model, label_schema(labels), options, hedge=hedge)
+    except ValueError as e:
+        logger.warning(f"Unparseable label answer: {e}")
+        return "unknown"
+    label = str(result.get("label", "")).strip().lower()
+    for candidate in labels:
+        if candidate.lower() == label:
+            return candidate
+    return "unknown"
+
+
+async def collect_with_progress(chunks: AsyncIterator[str], ctx: Optional[Context] = None) -> str:
+    """
+    Join streamed chunks into the final answer. When called through MCP, periodically report the
+    token count as a progress notification and forward the new partial text as a log message.
+    """
+    parts = []
+    sent = 0
+    last_report = time.monotonic()
+    async for chunk in chunks:
+        parts.append(chunk)
+        if ctx is None:
+            continue
+        now = time.monotonic()
+        if len(parts) - sent >= PROGRESS_EVERY_TOKENS or now - last_report >= PROGRESS_INTERVAL:
+            await _report_partial(ctx, parts, sent)
+            sent = len(parts)
+            last_report = now
+    if ctx is not None and sent < len(parts):
+        await _report_partial(ctx, parts, sent)
+    return "".join(parts)
+
+
+async def _report_partial(ctx: Context, parts: list, sent: int):
+    try:
+        await ctx.report_progress(progress=len(parts))
+        await ctx.info("".join(parts[sent:]))
+    except Exception as e:
+        # Progress is best effort: never fail the tool call because a notification could not be sent.
+        logger.debug("Progress notification failed: %s", e)
@@ -0,0 +1,183 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from os import getenv
+from typing import Deque, Dict
+from fastmcp.exceptions import ToolError
+from utils.logger_config import configure_logger
+
+
+logger = configure_logger("Admission")
+
+MAX_CONCURRENCY = int(getenv("OLLAMA_MAX_CONCURRENCY", "4"))
+MAX_QUEUE = int(getenv("OLLAMA_MAX_QUEUE", "32"))
+MAX_QUEUE_TIME = float(getenv("OLLAMA_MAX_QUEUE_TIME", "30"))
+# Per-model concurrency overrides, e.g. "llama3.2:1b-instruct-q4_K_M=8,codellama:7b=2".
+MODEL_CONCURRENCY = getenv("OLLAMA_MODEL_CONCURRENCY", "")
+# Limiters kept for distinct model names; beyond this, idle ones are dropped least recently used first.
+MAX_TRACKED_MODELS = int(getenv("OLLAMA_MAX_TRACKED_MODELS", "64"))
+
+
+class Overloaded(ToolError):
+    """
+    Raised when a request cannot be admitted. `status_code` is 429 when the wait queue is full and
+    503 when the expected or actual queue time exceeds the budget.
+    """
+    def __init__(self, model: str, status_code: int, retry_after: int, reason: str):
+        super().__init__(f"Model '{model}' is overloaded ({reason}). Retry after {retry_after}s.")
+        self.model = model
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+def _parse_overrides(spec: str) -> Dict[str, int]:
+    overrides = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        model, _, limit = entry.rpartition("=")
+        if model and limit.isdigit():
+            overrides[model] = int(limit)
+    return overrides
+
+
+class ModelLimiter:
+    """
+    Concurrency limiter for one model with a bounded FIFO wait queue and queue-time load shedding.
+    Released slots are handed directly to the oldest waiter.
+    """
+    def __init__(self, model: str, max_concurrency: int, max_queue: int = MAX_QUEUE, max_queue_time: float = MAX_QUEUE_TIME):
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_queue_time = max_queue_time
+        self.active = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.avg_service_time = 0.0
+        self.metrics = {
+            "admitted": 0, "rejected_queue_full": 0, "shed_queue_time": 0,
+            "wait_time_total": 0.0, "wait_time_max": 0.0,
+        }
+
+    def expected_wait(self) -> float:
+        if self.active < self.max_concurrency:
+            return 0.0
+        return (len(self.waiters) + 1) / self.max_concurrency * self.avg_service_time
+
+    def _retry_after(self) -> int:
+        return max(1, math.ceil(self.expected_wait() or 1))
+
+    def check(self):
+        """
+        Fail fast, without queueing, when the request would certainly be rejected.
+        """
+        if self.active >= self.max_concurrency and len(self.waiters) >= self.max_queue:
+            self.metrics["rejected_queue_full"] += 1
+            raise Overloaded(self.model, 429, self._retry_after(), "queue full")
+        if self.expected_wait() > self.max_queue_time:
+            self.metrics["shed_queue_time"] += 1
+            raise Overloaded(self.model, 503, self._retry_after(), "expected queue time too long")
+
+    async def acquire(self):
+        self.check()
+        started = time.monotonic()
+        if self.active < self.max_concurrency and not self.waiters:
+            self.active += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self.waiters.append(future)
+            try:
+                await asyncio.wait_for(future, timeout=self.max_queue_time)
+            except asyncio.TimeoutError:
+                self._forget(future)
+                self.metrics["shed_queue_time"] += 1
+                raise Overloaded(self.model, 503, self._retry_after(), "queue time exceeded")
+            except asyncio.CancelledError:
+                self._forget(future)
+                if future.done() and not future.cancelled():
+                    # The slot was handed over just before the cancellation: pass it on.
+                    self.release()
+                raise
+        waited = time.monotonic() - started
+        self.metrics["admitted"] += 1
+        self.metrics["wait_time_total"] += waited
+        self.metrics["wait_time_max"] = max(self.metrics["wait_time_max"], waited)
+
+    def release(self):
+        while self.waiters:
+            future = self.waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def _forget(self, future: asyncio.Future):
+        try:
+            self.waiters.remove(future)
+        except ValueError:
+            pass
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            self.avg_service_time = elapsed if not self.avg_service_time else 0.8 * self.avg_service_time + 0.2 * elapsed
+            self.release()
+
+    def stats(self) -> dict:
+        admitted = self.metrics["admitted"]
+        return {
+            **self.metrics,
+            "active": self.active,
+            "queue_depth": len(self.waiters),
+            "max_concurrency": self.max_concurrency,
+            "avg_wait_time": round(self.metrics["wait_time_total"] / admitted, 4) if admitted else 0.0,
+            "avg_service_time": round(self.avg_service_time, 4),
+        }
+
+
+class AdmissionController:
+    """
+    One ModelLimiter per model name. Model names come from clients, so the set is bounded: past
+    `max_models`, limiters with nothing active or queued are evicted, least recently used first.
+    """
+    def __init__(self, default_concurrency: int = MAX_CONCURRENCY, overrides: str = MODEL_CONCURRENCY, max_models: int = MAX_TRACKED_MODELS):
+        self.default_concurrency = default_concurrency
+        self.overrides = _parse_overrides(overrides)
+        self.max_models = max_models
+        self._limiters: "OrderedDict[str, ModelLimiter]" = OrderedDict()
+
+    def limiter(self, model: str) -> ModelLimiter:
+        limiter = self._limiters.get(model)
+        if limiter is None:
+            limit = self.overrides.get(model, self.default_concurrency)
+            limiter = self._limiters[model] = ModelLimiter(model, limit)
+            self._evict_idle()
+        self._limiters.move_to_end(model)
+        return limiter
+
+    def _evict_idle(self):
+        # The newest limiter is about to be used: never evict it.
+        for model in list(self._limiters)[:-1]:
+            if len(self._limiters) <= self.max_models:
+                return
+            limiter = self._limiters[model]
+            if limiter.active == 0 and not limiter.waiters:
+                del self._limiters[model]
+
+    def check(self, model: str):
+        self.limiter(model).check()
+
+    def slot(self, model: str):
+        return self.limiter(model).slot()
+
+    def stats(self) -> dict:
+        return {model: limiter.stats() for model, limiter in self._limiters.items()}
+
+
+admission = AdmissionController()
@@ -0,0 +1,78 @@
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional, Set, Tuple
+from utils.logger_config import configure_logger
+
+
+logger = configure_logger("MicroBatcher")
+
+
+class MicroBatcher:
+    """
+    Collect items submitted by concurrent callers for up to `max_wait` seconds (or until `max_batch_size`
+    items are queued), process them with a single `handler` call and hand each caller its own result.
+    The handler must return one result per item, in order.
+    """
+    def __init__(
+            self,
+            handler: Callable[[List[Any]], Awaitable[List[Any]]],
+            max_batch_size: int = 16,
+            max_wait: float = 0.05,
+    ):
+        self.handler = handler
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.metrics = {"batches": 0, "items": 0}
+
+    async def submit(self, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending[:self.max_batch_size], self._pending[self.max_batch_size:]
+        if self._pending:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+        if not batch:
+            return
+        task = asyncio.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]):
+        self.metrics["batches"] += 1
+        self.metrics["items"] += len(batch)
+        try:
+            results = await self.handler([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"Batch handler returned {len(results)} results for {len(batch)} items")
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        except Exception as e:
+            logger.exception(f"Micro-batch of {len(batch)} items failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    @property
+    def idle(self) -> bool:
+        return not self._pending and not self._tasks
+
+    def stats(self) -> dict:
+        batches = self.metrics["batches"]
+        return {
+            **self.metrics,
+            "pending": len(self._pending),
+            "avg_batch_size": round(self.metrics["items"] / batches, 2) if batches else 0.0,
+        }
@@ -0,0 +1,199 @@
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import random
+import re
+import time
+from collections import OrderedDict
+from os import getenv
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from utils.logger_config import configure_logger
+
+
+logger = configure_logger("ResultCache")
+
+CACHE_ENABLED = getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+CACHE_MAX_ENTRIES = int(getenv("RESULT_CACHE_MAX_ENTRIES", "4096"))
+CACHE_TTL = float(getenv("RESULT_CACHE_TTL", "3600"))
+CACHE_REDIS_TTL = int(getenv("RESULT_CACHE_REDIS_TTL", "86400"))
+CACHE_KEY_PREFIX = getenv("RESULT_CACHE_PREFIX", "mcp:result")
+
+# Prefixes of the in-band error messages produced by call_ollama and the tools' fallbacks.
+ERROR_MARKERS = ("⚠️", "⏱️", "❌", "🚫", "💥", "An error occurred")
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class LRUTTLCache:
+    """
+    Bounded in-process LRU with a per-entry time-to-live.
+    """
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self._data[key] = (time.monotonic() + (ttl or self.ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def items(self) -> List[Tuple[str, Any]]:
+        """
+        Unexpired (key, value) pairs, least recently used first.
+        """
+        now = time.monotonic()
+        return [(key, value) for key, (expires_at, value) in self._data.items() if expires_at >= now]
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class ResultCache:
+    """
+    Two-tier result cache: a local LRU/TTL tier in front of an optional shared Redis tier.
+    Concurrent misses on the same key are coalesced so only one caller computes the value.
+    """
+    def __init__(self, local: Optional[LRUTTLCache] = None, redis_ttl: int = CACHE_REDIS_TTL):
+        self.local = local or LRUTTLCache()
+        self.redis_ttl = redis_ttl
+        self.redis = None
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.metrics = {"local_hits": 0, "redis_hits": 0, "misses": 0, "stores": 0, "errors": 0}
+
+    def attach_redis(self, redis_db):
+        """
+        Enable the shared tier using a connected `RedisDB` (see LifespanContext).
+        """
+        self.redis = redis_db
+
+    async def get(self, key: str) -> Optional[str]:
+        value = self.local.get(key)
+        if value is not None:
+            self.metrics["local_hits"] += 1
+            return value
+        if self.redis is not None:
+            try:
+                rows = await self.redis.read({"key": key})
+                value = rows[0]["value"] if rows else None
+            except Exception as e:
+                self.metrics["errors"] += 1
+                logger.warning(f"Redis cache read failed for {key}: {e}")
+                value = None
+            if value is not None:
+                self.metrics["redis_hits"] += 1
+                self.local.set(key, value)
+                return value
+        return None
+
+    async def set(self, key: str, value: str):
+        self.local.set(key, value)
+        self.metrics["stores"] += 1
+        if self.redis is not None:
+            try:
+                # Jitter the shared TTL so entries written together do not all expire together.
+                ttl = int(self.redis_ttl * random.uniform(0.9, 1.1))
+                await self.redis.write({"key": key, "value": value}, ttl=ttl)
+            except Exception as e:
+                self.metrics["errors"] += 1
+                logger.warning(f"Redis cache write failed for {key}: {e}")
+
+    async def get_or_compute(
+            self,
+            key: str,
+            compute: Callable[[], Awaitable[str]],
+            cacheable: Callable[[Any], bool] = lambda value: True,
+    ) -> str:
+        value = await self.get(key)
+        if value is not None:
+            return value
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        try:
+            async with lock:
+                value = await self.get(key)
+                if value is not None:
+                    return value
+                self.metrics["misses"] += 1
+                value = await compute()
+                if cacheable(value):
+                    await self.set(key, value)
+                return value
+        finally:
+            if not lock.locked() and self._locks.get(key) is lock:
+                del self._locks[key]
+
+    def stats(self) -> dict:
+        hits = self.metrics["local_hits"] + self.metrics["redis_hits"]
+        total = hits + self.metrics["misses"]
+        return {
+            **self.metrics,
+            "local_entries": len(self.local),
+            "redis_enabled": self.redis is not None,
+            "hit_ratio": round(hits / total, 4) if total else 0.0,
+        }
+
+
+result_cache = ResultCache()
+
+
+def normalize_value(value: Any) -> Any:
+    if isinstance(value, str):
+        return _WHITESPACE.sub(" ", value).strip()
+    return value
+
+
+def make_cache_key(tool: str, model: Optional[str], inputs: Dict[str, Any], options: Optional[dict] = None) -> str:
+    payload = json.dumps(
+        {"inputs": {k: normalize_value(v) for k, v in inputs.items()}, "options": options or {}},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    digest = hashlib.sha256(payload.encode()).hexdigest()
+    return f"{CACHE_KEY_PREFIX}:{tool}:{model}:{digest}"
+
+
+def is_cacheable_result(value: Any) -> bool:
+    return isinstance(value, str) and bool(value.strip()) and not value.startswith(ERROR_MARKERS)
+
+
+def cached_tool(tool: str, options: Optional[dict] = None, cache: Optional[ResultCache] = None):
+    """
+    Opt a deterministic tool into the result cache. The key covers the tool name, the model,
+    the normalized inputs and the generation options; the FastMCP `ctx` argument is ignored.
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            store = cache or result_cache
+            if not CACHE_ENABLED:
+                return await fn(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            inputs = {k: v for k, v in bound.arguments.items() if k not in ("ctx", "model")}
+            key = make_cache_key(tool, bound.arguments.get("model"), inputs, options)
+            return await store.get_or_compute(key, lambda: fn(*args, **kwargs), is_cacheable_result)
+        return wrapper
+    return decorator
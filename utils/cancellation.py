@@ -0,0 +1,38 @@
+import asyncio
+from contextlib import aclosing
+from os import getenv
+from typing import Any, AsyncIterator, Optional
+
+
+# Upper bound on a single LLM call, from submission to the last token.
+LLM_REQUEST_DEADLINE = float(getenv("LLM_REQUEST_DEADLINE", "120"))
+
+cancellation_metrics = {
+    "cancelled": 0,
+    "rest_disconnects": 0,
+    "stream_disconnects": 0,
+    "deadline_exceeded": 0,
+}
+
+
+async def with_deadline(frames: AsyncIterator[Any], timeout: Optional[float] = LLM_REQUEST_DEADLINE) -> AsyncIterator[Any]:
+    """
+    Re-yield `frames` until `timeout` seconds have passed, then raise TimeoutError.
+    Only the awaits on the source are timed, so the deadline is enforced in the caller's task.
+    """
+    if not timeout:
+        async for item in frames:
+            yield item
+        return
+    deadline = asyncio.get_running_loop().time() + timeout
+    async with aclosing(frames):
+        while True:
+            try:
+                async with asyncio.timeout_at(deadline):
+                    item = await anext(frames)
+            except StopAsyncIteration:
+                return
+            except TimeoutError:
+                cancellation_metrics["deadline_exceeded"] += 1
+                raise
+            yield item
@@ -0,0 +1,79 @@
+import math
+from collections import deque
+from os import getenv
+from typing import Deque, Dict
+
+
+# Hedging is opt-in and only used by short tools (classify, sentiment, docstring).
+HEDGE_ENABLED = getenv("OLLAMA_HEDGE", "false").lower() == "true"
+# Fire the hedge once the first token is later than this percentile of recent first-token times.
+HEDGE_PERCENTILE = float(getenv("OLLAMA_HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_DELAY = float(getenv("OLLAMA_HEDGE_MIN_DELAY", "0.05"))
+# Used until HEDGE_MIN_SAMPLES first-token times have been observed for a model.
+HEDGE_DEFAULT_DELAY = float(getenv("OLLAMA_HEDGE_DEFAULT_DELAY", "1.0"))
+HEDGE_MIN_SAMPLES = int(getenv("OLLAMA_HEDGE_MIN_SAMPLES", "20"))
+HEDGE_WINDOW = int(getenv("OLLAMA_HEDGE_WINDOW", "256"))
+# Global budget: at most this many hedges per hedgeable request, with a small burst allowance.
+HEDGE_BUDGET = float(getenv("OLLAMA_HEDGE_BUDGET", "0.1"))
+HEDGE_BURST = float(getenv("OLLAMA_HEDGE_BURST", "5"))
+
+
+class HedgePolicy:
+    """
+    Decides when a second request may be sent: after a per-model percentile delay and only while the
+    global hedge budget (a token bucket refilled by each hedgeable request) allows it.
+    """
+    def __init__(
+            self,
+            percentile: float = HEDGE_PERCENTILE,
+            min_delay: float = HEDGE_MIN_DELAY,
+            default_delay: float = HEDGE_DEFAULT_DELAY,
+            min_samples: int = HEDGE_MIN_SAMPLES,
+            window: int = HEDGE_WINDOW,
+            budget: float = HEDGE_BUDGET,
+            burst: float = HEDGE_BURST,
+    ):
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.default_delay = default_delay
+        self.min_samples = min_samples
+        self.window = window
+        self.budget = budget
+        self.burst = burst
+        self._tokens = burst
+        self._samples: Dict[str, Deque[float]] = {}
+        self.metrics = {"requests": 0, "hedged": 0, "hedge_wins": 0, "budget_denied": 0}
+
+    def delay(self, model: str) -> float:
+        samples = self._samples.get(model)
+        if not samples or len(samples) < self.min_samples:
+            return self.default_delay
+        ordered = sorted(samples)
+        rank = min(len(ordered) - 1, math.ceil(self.percentile / 100 * len(ordered)) - 1)
+        return max(self.min_delay, ordered[rank])
+
+    def observe(self, model: str, first_token_time: float):
+        self._samples.setdefault(model, deque(maxlen=self.window)).append(first_token_time)
+
+    def on_request(self):
+        self.metrics["requests"] += 1
+        self._tokens = min(self.burst, self._tokens + self.budget)
+
+    def try_hedge(self) -> bool:
+        if self._tokens < 1:
+            self.metrics["budget_denied"] += 1
+            return False
+        self._tokens -= 1
+        self.metrics["hedged"] += 1
+        return True
+
+    def stats(self) -> dict:
+        return {
+            **self.metrics,
+            "enabled": HEDGE_ENABLED,
+            "budget_tokens": round(self._tokens, 2),
+            "delay": {model: round(self.delay(model), 4) for model in self._samples},
+        }
+
+
+hedge_policy = HedgePolicy()
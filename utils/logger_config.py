@@ -1,38 +1,276 @@
+import atexit
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import random
 import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
 
 
-def configure_logger(name: str = "MainAgent", log_file: str = "server.log"):
-    logger = logging.getLogger(name)
+# "queue" (default) hands records to a background thread that formats and writes them; "sync" writes on
+# the logging thread, as before.
+LOG_MODE = os.getenv("LOG_MODE", "queue").lower()
+# "text" or "json" (one object per line, with request_id and any `extra=` fields).
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 2**20)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# DEBUG/INFO records from one call site beyond LOG_SAMPLE_BURST per LOG_SAMPLE_WINDOW seconds are kept
+# with probability LOG_SAMPLE_RATE. Warnings and errors are never sampled.
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+LOG_SAMPLE_BURST = int(os.getenv("LOG_SAMPLE_BURST", "20"))
+LOG_SAMPLE_WINDOW = float(os.getenv("LOG_SAMPLE_WINDOW", "1.0"))
+REQUEST_ID_HEADER = "x-request-id"
 
-    if logger.handlers:  # Prevent duplicate setup
-        return logger
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else on a record came from `extra=` and goes into JSON output.
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id", "sampled_out"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per record: ts, level, logger, message, request_id, plus `extra=` fields and exc_info.
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        if getattr(record, "sampled_out", 0):
+            entry["sampled_out"] = record.sampled_out
+        entry.update({key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS})
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        if record.stack_info:
+            entry["stack_info"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class RequestIdFilter(logging.Filter):
+    """
+    Stamps records with the current request id. Runs on the logging thread, where the contextvar is set.
+    """
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps the first `burst` DEBUG/INFO records per call site and window, then a `rate` share of the rest.
+    The next kept record of a call site carries how many were dropped before it as `sampled_out`.
+    """
+    def __init__(self, rate: float = LOG_SAMPLE_RATE, burst: int = LOG_SAMPLE_BURST, window: float = LOG_SAMPLE_WINDOW):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.window = window
+        self._sites: Dict[tuple, list] = {}  # (pathname, lineno) -> [window start, count, dropped]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate >= 1.0 or record.levelno >= logging.WARNING:
+            return True
+        now = time.monotonic()
+        site = self._sites.get((record.pathname, record.lineno))
+        if site is None or now - site[0] >= self.window:
+            site = self._sites[(record.pathname, record.lineno)] = [now, 0, site[2] if site else 0]
+        site[1] += 1
+        if site[1] > self.burst and random.random() >= self.rate:
+            site[2] += 1
+            return False
+        record.sampled_out, site[2] = site[2], 0
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueues records untouched: message interpolation and formatting happen on the listener thread. Records
+    are dropped, never waited on, when the queue is full.
+    """
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
 
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_request_id_filter = RequestIdFilter()
+_sampling_filter = SamplingFilter()
+_handlers: Dict[str, List[logging.Handler]] = {}
+_listeners: List[logging.handlers.QueueListener] = []
+_lock = threading.Lock()
+
+
+def _log_level() -> str:
     # Allow DEBUG in dev and INFO in prod via env var
-    log_level = os.getenv("LOG_LEVEL", "DEBUG" if os.getenv("ENV") != "production" else "INFO").upper()
-    logger.setLevel(log_level)
+    return os.getenv("LOG_LEVEL", "DEBUG" if os.getenv("ENV") != "production" else "INFO").upper()
+
 
-    formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S"
-    )
+def _sinks(log_file_path: str, log_level: str) -> List[logging.Handler]:
+    if LOG_FORMAT == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
 
     # Console handler
     ch = logging.StreamHandler(sys.stdout)
     ch.setLevel(log_level)
     ch.setFormatter(formatter)
-    logger.addHandler(ch)
+
+    # File handler, rotated at LOG_MAX_BYTES (0 disables rotation)
+    fh = logging.handlers.RotatingFileHandler(log_file_path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT)
+    fh.setLevel("INFO")
+    fh.setFormatter(formatter)
+    return [ch, fh]
+
+
+def _shared_handlers(log_file_path: str, log_level: str) -> List[logging.Handler]:
+    """
+    One set of handlers per log file, shared by every logger writing to it.
+    """
+    with _lock:
+        if log_file_path not in _handlers:
+            sinks = _sinks(log_file_path, log_level)
+            if LOG_MODE == "queue":
+                log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+                listener = logging.handlers.QueueListener(log_queue, *sinks, respect_handler_level=True)
+                listener.start()
+                _listeners.append(listener)
+                _handlers[log_file_path] = [NonBlockingQueueHandler(log_queue)]
+            else:
+                _handlers[log_file_path] = sinks
+        return _handlers[log_file_path]
+
+
+def configure_logger(name: str = "MainAgent", log_file: str = "server.log"):
+    logger = logging.getLogger(name)
+
+    if logger.handlers:  # Prevent duplicate setup
+        return logger
+
+    log_level = _log_level()
+    logger.setLevel(log_level)
 
     # Save log file in same directory as this module
     current_dir = os.path.dirname(os.path.abspath(__file__))
     log_file_path = os.path.join(current_dir, log_file)
 
-    # File handler
-    fh = logging.FileHandler(log_file_path)
-    fh.setLevel("INFO")
-    fh.setFormatter(formatter)
-    logger.addHandler(fh)
+    for handler in _shared_handlers(log_file_path, log_level):
+        logger.addHandler(handler)
+    # Logger filters run before handlers and propagation, on the logging thread.
+    logger.addFilter(_request_id_filter)
+    logger.addFilter(_sampling_filter)
 
     logger.debug("Logger initialized with level %s", log_level)
     return logger
+
+
+def flush_logging():
+    """
+    Write out every queued record: stops the listener threads (draining their queues) and restarts them.
+    """
+    with _lock:
+        for listener in _listeners:
+            listener.stop()
+            listener.start()
+
+
+def shutdown_logging():
+    with _lock:
+        for listener in _listeners:
+            if listener._thread is not None:
+                listener.stop()
+        dropped = sum(getattr(handler, "dropped", 0) for handlers in _handlers.values() for handler in handlers)
+    if dropped:
+        print(f"logging: {dropped} records dropped on a full queue (LOG_QUEUE_SIZE={LOG_QUEUE_SIZE})", file=sys.stderr)
+
+
+def _restart_listeners_after_fork():
+    # Threads do not survive fork(); prefork servers would otherwise queue records nobody writes.
+    for listener in _listeners:
+        listener._thread = None
+        listener.start()
+
+
+atexit.register(shutdown_logging)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_listeners_after_fork)
+
+
+@contextmanager
+def bind_request_id(request_id: Optional[str]):
+    token = request_id_var.set(request_id)
+    try:
+        yield request_id
+    finally:
+        request_id_var.reset(token)
+
+
+@contextmanager
+def mcp_request_id():
+    """
+    Bind the request id of the HTTP request carrying the current MCP message, if any. MCP handlers run in the
+    session's task, outside the request's context, so RequestIdMiddleware passes the id via the ASGI scope.
+    """
+    from mcp.server.lowlevel.server import request_ctx
+
+    try:
+        scope = getattr(request_ctx.get().request, "scope", None) or {}
+    except LookupError:
+        scope = {}
+    request_id = scope.get("request_id")
+    if request_id is None or request_id_var.get() == request_id:
+        yield request_id_var.get()
+        return
+    with bind_request_id(request_id):
+        yield request_id
+
+
+def _valid_request_id(value: str) -> bool:
+    return 0 < len(value) <= 128 and all(c.isalnum() or c in "-_.:" for c in value)
+
+
+class RequestIdMiddleware:
+    """
+    ASGI middleware binding a request id for the duration of each HTTP request: the caller's `X-Request-ID`
+    when it is well-formed, a fresh one otherwise. The id is echoed in the response and passed to MCP handlers
+    via the ASGI scope.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        incoming = next((value.decode("latin-1") for key, value in scope["headers"] if key == REQUEST_ID_HEADER.encode()), "")
+        request_id = incoming if _valid_request_id(incoming) else uuid.uuid4().hex
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (REQUEST_ID_HEADER.encode(), request_id.encode())]
+            await send(message)
+
+        with bind_request_id(request_id):
+            await self.app({**scope, "request_id": request_id}, receive, send_with_id)
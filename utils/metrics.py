@@ -0,0 +1,181 @@
+import functools
+import inspect
+import time
+import weakref
+from os import getenv
+from typing import Callable, Dict, Iterable, Optional
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY
+from prometheus_client.core import GaugeMetricFamily
+from clients.warmup import configured_models
+from utils.admission import Overloaded, admission
+from utils.cache import is_cacheable_result
+from utils.logger_config import mcp_request_id
+from utils.profiling import mcp_profile
+from utils.tracing import mcp_parent, tracer
+
+
+# Generation-sized buckets: sub-second cache hits up to multi-minute long answers.
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+TOKENS_PER_SECOND_BUCKETS = (1, 2.5, 5, 10, 20, 30, 50, 75, 100, 150, 200, 400)
+DATA_SOURCE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Models reported by name in labels: the configured and preloaded ones, those with an admission override
+# and METRICS_MODELS (comma-separated). Any other name a client sends is reported as "other".
+METRICS_MODELS = getenv("METRICS_MODELS", "")
+KNOWN_MODELS = frozenset(
+    [*configured_models(), *admission.overrides, *(m.strip() for m in METRICS_MODELS.split(",") if m.strip())]
+)
+
+TOOL_REQUESTS = Counter("mcp_tool_requests_total", "Tool calls by outcome.", ["tool", "model", "status"])
+TOOL_LATENCY = Histogram("mcp_tool_latency_seconds", "End-to-end tool latency.", ["tool", "model"], buckets=LATENCY_BUCKETS)
+TOOL_IN_FLIGHT = Gauge("mcp_tool_in_flight", "Tool calls currently running.", ["tool"])
+
+LLM_QUEUE_TIME = Histogram("ollama_queue_seconds", "Time waiting for an admission slot.", ["model"], buckets=LATENCY_BUCKETS)
+LLM_TTFT = Histogram("ollama_time_to_first_token_seconds", "Time from request to first token.", ["model"], buckets=LATENCY_BUCKETS)
+LLM_LATENCY = Histogram("ollama_generation_seconds", "Time from request to the final frame.", ["model"], buckets=LATENCY_BUCKETS)
+LLM_TOKENS_PER_SECOND = Histogram(
+    "ollama_tokens_per_second", "Decode speed reported by Ollama (eval_count / eval_duration).", ["model"],
+    buckets=TOKENS_PER_SECOND_BUCKETS,
+)
+LLM_TOKENS = Counter("ollama_tokens_total", "Prompt and completion tokens reported by Ollama.", ["model", "kind"])
+LLM_REQUESTS = Counter("ollama_requests_total", "Upstream generations by outcome.", ["model", "status"])
+LLM_IN_FLIGHT = Gauge("ollama_in_flight", "Upstream generations currently streaming.", ["model"])
+
+DATA_SOURCE_LATENCY = Histogram(
+    "data_source_operation_seconds", "Latency of data source operations, retries included.", ["source", "operation"],
+    buckets=DATA_SOURCE_BUCKETS,
+)
+DATA_SOURCE_ERRORS = Counter("data_source_errors_total", "Failed data source operations.", ["source", "operation"])
+
+
+class GaugeCallbacks:
+    """
+    Gauges computed at scrape time (pool sizes, queue depths), so the hot path pays nothing for them.
+    Each callback returns {label values: number}; several callbacks may feed the same gauge.
+    Bound methods are held weakly, so registering an instance does not keep it alive.
+    """
+    def __init__(self):
+        self._gauges: Dict[str, tuple] = {}
+
+    def register(self, name: str, documentation: str, labels: Iterable[str], callback: Callable[[], Dict[tuple, float]]):
+        ref = weakref.WeakMethod(callback) if inspect.ismethod(callback) else (lambda: callback)
+        self._gauges.setdefault(name, (documentation, list(labels), []))[2].append(ref)
+
+    def collect(self):
+        for name, (documentation, labels, refs) in list(self._gauges.items()):
+            family = GaugeMetricFamily(name, documentation, labels=labels)
+            for ref in list(refs):
+                callback = ref()
+                if callback is None:
+                    refs.remove(ref)
+                    continue
+                try:
+                    for label_values, value in callback().items():
+                        family.add_metric(list(label_values), value)
+                except Exception:
+                    continue
+            yield family
+
+
+gauge_callbacks = GaugeCallbacks()
+REGISTRY.register(gauge_callbacks)
+
+
+def model_label(model: Optional[str]) -> str:
+    """
+    The `model` label value of a model name, keeping label cardinality bounded.
+    """
+    if not model:
+        return "none"
+    return model if model in KNOWN_MODELS else "other"
+
+
+def measured_tool(tool: str):
+    """
+    Count, time and track in-flight calls of a tool, inside a `tool <name>` span (and, for MCP calls, the
+    request's profile and request id). Results carrying an in-band error message are counted as errors;
+    admission rejections as `overloaded`.
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+        in_flight = TOOL_IN_FLIGHT.labels(tool)
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            model = bound.arguments.get("model") or "none"
+            label = model_label(model)
+            status = "error"
+            started = time.perf_counter()
+            in_flight.inc()
+            parent = mcp_parent() if tracer.enabled else None
+            try:
+                with mcp_profile(), mcp_request_id(), tracer.span(f"tool {tool}", parent=parent, tool=tool, model=model) as span:
+                    result = await fn(*args, **kwargs)
+                    if not isinstance(result, str) or is_cacheable_result(result):
+                        status = "ok"
+                    else:
+                        span.record_exception(RuntimeError(result))
+                    return result
+            except Overloaded:
+                status = "overloaded"
+                raise
+            finally:
+                in_flight.dec()
+                TOOL_REQUESTS.labels(tool, label, status).inc()
+                TOOL_LATENCY.labels(tool, label).observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def instrument_operations(cls, operations: Iterable[str]):
+    """
+    Time and trace the given async methods of a data source class (latency histogram, error counter and
+    a `<Class>.<operation>` span). Called from the BaseDB/BaseStorage/BaseFetcher subclass hooks.
+    """
+    for operation in operations:
+        method = cls.__dict__.get(operation)
+        if method is None or not inspect.iscoroutinefunction(method) or getattr(method, "__instrumented__", False):
+            continue
+        setattr(cls, operation, _timed(method, cls.__name__, operation))
+
+
+def _timed(method, source: str, operation: str):
+    latency = DATA_SOURCE_LATENCY.labels(source, operation)
+    errors = DATA_SOURCE_ERRORS.labels(source, operation)
+    span_name = f"{source}.{operation}"
+
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            with tracer.span(span_name, **{"data_source": source, "operation": operation}):
+                return await method(*args, **kwargs)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            latency.observe(time.perf_counter() - started)
+    wrapper.__instrumented__ = True
+    return wrapper
+
+
+def observe_generation(model: str, started: float, first_token: Optional[float], final: Optional[dict], status: str):
+    """
+    Record one upstream generation from its timestamps and Ollama's final eval stats.
+    """
+    model = model_label(model)
+    LLM_REQUESTS.labels(model, status).inc()
+    if first_token is not None:
+        LLM_TTFT.labels(model).observe(first_token - started)
+    if final is None:
+        return
+    LLM_LATENCY.labels(model).observe(time.perf_counter() - started)
+    eval_count, eval_duration = final.get("eval_count"), final.get("eval_duration")
+    if eval_count:
+        LLM_TOKENS.labels(model, "completion").inc(eval_count)
+        if eval_duration:
+            LLM_TOKENS_PER_SECOND.labels(model).observe(eval_count / (eval_duration / 1e9))
+    if final.get("prompt_eval_count"):
+        LLM_TOKENS.labels(model, "prompt").inc(final["prompt_eval_count"])
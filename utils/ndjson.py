@@ -0,0 +1,85 @@
+import json
+from os import getenv
+from typing import Any, Dict, List
+from utils.logger_config import configure_logger
+
+try:
+    import orjson
+except ImportError:  # Optional speed-up: pip install "mcp-server[fast]"
+    orjson = None
+
+
+logger = configure_logger("NDJSON")
+
+# Longest line kept while waiting for its newline; final frames carry the KV context, so leave headroom.
+NDJSON_MAX_LINE_BYTES = int(getenv("NDJSON_MAX_LINE_BYTES", str(16 * 2**20)))
+
+# Eval stats Ollama attaches to the final `done` frame.
+STATS_FIELDS = (
+    "total_duration", "load_duration", "prompt_eval_count", "prompt_eval_duration",
+    "eval_count", "eval_duration", "done_reason",
+)
+
+if orjson is not None:
+    loads = orjson.loads
+else:
+    _decode = json.JSONDecoder().decode
+
+    def loads(line: bytes) -> Any:
+        # json.loads(bytes) sniffs the encoding on every call; Ollama always sends UTF-8.
+        return _decode(line.decode())
+
+
+class FrameTooLarge(ValueError):
+    pass
+
+
+class NDJSONDecoder:
+    """
+    Incremental newline-delimited JSON decoder working on raw bytes: network chunks are split on
+    b"\\n" and each complete line is parsed as is (by orjson when installed), with no text decoding
+    of the whole stream. A line cut across chunks is kept until the rest arrives, up to `max_line`
+    bytes: past that the stream is not NDJSON (or not Ollama's) and FrameTooLarge is raised.
+    """
+    def __init__(self, max_line: int = NDJSON_MAX_LINE_BYTES):
+        self.max_line = max_line
+        self._tail = b""
+        self.frames = 0
+        self.errors = 0
+
+    def feed(self, data: bytes) -> List[Any]:
+        if self._tail:
+            data = self._tail + data
+        lines = data.split(b"\n")
+        self._tail = lines.pop()
+        if len(self._tail) > self.max_line:
+            size, self._tail = len(self._tail), b""
+            raise FrameTooLarge(f"NDJSON line exceeds {self.max_line} bytes without a newline ({size} bytes buffered)")
+        return self._parse(lines)
+
+    def flush(self) -> List[Any]:
+        """
+        Parse whatever is left once the stream has ended (a last line without a newline).
+        """
+        tail, self._tail = self._tail, b""
+        return self._parse([tail])
+
+    def _parse(self, lines: List[bytes]) -> List[Any]:
+        frames = []
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                frames.append(loads(line))
+            except ValueError:
+                self.errors += 1
+                logger.warning(f"Non-JSON response chunk: {line[:200]!r}")
+        self.frames += len(frames)
+        return frames
+
+
+def frame_stats(frame: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The eval stats of a final `done` frame (eval_count, eval_duration, prompt_eval_count, ...).
+    """
+    return {k: frame[k] for k in STATS_FIELDS if k in frame}
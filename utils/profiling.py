@@ -0,0 +1,312 @@
+import asyncio
+import functools
+import hmac
+import json
+import logging
+import random
+import sys
+import threading
+import time
+import uuid
+import weakref
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from os import getenv, makedirs, path
+from typing import Dict, List, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+# Requests carrying `X-Profile: <PROFILE_TOKEN>` are profiled; so is a random PROFILE_SAMPLE_RATE share of all requests.
+PROFILE_TOKEN = getenv("PROFILE_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL = float(getenv("PROFILE_INTERVAL", "0.005"))
+PROFILE_MAX_DEPTH = int(getenv("PROFILE_MAX_DEPTH", "64"))
+PROFILE_DIR = getenv("PROFILE_DIR", path.join(getenv("LOCAL_BASE_PATH", "/data"), "profiles"))
+PROFILE_HEADER = "x-profile"
+
+# Inclusive time buckets: a sample counts towards a category when any frame label of its stack starts with
+# one of the prefixes. Labels are "<path relative to sys.path>:<qualname>".
+CATEGORIES: Dict[str, Tuple[str, ...]] = {
+    "call_ollama": ("tools/utils.py", "clients/ollama.py", "httpx/", "httpcore/", "h2/"),
+    "json_decoding": ("utils/ndjson.py", "json/"),
+    "pydantic_validation": ("pydantic/", "pydantic_core/", "fastapi/routing.py:serialize_response"),
+    "data_sources": ("data_sources/",),
+}
+
+_active_profile: ContextVar[Optional["RequestProfile"]] = ContextVar("active_profile", default=None)
+
+
+@functools.lru_cache(maxsize=4096)
+def _module_path(filename: str) -> str:
+    for base in sorted((path.abspath(p or ".") for p in sys.path), key=len, reverse=True):
+        if filename.startswith(base + path.sep):
+            return filename[len(base) + 1:].replace(path.sep, "/")
+    return filename
+
+
+def _frame_label(code) -> str:
+    return f"{_module_path(code.co_filename)}:{code.co_qualname}"
+
+
+class RequestProfile:
+    """
+    Stack samples of one request. A sample is attributed to the request when the task running on the event
+    loop carries this profile in its context (child tasks inherit it); otherwise it counts as idle (the loop
+    was waiting on I/O) or as other work sharing the loop.
+    """
+    def __init__(self, name: str, reason: str):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.reason = reason
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.elapsed: Optional[float] = None
+        self.stacks: Counter = Counter()
+        self.idle = 0
+        self.other = 0
+        self.tasks = weakref.WeakSet()
+
+    def owns(self, task: Optional[asyncio.Task]) -> bool:
+        if task is None:
+            return False
+        get_context = getattr(task, "get_context", None)
+        if get_context is not None:
+            return get_context().get(_active_profile) is self
+        # Python < 3.12 cannot read a task's context from outside; _track_child_tasks registers them instead.
+        return task in self.tasks
+
+    def to_dict(self, top: int = 30) -> dict:
+        samples = sum(self.stacks.values())
+        self_counts, total_counts = Counter(), Counter()
+        categories = Counter()
+        for stack, count in self.stacks.items():
+            self_counts[stack[-1]] += count
+            for label in set(stack):
+                total_counts[label] += count
+            for category, patterns in CATEGORIES.items():
+                if any(label.startswith(patterns) for label in stack):
+                    categories[category] += count
+        interval_ms = PROFILE_INTERVAL * 1000
+        return {
+            "id": self.id,
+            "request": self.name,
+            "reason": self.reason,
+            "started_at": self.started_at,
+            "wall_ms": round((self.elapsed or 0) * 1000, 2),
+            "interval_ms": interval_ms,
+            "samples": samples,
+            "idle_samples": self.idle,
+            "other_samples": self.other,
+            "categories": {
+                category: {"samples": count, "ms": round(count * interval_ms, 1), "share": round(count / samples, 3)}
+                for category, count in categories.most_common()
+            } if samples else {},
+            "top_self": [{"frame": label, "samples": count} for label, count in self_counts.most_common(top)],
+            "top_total": [{"frame": label, "samples": count} for label, count in total_counts.most_common(top)],
+            # Brendan Gregg's folded format: flamegraph.pl, speedscope and inferno read it directly.
+            "folded": "\n".join(f"{';'.join(stack)} {count}" for stack, count in self.stacks.most_common()),
+        }
+
+
+def _track_child_tasks(loop: asyncio.AbstractEventLoop):
+    """
+    Python < 3.12 only: wrap the loop's task factory so tasks created under an active profile join its task set.
+    """
+    previous = loop.get_task_factory()
+    if getattr(previous, "__profiling__", False):
+        return
+
+    def factory(loop, coro, **kwargs):
+        task = previous(loop, coro, **kwargs) if previous else asyncio.Task(coro, loop=loop, **kwargs)
+        context = kwargs.get("context")
+        profile = context.get(_active_profile) if context is not None else _active_profile.get()
+        if profile is not None:
+            profile.tasks.add(task)
+        return task
+
+    factory.__profiling__ = True
+    loop.set_task_factory(factory)
+
+
+class StackSampler:
+    """
+    One background thread that samples the event-loop thread's stack every PROFILE_INTERVAL while at least
+    one profile is active, and hands each sample to the profiles owning the running task.
+    """
+    def __init__(self, interval: float = PROFILE_INTERVAL, max_depth: int = PROFILE_MAX_DEPTH):
+        self.interval = interval
+        self.max_depth = max_depth
+        self._profiles: Dict[str, Tuple[RequestProfile, asyncio.AbstractEventLoop, int]] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, profile: RequestProfile):
+        loop = asyncio.get_running_loop()
+        if not hasattr(asyncio.Task, "get_context"):
+            _track_child_tasks(loop)
+        with self._lock:
+            self._profiles[profile.id] = (profile, loop, threading.get_ident())
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+
+    def stop(self, profile: RequestProfile):
+        with self._lock:
+            self._profiles.pop(profile.id, None)
+        profile.elapsed = time.perf_counter() - profile.started
+
+    def _run(self):
+        current_tasks = getattr(asyncio.tasks, "_current_tasks", {})
+        while True:
+            with self._lock:
+                active = list(self._profiles.values())
+                if not active:
+                    self._thread = None
+                    return
+            frames = sys._current_frames()
+            for profile, loop, thread_id in active:
+                frame = frames.get(thread_id)
+                task = current_tasks.get(loop)
+                if task is None:
+                    profile.idle += 1
+                elif not profile.owns(task) or frame is None:
+                    profile.other += 1
+                else:
+                    profile.stacks[self._stack(frame)] += 1
+            time.sleep(self.interval)
+
+    def _stack(self, frame) -> Tuple[str, ...]:
+        labels: List[str] = []
+        while frame is not None and len(labels) < self.max_depth:
+            labels.append(_frame_label(frame.f_code))
+            frame = frame.f_back
+        return tuple(reversed(labels))
+
+
+sampler = StackSampler()
+
+
+def should_profile(header: Optional[str]) -> Optional[str]:
+    """
+    Why a request should be profiled ("header" or "sampled"), or None.
+    """
+    if header and PROFILE_TOKEN and hmac.compare_digest(header, PROFILE_TOKEN):
+        return "header"
+    if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE:
+        return "sampled"
+    return None
+
+
+@contextmanager
+def activate(profile: RequestProfile):
+    """
+    Attribute the current task, and tasks it spawns, to `profile`.
+    """
+    task = asyncio.current_task()
+    token = _active_profile.set(profile)
+    if task is not None:
+        profile.tasks.add(task)
+    try:
+        yield profile
+    finally:
+        _active_profile.reset(token)
+        if task is not None:
+            profile.tasks.discard(task)
+
+
+@contextmanager
+def mcp_profile():
+    """
+    Activate the profile of the HTTP request carrying the current MCP message, if any. MCP handlers run in the
+    session's task, outside the request's context, so ProfilingMiddleware passes the profile via the ASGI scope.
+    """
+    profile = None
+    if PROFILE_TOKEN or PROFILE_SAMPLE_RATE:
+        from mcp.server.lowlevel.server import request_ctx
+
+        try:
+            scope = getattr(request_ctx.get().request, "scope", None) or {}
+            profile = scope.get("profile")
+        except LookupError:
+            pass
+    if profile is None or _active_profile.get() is profile:
+        yield None
+        return
+    with activate(profile):
+        yield profile
+
+
+class ProfileStore:
+    """
+    Saves finished profiles as <id>.json through LocalStorage under PROFILE_DIR.
+    """
+    def __init__(self, directory: str = PROFILE_DIR):
+        self.directory = directory
+        self._storage = None
+
+    def _get_storage(self):
+        if self._storage is None:
+            from data_sources.filesystem import LocalStorage
+
+            makedirs(self.directory, exist_ok=True)
+            self._storage = LocalStorage(base_path=self.directory)
+        return self._storage
+
+    @staticmethod
+    def _filename(profile_id: str) -> str:
+        if len(profile_id) != 32 or not all(c in "0123456789abcdef" for c in profile_id):
+            raise KeyError(profile_id)
+        return f"{profile_id}.json"
+
+    async def save(self, profile: RequestProfile):
+        await self._get_storage().upload(self._filename(profile.id), json.dumps(profile.to_dict()).encode())
+
+    async def load(self, profile_id: str) -> dict:
+        filename = self._filename(profile_id)
+        storage = self._get_storage()
+        if not (storage.base_path / filename).is_file():
+            raise KeyError(profile_id)
+        return json.loads(await storage.download(filename))
+
+
+profile_store = ProfileStore()
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling requests that carry the authorized X-Profile header or are sampled.
+    The profile id is returned in the `X-Profile-Id` response header and stored once the response is sent.
+    """
+    def __init__(self, app, store: Optional[ProfileStore] = None):
+        self.app = app
+        self.store = store
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (PROFILE_TOKEN or PROFILE_SAMPLE_RATE):
+            await self.app(scope, receive, send)
+            return
+        header = next((value.decode("latin-1") for key, value in scope["headers"] if key == PROFILE_HEADER.encode()), None)
+        reason = should_profile(header)
+        if reason is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(f"{scope['method']} {scope['path']}", reason)
+
+        async def profiled_send(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", profile.id.encode())]
+            await send(message)
+
+        sampler.start(profile)
+        try:
+            with activate(profile):
+                await self.app({**scope, "profile": profile}, receive, profiled_send)
+        finally:
+            sampler.stop(profile)
+            try:
+                await (self.store or profile_store).save(profile)
+            except Exception as e:
+                logger.warning("Storing profile %s failed: %s", profile.id, e)
@@ -1,10 +1,27 @@
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-from botocore.exceptions import ClientError, BotoCoreError
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-import redis.exceptions
-import pymongo.errors
-import psycopg2
-import asyncpg
+import sys
+from typing import Tuple
+from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception, retry_if_exception_type
+
+
+def _loaded_types(names: Tuple[str, ...]) -> Tuple[type, ...]:
+    """
+    Resolve dotted exception names from modules that are already imported. A driver that was never imported
+    cannot have raised, so nothing is imported here just to name its exception types.
+    """
+    types = []
+    for name in names:
+        module_name, _, attr = name.rpartition(".")
+        module = sys.modules.get(module_name)
+        if module is not None:
+            types.append(getattr(module, attr))
+    return tuple(types)
+
+
+def retry_if_exception_named(*names: str, builtin: Tuple[type, ...] = ()):
+    """
+    Like retry_if_exception_type, with third-party types given as dotted names and resolved per failure.
+    """
+    return retry_if_exception(lambda e: isinstance(e, builtin + _loaded_types(names)))
 
 
 def db_retry():
@@ -12,14 +29,13 @@ def db_retry():
         reraise=True,
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=1, max=10),
-        retry=retry_if_exception_type((
-            redis.exceptions.RedisError,
-            pymongo.errors.PyMongoError,
-            psycopg2.DatabaseError,
-            asyncpg.PostgresError,
-            ConnectionError,
-            TimeoutError,
-        )),
+        retry=retry_if_exception_named(
+            "redis.exceptions.RedisError",
+            "pymongo.errors.PyMongoError",
+            "psycopg2.DatabaseError",
+            "asyncpg.PostgresError",
+            builtin=(ConnectionError, TimeoutError),
+        ),
     )
 
 
@@ -28,7 +44,7 @@ def s3_retry():
         reraise=True,
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=1, max=10),
-        retry=retry_if_exception_type((ClientError, BotoCoreError)),
+        retry=retry_if_exception_named("botocore.exceptions.ClientError", "botocore.exceptions.BotoCoreError"),
     )
 
 def local_fs_retry():
@@ -47,4 +63,3 @@ def http_retry():
         wait=wait_exponential(multiplier=1, min=1, max=10),
         retry=retry_if_exception_type((Exception,))
     )
-
@@ -0,0 +1,272 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import inspect
+import itertools
+import json
+import re
+from os import getenv
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, Awaitable, Callable, Dict, List, Optional, Tuple
+from utils.cache import is_cacheable_result, normalize_value
+from utils.logger_config import configure_logger
+
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = configure_logger("SemanticCache")
+
+# Opt-in: needs the embedding model below pulled on the Ollama backends.
+SEMANTIC_CACHE_ENABLED = getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+SEMANTIC_CACHE_EMBED_MODEL = getenv("SEMANTIC_CACHE_EMBED_MODEL", "nomic-embed-text")
+SEMANTIC_CACHE_MAX_ENTRIES = int(getenv("SEMANTIC_CACHE_MAX_ENTRIES", "100000"))
+# Directory for the memory-mapped vector files (with a JSONL sidecar of answers, reloaded on restart);
+# empty keeps the vectors in anonymous memory. Each worker process claims its own set of files.
+SEMANTIC_CACHE_DIR = getenv("SEMANTIC_CACHE_DIR", "")
+SEMANTIC_CACHE_THRESHOLD = float(getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+# Per-tool overrides, e.g. "ask_question_tool=0.93,explain_code_tool=0.98".
+SEMANTIC_CACHE_THRESHOLDS = {
+    tool.strip(): float(value)
+    for tool, _, value in (
+        item.partition("=") for item in getenv(
+            "SEMANTIC_CACHE_THRESHOLDS", "ask_question_tool=0.95,explain_code_tool=0.98"
+        ).split(",") if "=" in item
+    )
+}
+
+_UNSAFE_PATH = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+class VectorIndex:
+    """
+    Fixed-capacity matrix of unit vectors with an answer per row and LRU replacement.
+    Rows live in a float32 NumPy array, memory-mapped to `path` when one is given; answers are appended
+    to a `.jsonl` sidecar next to it, so an index of the same shape is reopened with its entries.
+    NumPy is imported on first use, keeping it off the startup path.
+    """
+    def __init__(self, dim: int, capacity: int, path: Optional[Path] = None):
+        import numpy as np
+
+        self.dim = dim
+        self.capacity = capacity
+        self.last_used = np.zeros(capacity, dtype=np.int64)
+        self.values: List[Optional[str]] = [None] * capacity
+        self.size = 0
+        self._tick = 0
+        self._sidecar: Optional[IO] = None
+        if path is None:
+            self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        sidecar = path.with_suffix(".jsonl")
+        reopen = path.exists() and path.stat().st_size == capacity * dim * 4 and sidecar.exists()
+        self.vectors = np.memmap(path, dtype=np.float32, mode="r+" if reopen else "w+", shape=(capacity, dim))
+        if reopen:
+            self._load_values(sidecar)
+        self._sidecar = open(sidecar, "a" if reopen else "w", encoding="utf-8")
+
+    def _load_values(self, sidecar: Path):
+        lines = 0
+        with open(sidecar, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    row, value = int(entry["row"]), entry["value"]
+                except (ValueError, KeyError, TypeError):
+                    continue  # torn last line of a crashed process
+                if 0 <= row < self.capacity:
+                    self.values[row] = value
+                    lines += 1
+        self.size = max((row + 1 for row, value in enumerate(self.values) if value is not None), default=0)
+        if lines > 2 * self.capacity:
+            # Replaced rows leave stale lines behind: rewrite the sidecar with the live entries only.
+            with open(sidecar, "w", encoding="utf-8") as f:
+                for row, value in enumerate(self.values):
+                    if value is not None:
+                        f.write(json.dumps({"row": row, "value": value}, ensure_ascii=False) + "\n")
+        logger.info(f"Reopened {sidecar.with_suffix('.f32').name} with {self.size} entries")
+
+    def search(self, query: np.ndarray) -> Tuple[int, float]:
+        """
+        Return (row, cosine similarity) of the nearest stored vector, or (-1, 0.0) when empty.
+        """
+        import numpy as np
+
+        if not self.size:
+            return -1, 0.0
+        # A float64 query would upcast (copy) the whole matrix before the product.
+        scores = self.vectors[:self.size] @ query.astype(np.float32, copy=False)
+        row = int(np.argmax(scores))
+        return row, float(scores[row])
+
+    def touch(self, row: int):
+        self._tick += 1
+        self.last_used[row] = self._tick
+
+    def add(self, vector: np.ndarray, value: str) -> int:
+        import numpy as np
+
+        if self.size < self.capacity:
+            row = self.size
+            self.size += 1
+        else:
+            row = int(np.argmin(self.last_used))
+        self.vectors[row] = vector
+        self.values[row] = value
+        if self._sidecar is not None:
+            self._sidecar.write(json.dumps({"row": row, "value": value}, ensure_ascii=False) + "\n")
+            self._sidecar.flush()
+        self.touch(row)
+        return row
+
+    def similarity(self, row: int, query: np.ndarray) -> float:
+        return float(self.vectors[row] @ query)
+
+    def __len__(self) -> int:
+        return self.size
+
+
+def claim_path(directory: Path, name: str) -> Tuple[Path, IO]:
+    """
+    First `<name>.<n>.f32` in `directory` not held by another worker, with its lock file kept open (and
+    the lock held) for the life of the process. Restarted workers pick their predecessors' files back up.
+    """
+    import fcntl
+
+    directory.mkdir(parents=True, exist_ok=True)
+    for n in itertools.count():
+        path = directory / f"{name}.{n}.f32"
+        lock = open(path.with_suffix(".lock"), "a")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock.close()
+            continue
+        return path, lock
+
+
+def unit_vector(values) -> Optional[np.ndarray]:
+    import numpy as np
+
+    vector = np.asarray(values, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else None
+
+
+async def _ollama_embed(text: str) -> List[float]:
+    from tools.utils import call_ollama_embed
+    return await call_ollama_embed(text, SEMANTIC_CACHE_EMBED_MODEL)
+
+
+class SemanticCache:
+    """
+    Nearest-neighbour answer cache: prompts are embedded and an answer is reused when a previous
+    prompt of the same tool and model is more similar than the tool's cosine threshold.
+    """
+    def __init__(
+            self,
+            embed: Callable[[str], Awaitable[List[float]]] = _ollama_embed,
+            max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+            directory: str = SEMANTIC_CACHE_DIR,
+            thresholds: Optional[Dict[str, float]] = None,
+            default_threshold: float = SEMANTIC_CACHE_THRESHOLD,
+    ):
+        self.embed = embed
+        self.max_entries = max_entries
+        self.directory = Path(directory) if directory else None
+        self.thresholds = SEMANTIC_CACHE_THRESHOLDS if thresholds is None else thresholds
+        self.default_threshold = default_threshold
+        self._indexes: Dict[Tuple[str, str], VectorIndex] = {}
+        self._files: Dict[Tuple[str, str], Tuple[Path, IO]] = {}
+        self.disabled = False
+        self.metrics = {"hits": 0, "misses": 0, "stores": 0, "embed_errors": 0}
+
+    def threshold(self, tool: str) -> float:
+        return self.thresholds.get(tool, self.default_threshold)
+
+    def _index(self, tool: str, model: str, dim: int) -> VectorIndex:
+        index = self._indexes.get((tool, model))
+        if index is None or index.dim != dim:
+            path = None
+            if self.directory is not None:
+                if (tool, model) not in self._files:
+                    self._files[(tool, model)] = claim_path(self.directory, f"{tool}__{_UNSAFE_PATH.sub('_', model)}")
+                path = self._files[(tool, model)][0]
+            index = VectorIndex(dim, self.max_entries, path)
+            self._indexes[(tool, model)] = index
+        return index
+
+    async def lookup(self, tool: str, model: str, text: str) -> Tuple[Optional[np.ndarray], Optional[str]]:
+        """
+        Return (query vector, cached answer). The vector is None when the prompt could not be embedded.
+        """
+        try:
+            query = unit_vector(await self.embed(text))
+        except Exception as e:
+            self.metrics["embed_errors"] += 1
+            if getattr(getattr(e, "response", None), "status_code", None) == 404:
+                # Ollama answers 404 for a model that is not pulled: no point embedding every prompt.
+                self.disabled = True
+                logger.warning(f"Embedding model {SEMANTIC_CACHE_EMBED_MODEL} not found, disabling the semantic cache")
+            else:
+                logger.warning(f"Embedding failed, skipping semantic cache: {e}")
+            return None, None
+        if query is None:
+            return None, None
+        index = self._indexes.get((tool, model))
+        if index is not None and index.dim == len(query) and len(index):
+            # A full scan of a large index takes milliseconds: keep it off the event loop.
+            row, score = await asyncio.to_thread(index.search, query)
+            # `store` may have replaced the row while the scan ran: re-score it before trusting its answer.
+            threshold = self.threshold(tool)
+            if score >= threshold and index.values[row] is not None and index.similarity(row, query) >= threshold:
+                index.touch(row)
+                self.metrics["hits"] += 1
+                return query, index.values[row]
+        self.metrics["misses"] += 1
+        return query, None
+
+    def store(self, tool: str, model: str, query: np.ndarray, value: str):
+        self._index(tool, model, len(query)).add(query, value)
+        self.metrics["stores"] += 1
+
+    def stats(self) -> dict:
+        total = self.metrics["hits"] + self.metrics["misses"]
+        return {
+            **self.metrics,
+            "disabled": self.disabled,
+            "entries": {f"{tool}:{model}": len(index) for (tool, model), index in self._indexes.items()},
+            "hit_ratio": round(self.metrics["hits"] / total, 4) if total else 0.0,
+        }
+
+
+semantic_cache = SemanticCache()
+
+
+def semantic_cached_tool(tool: str, text_arg: str, cache: Optional[SemanticCache] = None):
+    """
+    Serve near-duplicate prompts of a tool from the semantic cache. `text_arg` names the argument
+    that is embedded, so only use it on tools whose answer depends on that text and the model alone.
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            store = cache or semantic_cache
+            if not SEMANTIC_CACHE_ENABLED or store.disabled:
+                return await fn(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            model = bound.arguments.get("model")
+            query, value = await store.lookup(tool, model, normalize_value(bound.arguments[text_arg]))
+            if value is not None:
+                return value
+            value = await fn(*args, **kwargs)
+            if query is not None and is_cacheable_result(value):
+                store.store(tool, model, query, value)
+            return value
+        return wrapper
+    return decorator
@@ -0,0 +1,79 @@
+import asyncio
+from typing import Any, AsyncIterator, Callable, Dict, Hashable, List, Optional
+from utils.logger_config import configure_logger
+
+
+logger = configure_logger("SingleFlight")
+
+
+class _Flight:
+    def __init__(self):
+        self.items: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.changed = asyncio.Condition()
+        self.task: Optional[asyncio.Task] = None
+
+
+class StreamCoalescer:
+    """
+    Share one upstream async stream between concurrent callers with the same key.
+    Callers that join late first replay everything already produced, then follow the live stream.
+    The upstream is cancelled once every subscriber has gone away.
+    """
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.metrics = {"leaders": 0, "joiners": 0, "cancelled": 0}
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    async def subscribe(self, key: Hashable, factory: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        flight = self._flights.get(key)
+        if flight is None or flight.task.cancelling():
+            flight = _Flight()
+            self._flights[key] = flight
+            flight.task = asyncio.create_task(self._produce(key, flight, factory))
+            self.metrics["leaders"] += 1
+        else:
+            self.metrics["joiners"] += 1
+
+        flight.subscribers += 1
+        index = 0
+        try:
+            while True:
+                async with flight.changed:
+                    await flight.changed.wait_for(lambda: index < len(flight.items) or flight.done)
+                    pending = flight.items[index:]
+                    finished = flight.done
+                index += len(pending)
+                for item in pending:
+                    yield item
+                if finished and index >= len(flight.items):
+                    break
+            if flight.error is not None:
+                raise flight.error
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done and flight.task is not None:
+                self.metrics["cancelled"] += 1
+                flight.task.cancel()
+
+    async def _produce(self, key: Hashable, flight: _Flight, factory: Callable[[], AsyncIterator[Any]]):
+        try:
+            async for item in factory():
+                async with flight.changed:
+                    flight.items.append(item)
+                    flight.changed.notify_all()
+        except asyncio.CancelledError:
+            flight.error = asyncio.CancelledError()
+        except Exception as e:
+            flight.error = e
+        finally:
+            # Forget the flight first so new callers start a fresh upstream request.
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            async with flight.changed:
+                flight.done = True
+                flight.changed.notify_all()
@@ -0,0 +1,446 @@
+import json
+import logging
+import queue
+import random
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from os import getenv
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional
+
+
+logger = logging.getLogger(__name__)
+
+# Comma-separated exporter names (console, file, otlp); tracing is off when empty.
+TRACING_EXPORTERS = [name.strip() for name in getenv("TRACING_EXPORTER", "").split(",") if name.strip()]
+TRACING_SAMPLE_RATE = float(getenv("TRACING_SAMPLE_RATE", "1.0"))
+TRACING_FILE = getenv("TRACING_FILE", "traces.jsonl")
+TRACING_OTLP_ENDPOINT = getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACING_SERVICE_NAME = getenv("TRACING_SERVICE_NAME", "mcp-server")
+TRACING_BATCH_SIZE = int(getenv("TRACING_BATCH_SIZE", "256"))
+TRACING_FLUSH_INTERVAL = float(getenv("TRACING_FLUSH_INTERVAL", "2.0"))
+TRACING_QUEUE_SIZE = int(getenv("TRACING_QUEUE_SIZE", "8192"))
+
+
+class SpanContext(NamedTuple):
+    trace_id: str
+    span_id: str
+    sampled: bool
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[SpanContext]:
+    """
+    W3C `traceparent` header -> SpanContext, or None when missing or malformed.
+    """
+    if not value:
+        return None
+    parts = value.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        flags = int(parts[3][:2], 16)
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return SpanContext(parts[1], parts[2], bool(flags & 1))
+
+
+class Span:
+    """
+    A timed operation. Attributes and events are plain dicts; the span is exported when ended, if sampled.
+    """
+    __slots__ = ("name", "context", "parent_id", "start_ns", "end_ns", "attributes", "events", "status", "_tracer")
+
+    def __init__(self, tracer: "Tracer", name: str, context: SpanContext, parent_id: Optional[str], attributes: dict):
+        self._tracer = tracer
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.events: List[dict] = []
+        self.status = "unset"
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def add_event(self, name: str, **attributes):
+        self.events.append({"name": name, "time_ns": time.time_ns(), "attributes": attributes})
+
+    def record_exception(self, exc: BaseException):
+        self.status = "error"
+        self.add_event("exception", type=type(exc).__name__, message=str(exc))
+
+    def end(self, status: Optional[str] = None):
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        if status:
+            self.status = status
+        if self.context.sampled:
+            self._tracer.processor.submit(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.context.trace_id,
+            "span_id": self.context.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+            "events": self.events,
+        }
+
+
+class _NoopSpan:
+    """
+    Returned while tracing is disabled, so call sites never check.
+    """
+    context = None
+
+    def set_attribute(self, key: str, value):
+        pass
+
+    def add_event(self, name: str, **attributes):
+        pass
+
+    def record_exception(self, exc: BaseException):
+        pass
+
+    def end(self, status: Optional[str] = None):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class ConsoleExporter:
+    """
+    One human-readable line per span on stderr.
+    """
+    def export(self, spans: List[Span]):
+        for span in spans:
+            attributes = " ".join(f"{key}={value}" for key, value in span.attributes.items())
+            sys.stderr.write(
+                f"[trace {span.context.trace_id[:8]}] {span.name} {(span.end_ns - span.start_ns) / 1e6:.1f}ms "
+                f"{span.status} {attributes}\n"
+            )
+        sys.stderr.flush()
+
+    def shutdown(self):
+        pass
+
+
+class FileExporter:
+    """
+    Appends spans as JSON lines, for offline inspection (`jq 'select(.trace_id == "...")'`).
+    """
+    def __init__(self, path: str = TRACING_FILE):
+        self.path = path
+
+    def export(self, spans: List[Span]):
+        with open(self.path, "a", encoding="utf-8") as fh:
+            fh.writelines(json.dumps(span.to_dict(), default=str) + "\n" for span in spans)
+
+    def shutdown(self):
+        pass
+
+
+class OTLPExporter:
+    """
+    Posts spans as OTLP/JSON to a collector (Jaeger, Tempo, the OpenTelemetry Collector).
+    Trace and span ids are kept, so traces stitch together with other instrumented services.
+    """
+    def __init__(self, endpoint: str = TRACING_OTLP_ENDPOINT, service_name: str = TRACING_SERVICE_NAME):
+        import httpx
+
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self._client = httpx.Client(timeout=5.0)
+
+    @staticmethod
+    def _attributes(attributes: dict) -> List[dict]:
+        values = []
+        for key, value in attributes.items():
+            if isinstance(value, bool):
+                values.append({"key": key, "value": {"boolValue": value}})
+            elif isinstance(value, int):
+                values.append({"key": key, "value": {"intValue": str(value)}})
+            elif isinstance(value, float):
+                values.append({"key": key, "value": {"doubleValue": value}})
+            else:
+                values.append({"key": key, "value": {"stringValue": str(value)}})
+        return values
+
+    def _span(self, span: Span) -> dict:
+        return {
+            "traceId": span.context.trace_id,
+            "spanId": span.context.span_id,
+            "parentSpanId": span.parent_id or "",
+            "name": span.name,
+            "kind": 1,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": self._attributes(span.attributes),
+            "events": [
+                {"timeUnixNano": str(event["time_ns"]), "name": event["name"], "attributes": self._attributes(event["attributes"])}
+                for event in span.events
+            ],
+            "status": {"code": {"unset": 0, "ok": 1, "error": 2}.get(span.status, 0)},
+        }
+
+    def export(self, spans: List[Span]):
+        payload = {"resourceSpans": [{
+            "resource": {"attributes": self._attributes({"service.name": self.service_name})},
+            "scopeSpans": [{"scope": {"name": "mcp-server"}, "spans": [self._span(span) for span in spans]}],
+        }]}
+        self._client.post(self.endpoint, json=payload).raise_for_status()
+
+    def shutdown(self):
+        self._client.close()
+
+
+EXPORTERS: Dict[str, Callable[[], object]] = {
+    "console": ConsoleExporter,
+    "file": FileExporter,
+    "otlp": OTLPExporter,
+}
+
+
+def register_exporter(name: str, factory: Callable[[], object]):
+    """
+    Make an exporter selectable through TRACING_EXPORTER. Exporters implement export(spans) and shutdown().
+    """
+    EXPORTERS[name] = factory
+
+
+class SpanProcessor:
+    """
+    Hands ended spans to the exporters from a background thread, in batches, so exporting (file writes,
+    collector round trips) never runs on the event loop. When the queue is full, spans are dropped.
+    """
+    def __init__(self, batch_size: int = TRACING_BATCH_SIZE, interval: float = TRACING_FLUSH_INTERVAL, max_queue: int = TRACING_QUEUE_SIZE):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.exporters: List[object] = []
+        self.metrics = {"exported": 0, "dropped": 0, "export_errors": 0}
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, span: Span):
+        if not self.exporters:
+            return
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.metrics["dropped"] += 1
+            return
+        if self._thread is None:
+            self._start()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = self._drain(block=True)
+            if batch is None:
+                return
+            if batch:
+                self._export(batch)
+
+    def _drain(self, block: bool) -> Optional[List[Span]]:
+        batch = []
+        deadline = time.monotonic() + self.interval
+        while len(batch) < self.batch_size:
+            try:
+                if block:
+                    span = self._queue.get(timeout=max(0.001, deadline - time.monotonic()))
+                else:
+                    span = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if span is None:
+                if batch:
+                    self._export(batch)
+                return None
+            batch.append(span)
+        return batch
+
+    def _export(self, batch: List[Span]):
+        for exporter in self.exporters:
+            try:
+                exporter.export(batch)
+            except Exception as e:
+                self.metrics["export_errors"] += 1
+                logger.warning("Span export via %s failed: %s", type(exporter).__name__, e)
+        self.metrics["exported"] += len(batch)
+
+    def flush(self):
+        """
+        Export whatever is queued, on the calling thread.
+        """
+        while True:
+            batch = self._drain(block=False)
+            if not batch:
+                return
+            self._export(batch)
+
+    def shutdown(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+        for exporter in self.exporters:
+            try:
+                exporter.shutdown()
+            except Exception as e:
+                logger.warning("Span exporter %s shutdown failed: %s", type(exporter).__name__, e)
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """
+    Creates spans and tracks the active one per task (contextvars), so child spans find their parent
+    across awaits without being passed around. Disabled, every call returns NOOP_SPAN.
+    """
+    def __init__(self, sample_rate: float = TRACING_SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self.processor = SpanProcessor()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.processor.exporters)
+
+    def add_exporter(self, exporter):
+        self.processor.exporters.append(exporter)
+
+    def current_span(self) -> Optional[Span]:
+        return _current_span.get()
+
+    def start_span(self, name: str, parent: Optional[SpanContext] = None, **attributes):
+        """
+        Start a span without making it current; the caller must end() it. Use this where the span outlives
+        a single task step (async generators). The parent defaults to the current span.
+        """
+        if not self.enabled:
+            return NOOP_SPAN
+        if parent is None:
+            current = _current_span.get()
+            parent = current.context if current is not None else None
+        if parent is None:
+            context = SpanContext(secrets.token_hex(16), secrets.token_hex(8), random.random() < self.sample_rate)
+            return Span(self, name, context, None, attributes)
+        return Span(self, name, SpanContext(parent.trace_id, secrets.token_hex(8), parent.sampled), parent.span_id, attributes)
+
+    @contextmanager
+    def span(self, name: str, parent: Optional[SpanContext] = None, **attributes) -> Iterator[Span]:
+        """
+        Start a span, make it current for the block, and end it with status ok/error.
+        """
+        span = self.start_span(name, parent, **attributes)
+        if span is NOOP_SPAN:
+            yield span
+            return
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end("ok" if span.status == "unset" else None)
+
+    def shutdown(self):
+        self.processor.shutdown()
+
+
+def inject(headers: Dict[str, str], span=None) -> Dict[str, str]:
+    """
+    Add a `traceparent` header for `span` (default: the current span) to outgoing request headers.
+    """
+    span = span if span is not None else _current_span.get()
+    if span is not None and span.context is not None:
+        headers["traceparent"] = span.context.traceparent
+    return headers
+
+
+def mcp_parent() -> Optional[SpanContext]:
+    """
+    The trace context of the HTTP request carrying the current MCP message, or None outside MCP handlers.
+    MCP sessions run handlers in a task spawned by the session's first request, so the contextvar span there
+    is stale; the traceparent header set by TracingMiddleware links each message to its own HTTP span.
+    """
+    from mcp.server.lowlevel.server import request_ctx
+
+    try:
+        request = request_ctx.get().request
+    except LookupError:
+        return None
+    headers = getattr(request, "headers", None)
+    return parse_traceparent(headers.get("traceparent")) if headers is not None else None
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening a server span per HTTP request (REST routers and the mounted MCP app).
+    An incoming `traceparent` becomes the parent; the header seen by the app is rewritten to point at the
+    server span, so MCP tool spans nest under it.
+    """
+    def __init__(self, app, tracer: Optional[Tracer] = None):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        active = self.tracer or tracer
+        if scope["type"] != "http" or not active.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        headers = [(key, value) for key, value in scope["headers"] if key != b"traceparent"]
+        remote = next((parse_traceparent(value.decode("latin-1")) for key, value in scope["headers"] if key == b"traceparent"), None)
+        with active.span(f"{scope['method']} {scope['path']}", parent=remote, **{
+            "http.method": scope["method"],
+            "http.target": scope["path"],
+        }) as span:
+            headers.append((b"traceparent", span.context.traceparent.encode("latin-1")))
+
+            async def traced_send(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.status = "error"
+                    message.setdefault("headers", [])
+                    message["headers"] = [*message["headers"], (b"traceparent", span.context.traceparent.encode("latin-1"))]
+                await send(message)
+
+            await self.app({**scope, "headers": headers}, receive, traced_send)
+
+
+tracer = Tracer()
+for _name in TRACING_EXPORTERS:
+    if _name in EXPORTERS:
+        tracer.add_exporter(EXPORTERS[_name]())
+    else:
+        logger.warning("Unknown TRACING_EXPORTER %r; expected one of %s", _name, sorted(EXPORTERS))
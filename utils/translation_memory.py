@@ -0,0 +1,145 @@
+import asyncio
+import hashlib
+import json
+import threading
+from os import getenv
+from pathlib import Path
+from typing import Dict, List, Tuple
+from utils.cache import LRUTTLCache, normalize_value
+from utils.logger_config import configure_logger
+
+
+logger = configure_logger("TranslationMemory")
+
+TM_ENABLED = getenv("TRANSLATION_MEMORY_ENABLED", "true").lower() == "true"
+TM_MAX_ENTRIES = int(getenv("TRANSLATION_MEMORY_MAX_ENTRIES", "100000"))
+# Append-only JSON lines file used as the local persistent index; empty keeps the memory in-process only.
+# It is rewritten with the live entries once it holds more than twice TRANSLATION_MEMORY_MAX_ENTRIES lines.
+TM_PATH = getenv("TRANSLATION_MEMORY_PATH", "")
+TM_KEY_PREFIX = getenv("TRANSLATION_MEMORY_PREFIX", "mcp:tm")
+# Translation units do not go stale: the local tier only evicts by size.
+_NO_EXPIRY = 10 * 365 * 24 * 3600.0
+
+
+def segment_key(segment: str, language: str, model: str) -> str:
+    # Translations differ in quality between models: never serve one model's output for another.
+    digest = hashlib.sha256(normalize_value(segment).encode()).hexdigest()
+    return f"{TM_KEY_PREFIX}:{language.strip().lower()}:{model}:{digest}"
+
+
+class TranslationMemory:
+    """
+    Segment-level translation store: an in-process LRU, loaded from and appended to a local JSON lines
+    file, in front of an optional shared Redis tier.
+    """
+    def __init__(self, path: str = TM_PATH, max_entries: int = TM_MAX_ENTRIES):
+        self.path = Path(path) if path else None
+        self.local = LRUTTLCache(max_entries=max_entries, ttl=_NO_EXPIRY)
+        self.redis = None
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+        self._file_lock = threading.Lock()
+        self._lines = 0
+        self.metrics = {"hits": 0, "misses": 0, "stores": 0, "errors": 0}
+
+    def attach_redis(self, redis_db):
+        """
+        Enable the shared tier using a connected `RedisDB` (see LifespanContext).
+        """
+        self.redis = redis_db
+
+    async def _ensure_loaded(self):
+        # Concurrent first calls wait for the one load instead of reading the file again.
+        async with self._load_lock:
+            if not self._loaded:
+                await asyncio.to_thread(self._load)
+                self._loaded = True
+
+    def _load(self):
+        if self.path is None or not self.path.exists():
+            return
+        with self.path.open(encoding="utf-8") as f:
+            for line in f:
+                self._lines += 1
+                try:
+                    entry = json.loads(line)
+                    self.local.set(entry["key"], entry["value"])
+                except (json.JSONDecodeError, KeyError):
+                    continue
+        logger.info(f"Loaded {len(self.local)} translation units from {self.path}")
+
+    def _append(self, entries: Dict[str, str]):
+        with self._file_lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as f:
+                for key, value in entries.items():
+                    f.write(json.dumps({"key": key, "value": value}, ensure_ascii=False) + "\n")
+            self._lines += len(entries)
+
+    def _rewrite(self, entries: List[Tuple[str, str]]):
+        """
+        Replace the file with `entries`, dropping units evicted from the local tier and superseded lines.
+        """
+        with self._file_lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+            with tmp.open("w", encoding="utf-8") as f:
+                for key, value in entries:
+                    f.write(json.dumps({"key": key, "value": value}, ensure_ascii=False) + "\n")
+            tmp.replace(self.path)
+            self._lines = len(entries)
+        logger.info(f"Compacted {self.path} to {len(entries)} translation units")
+
+    async def get_many(self, keys: List[str]) -> Dict[str, str]:
+        await self._ensure_loaded()
+        found, remote = {}, []
+        for key in keys:
+            value = self.local.get(key)
+            if value is not None:
+                found[key] = value
+            else:
+                remote.append(key)
+        if remote and self.redis is not None:
+            try:
+                for key, value in (await self.redis.read_many(remote)).items():
+                    if value is not None:
+                        found[key] = value
+                        self.local.set(key, value)
+            except Exception as e:
+                self.metrics["errors"] += 1
+                logger.warning(f"Redis translation memory read failed: {e}")
+        self.metrics["hits"] += len(found)
+        self.metrics["misses"] += len(keys) - len(found)
+        return found
+
+    async def put_many(self, entries: Dict[str, str]):
+        if not entries:
+            return
+        await self._ensure_loaded()
+        for key, value in entries.items():
+            self.local.set(key, value)
+        self.metrics["stores"] += len(entries)
+        try:
+            if self.path is not None:
+                if self._lines + len(entries) > 2 * self.local.max_entries:
+                    # The snapshot is taken on the event loop, where the LRU is mutated.
+                    await asyncio.to_thread(self._rewrite, self.local.items())
+                else:
+                    await asyncio.to_thread(self._append, entries)
+            if self.redis is not None:
+                await self.redis.write_many(entries)
+        except Exception as e:
+            self.metrics["errors"] += 1
+            logger.warning(f"Translation memory write failed: {e}")
+
+    def stats(self) -> dict:
+        total = self.metrics["hits"] + self.metrics["misses"]
+        return {
+            **self.metrics,
+            "local_entries": len(self.local),
+            "redis_enabled": self.redis is not None,
+            "hit_ratio": round(self.metrics["hits"] / total, 4) if total else 0.0,
+        }
+
+
+translation_memory = TranslationMemory()